@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+
+"""Measures the memory use and construction time of distribution file entries
+against entries that cache their attributes with ``persisted`` as earlier
+versions did.
+
+usage: entry-benchmark.py [number of entries]
+
+"""
+__author__ = 'Paul Landes'
+
+from typing import List, Dict, Any
+import sys
+import gc
+import time
+import tracemalloc
+from pathlib import Path
+from zensols.persist import persisted
+from zensols.grsync import FileEntry, PathTranslator
+
+
+class PersistedFileEntry(object):
+    """The file entry of earlier versions."""
+    def __init__(self, dist, finfo: dict):
+        self.dist = dist
+        self.finfo = finfo
+
+    @property
+    @persisted('_rel')
+    def relative(self):
+        return Path(self.finfo['rel'])
+
+    @property
+    @persisted('_path')
+    def path(self):
+        return self.dist.path_translator.expand(self.relative)
+
+    @property
+    @persisted('_mode')
+    def mode(self):
+        return self.finfo['mode']
+
+    @property
+    @persisted('_modestr')
+    def modestr(self):
+        return self.finfo['modestr']
+
+    @property
+    @persisted('_modify_time')
+    def modify_time(self):
+        return self.finfo['modify_time']
+
+
+class Dist(object):
+    def __init__(self):
+        self.path_translator = PathTranslator(Path('/home/user'))
+
+
+def create(cls: type, dist: Dist, finfos: List[Dict[str, Any]]) -> List:
+    entries = [cls(dist, fi) for fi in finfos]
+    # access what is used on thaw so cached attributes are created
+    for entry in entries:
+        entry.path, entry.mode, entry.modify_time
+    return entries
+
+
+def measure(cls: type, dist: Dist, finfos: List[Dict[str, Any]]):
+    gc.collect()
+    start: float = time.perf_counter()
+    create(cls, dist, finfos)
+    elapsed: float = time.perf_counter() - start
+    gc.collect()
+    tracemalloc.start()
+    entries = create(cls, dist, finfos)
+    size: int = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    per: float = size / len(entries)
+    print(f'{cls.__name__}: {elapsed:.2f}s, {size / 2**20:.1f}MiB ' +
+          f'({per:.0f} bytes/entry)')
+
+
+def main():
+    n: int = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    dist = Dist()
+    finfos = [{'rel': f'dir_{i % 1000}/file_{i}.txt', 'mode': 33188,
+               'modestr': '-rw-r--r--', 'create_time': 1.7e9,
+               'modify_time': 1.7e9} for i in range(n)]
+    print(f'{n} entries (without the manifest entries)')
+    for cls in (PersistedFileEntry, FileEntry):
+        measure(cls, dist, finfos)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,17 @@
 from .config import *
+from .gitconfig import *
 from .domain import *
 from .repospec import *
+from .mirror import *
+from .clone import *
+from .scan import *
 from .bootstrap import *
+from .manifest import *
+from .archive import *
 from .freeze import *
 from .distribution import *
+from .journal import *
+from .copier import *
 from .thaw import *
 from .mover import *
 from .distmng import *
@@ -6,11 +6,12 @@ __author__ = 'Paul Landes'
 from typing import List, Dict, Any
 from dataclasses import dataclass, field
 from abc import ABCMeta
+import sys
 import logging
 from pathlib import Path
 from zensols.persist import persisted
 from zensols.cli import LogConfigurator, ActionCliManager
-from . import DistManager, AppConfig
+from . import DistManager, AppConfig, MirrorCache
 
 logger = logging.getLogger(__name__)
 
@@ -66,6 +67,9 @@ class InfoApplication(Application):
     CLI_META = ActionCliManager.combine_meta(
         Application,
         {'option_excludes': {'log_config'},
+         'option_overrides': {'names': {'short_name': 'n'},
+                              'no_cache': {'short_name': None},
+                              'rebuild_cache': {'short_name': None}},
          'mnemonic_overrides': {'list_profiles': 'profiles'}})
 
     log_config: LogConfigurator = field()
@@ -74,10 +78,23 @@ class InfoApplication(Application):
     profiles: str = field(default=None)
     """Comma spearated list of profiles in config."""
 
+    jobs: int = field(default=None)
+    """The number of threads used to discover or clone repositories."""
+
+    no_cache: bool = field(default=False)
+    """Do not use the discovery cache."""
+
+    rebuild_cache: bool = field(default=False)
+    """Rebuild the discovery cache."""
+
     def __post_init__(self):
         super().__post_init__()
         if self.profiles is not None:
             self._params['profiles'] = AppConfig.split_profiles(self.profiles)
+        if self.jobs is not None:
+            self._params['workers'] = self.jobs
+        for attr in 'no_cache rebuild_cache'.split():
+            self._params[attr] = getattr(self, attr)
         self.log_config.level = 'err'
         self.log_config()
 
@@ -119,6 +136,14 @@ class ModifyApplication(Application, metaclass=ABCMeta):
         {'option_overrides': {'dist_dir': {'metavar': 'DIRECTORY',
                                            'short_name': 'd'},
                               'dry_run': {'short_name': None},
+                              # the freeze and thaw options are one field
+                              'stream': {'short_name': None,
+                                         'doc': 'write the distribution to ' +
+                                         'standard out on freeze or read it ' +
+                                         'from standard in on thaw as a tar ' +
+                                         'stream'},
+                              'archive': {'metavar': 'FORMAT',
+                                          'short_name': None},
                               'profiles': {'short_name': 'p'}}})
 
     dist_dir: Path = field(default=None)
@@ -155,29 +180,124 @@ class TargetApplication(ModifyApplication, metaclass=ABCMeta):
 
 @dataclass
 class FreezeApplication(ModifyApplication):
-    CLI_META = ModifyApplication.CLI_META
+    CLI_META = ActionCliManager.combine_meta(
+        ModifyApplication,
+        {'option_overrides': {'no_cache': {'short_name': None},
+                              'rebuild_cache': {'short_name': None}}})
+
+    jobs: int = field(default=None)
+    """The number of threads used to discover or clone repositories."""
+
+    no_cache: bool = field(default=False)
+    """Do not use the discovery cache."""
+
+    rebuild_cache: bool = field(default=False)
+    """Rebuild the discovery cache."""
+
+    def __post_init__(self):
+        super().__post_init__()
+        if self.jobs is not None:
+            self._params['workers'] = self.jobs
+        for attr in 'no_cache rebuild_cache'.split():
+            self._params[attr] = getattr(self, attr)
 
     def freeze(self, wheel_dep: Path = Path('zensols.grsync'),
-               repo_pref: str = None):
+               repo_pref: str = None, stream: bool = False,
+               archive: str = None):
         """Create a distribution.
 
         :param whee_dep: used to create the wheel dep files
 
         :param repo_pref: the repository to make primary on thaw
 
+        :param stream: write the distribution to standard out as a tar stream
+
+        :param archive: the distribution file format: zip, tar.gz, tar.xz or
+                        tar.zst
+
         """
-        self.dist_mng.freeze(wheel_dep)
+        if archive is not None:
+            self._params['archive_format'] = archive
+        if stream:
+            self.dist_mng.freeze_stream(sys.stdout.buffer)
+        else:
+            self.dist_mng.freeze(wheel_dep)
 
 
 @dataclass
 class ThawApplication(TargetApplication):
-    CLI_META = TargetApplication.CLI_META
+    CLI_META = ActionCliManager.combine_meta(
+        TargetApplication,
+        {'option_overrides':
+         {'mirror_dir': {'metavar': 'DIRECTORY', 'short_name': None},
+          'prune': {'metavar': 'DAYS', 'short_name': None},
+          'extract_jobs': {'metavar': 'INT', 'short_name': None},
+          'sync': {'short_name': None},
+          'checksum': {'short_name': None},
+          'backup': {'short_name': None}}})
 
-    def thaw(self):
+    jobs: int = field(default=None)
+    """The number of threads used to discover or clone repositories."""
+
+    def __post_init__(self):
+        super().__post_init__()
+        if self.jobs is not None:
+            self._params['workers'] = self.jobs
+
+    def thaw(self, stream: bool = False, mirror_dir: Path = None,
+             extract_jobs: int = None, sync: bool = False,
+             checksum: bool = False, backup: bool = False):
         """Build out a distribution.
 
+        :param stream: read the distribution from standard in as a tar stream
+
+        :param mirror_dir: the directory of bare mirrors of repository remotes
+
+        :param extract_jobs: the number of threads used to extract files
+
+        :param sync: replace existing files with a different size or modify
+                     time rather than skipping them
+
+        :param checksum: also compare the content of files to synchronize
+
+        :param backup: keep replaced files with a ``~`` suffix
+
+        """
+        if mirror_dir is not None:
+            self._params['mirror_dir'] = mirror_dir
+        if extract_jobs is not None:
+            self._params['extract_workers'] = extract_jobs
+        self._params.update(
+            {'sync': sync, 'checksum': checksum, 'backup': backup})
+        if stream:
+            if self.dist_dir is None:
+                # not used, but needed to create the manager without a config
+                self._params['dist_dir'] = Path('.')
+            self.dist_mng.thaw_stream(sys.stdin.buffer)
+        else:
+            self.dist_mng.thaw()
+
+    def mirrors(self, mirror_dir: Path = None, prune: int = None):
+        """Report the size of the repository mirrors.
+
+        :param mirror_dir: the directory of bare mirrors of repository remotes
+
+        :param prune: remove mirrors not used in this many days
+
         """
-        self.dist_mng.thaw()
+        if mirror_dir is None:
+            mirror_dir = MirrorCache.default_dir()
+        cache = MirrorCache(mirror_dir)
+        if prune is not None:
+            cache.prune(prune)
+        cache.write()
+
+    def unshallow(self):
+        """Fetch the history and content left out by shallow, partial, single
+        branch or sparse clones of a thawed distribution.
+
+        """
+        self.dist_mng.unshallow()
 
 
 @dataclass
@@ -185,16 +305,20 @@ class CopyMoveApplication(TargetApplication):
     CLI_META = ActionCliManager.combine_meta(
         TargetApplication,
         {'option_overrides':
-         {'move_dir': {'metavar': 'DIRECTORY'},
-          'dir_reduce': {'long_name': 'reduce', 'short_name': None}}})
+         {'move_dir': {'metavar': 'DIRECTORY', 'short_name': 'm'},
+          'dir_reduce': {'long_name': 'reduce', 'short_name': None},
+          'link_readonly': {'short_name': None}}})
 
-    def copy(self, repo_pref: str = None):
+    def copy(self, repo_pref: str = None, link_readonly: bool = False):
         """Build out a distribution.
 
         :param repo_pref: the repository to make primary on thaw
 
+        :param link_readonly: hard link rather than copy read only files
+
         """
-        self.dst_mnt.copy()
+        self._params['link_readonly'] = link_readonly
+        self.dist_mng.copy()
 
     def move(self, move_dir: Path = None, dir_reduce: bool = False):
         """Move a distribution to another root (easy to delete).
@@ -204,4 +328,4 @@ class CopyMoveApplication(TargetApplication):
         :param reduce: dir_remove empty directories
 
         """
-        self.dst_mnt.move(move_dir, dir_reduce)
+        self.dist_mng.move(move_dir, dir_reduce)
@@ -0,0 +1,772 @@
+"""Writes the distribution archive.
+
+"""
+from __future__ import annotations
+__author__ = 'Paul Landes'
+
+from typing import (
+    Tuple, Dict, Deque, Optional, Union, Sequence, Any, Callable, BinaryIO,
+    TextIO
+)
+from abc import ABCMeta, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+from functools import partial
+import logging
+import os
+import copy
+import sys
+import struct
+import shutil
+import time
+import zlib
+import zipfile
+import io
+import gzip
+import lzma
+import tarfile
+from fnmatch import fnmatch
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class CompressionRule(object):
+    """Indicates how to compress files in the distribution that match file
+    name extensions, glob patterns and a minimum size.  The name of the rule is
+    the *bucket* used to report how well its files compress.
+
+    """
+    METHODS = {'store': zipfile.ZIP_STORED,
+               'deflate': zipfile.ZIP_DEFLATED,
+               'bzip2': zipfile.ZIP_BZIP2,
+               'lzma': zipfile.ZIP_LZMA}
+    """The compression method names to their zip compression type."""
+
+    def __init__(self, name: str = None, method: str = 'deflate',
+                 level: int = None, ext: Union[str, Sequence[str]] = (),
+                 glob: Union[str, Sequence[str]] = (), min_size: int = 0):
+        """Initialize.
+
+        :param name: the name of the rule, which defaults to ``method``
+
+        :param method: one of the keys of :obj:`METHODS`
+
+        :param level: the compression level, which defaults to the writer's
+                      level when not given
+
+        :param ext: file name extensions (without the dot) matched case
+                    insensitively
+
+        :param glob: patterns matched against the path of the file relative to
+                     the target directory
+
+        :param min_size: the minimum size of files in bytes to match
+
+        """
+        if method not in self.METHODS:
+            raise ValueError(f'unknown compression method: {method}')
+        self.name = method if name is None else name
+        self.method = method
+        self.compress_type = self.METHODS[method]
+        self.level = level
+        ext = (ext,) if isinstance(ext, str) else ext
+        self.exts = frozenset(map(lambda x: x.lower().lstrip('.'), ext))
+        self.globs = (glob,) if isinstance(glob, str) else tuple(glob)
+        self.min_size = min_size
+
+    def matches(self, arcname: str, size: int) -> bool:
+        """Return whether this rule applies to a file.
+
+        :param arcname: the path of the file relative to the target directory
+
+        :param size: the size of the file in bytes
+
+        """
+        if size < self.min_size:
+            return False
+        if len(self.exts) > 0:
+            ext: str = os.path.splitext(arcname)[1][1:].lower()
+            if ext not in self.exts:
+                return False
+        if len(self.globs) > 0:
+            if not any(map(lambda g: fnmatch(arcname, g), self.globs)):
+                return False
+        return True
+
+    def __str__(self):
+        return f'{self.name} ({self.method})'
+
+
+class CompressionPolicy(object):
+    """Chooses the :class:`.CompressionRule` for each file in the distribution.
+    The configured rules are tried first in order, then files with an
+    extension of an already compressed format (:obj:`STORE_EXTENSIONS`) are
+    stored.  Otherwise the first :obj:`SAMPLE_SIZE` bytes are compressed with
+    the fastest deflate level and the file is stored if it does not get
+    smaller by more than :obj:`SAMPLE_RATIO`.  Everything else is deflated.
+
+    """
+    STORE_EXTENSIONS = frozenset("""
+7z aac apk avif br bz2 deb docx epub flac gif gz heic jar jpeg jpg lz lz4 lzma
+m4a mkv mov mp3 mp4 odp ods odt ogg opus pack pdf png pptx rar rpm tbz tgz txz
+webm webp whl woff woff2 xlsx xz zip zst""".split())
+    """Extensions of file formats that are already compressed."""
+
+    SAMPLE_SIZE = 4096
+    """The number of bytes read from the start of a file to guess whether it
+    compresses."""
+
+    SAMPLE_RATIO = 0.95
+    """The compressed to uncompressed size ratio of the sample above which the
+    file is stored."""
+
+    def __init__(self, rules: Sequence[CompressionRule] = (),
+                 sample: bool = True):
+        """Initialize.
+
+        :param rules: the configured rules tried before the default rules
+
+        :param sample: whether to store files with an incompressible sample
+
+        """
+        self.rules = tuple(rules)
+        self.sample = sample
+        self.compressed = CompressionRule(
+            'compressed', 'store', ext=self.STORE_EXTENSIONS)
+        self.incompressible = CompressionRule('incompressible', 'store')
+        self.default = CompressionRule('deflate', 'deflate')
+
+    @classmethod
+    def from_config(cls, rule_defs: Sequence[Dict[str, Any]] = (),
+                    sample: bool = True) -> CompressionPolicy:
+        """Create a policy from ``discover.compress.policy`` configuration,
+        which is a list of ``rule`` entries with the keyword arguments of
+        :class:`.CompressionRule`.
+
+        """
+        rules = map(lambda x: CompressionRule(**x['rule']),
+                    filter(lambda x: 'rule' in x, rule_defs))
+        return cls(rules, sample)
+
+    def _is_incompressible(self, head: bytes) -> bool:
+        head = head[:self.SAMPLE_SIZE]
+        if len(head) < self.SAMPLE_SIZE:
+            # too small to guess and cheap to compress
+            return False
+        return len(zlib.compress(head, 1)) > len(head) * self.SAMPLE_RATIO
+
+    def rule_for(self, arcname: str, size: int,
+                 head: bytes = None) -> CompressionRule:
+        """Return the rule used to compress a file.
+
+        :param arcname: the path of the file relative to the target directory
+
+        :param size: the size of the file in bytes
+
+        :param head: the start of the file's content used to guess whether it
+                     compresses, or ``None`` to skip the check
+
+        """
+        rule: CompressionRule
+        for rule in self.rules:
+            if rule.matches(arcname, size):
+                return rule
+        if self.compressed.matches(arcname, size):
+            return self.compressed
+        if self.sample and head is not None and self._is_incompressible(head):
+            return self.incompressible
+        return self.default
+
+
+class ZipArchiveWriter(object):
+    """Adds files to a zip file by reading them and choosing how to compress
+    them in a thread pool while the calling thread compresses and writes the
+    members with :meth:`zipfile.ZipFile.writestr`.  Members are written in the
+    order they are added so the archive is deterministic regardless of the
+    number of workers.
+
+    Each file is compressed as given by a :class:`.CompressionPolicy`.  The
+    number of files, their sizes and the CPU time used to compress them are
+    tallied by the name of the rule (*bucket*) in :obj:`buckets`.
+
+    Files larger than :obj:`MAX_BUFFER_SIZE` are not read in to memory and
+    instead are read and written by :meth:`zipfile.ZipFile.write` when it is
+    their turn to be written.
+
+    Members of another zip file are added with :meth:`copy_member`, and are
+    tallied in the :obj:`REUSED` bucket.  They are copied without
+    decompressing them using internals of :mod:`zipfile` only on the versions
+    of Python the tests run on (see :obj:`RAW_COPY`), and otherwise are read
+    and compressed again.
+
+    """
+    MAX_BUFFER_SIZE = 32 * 1024 * 1024
+    """The maximum size of a file compressed in a worker thread."""
+
+    REUSED = 'reused'
+    """The bucket name of members copied from another zip file."""
+
+    COPY_BUFFER_SIZE = 1024 * 1024
+    """The number of bytes read at a time when copying members."""
+
+    RAW_COPY_VERSIONS = ((3, 11), (3, 13))
+    """The (inclusive) range of Python versions tested with the
+    :mod:`zipfile` internals used to copy members without decompressing
+    them."""
+
+    RAW_COPY: bool = \
+        RAW_COPY_VERSIONS[0] <= sys.version_info[:2] <= RAW_COPY_VERSIONS[1]
+    """Whether members are copied without decompressing them."""
+
+    def __init__(self, zf: zipfile.ZipFile, workers: int = None,
+                 compress_level: int = 6, policy: CompressionPolicy = None):
+        """Initialize.
+
+        :param zf: the zip file opened for writing
+
+        :param workers: the number of threads that read files, which defaults
+                        to the number of processors
+
+        :param compress_level: the compression level used by rules that do not
+                               give one
+
+        :param policy: chooses how to compress each file, which defaults to
+                       the built in rules
+
+        """
+        self.zf = zf
+        if workers is None:
+            workers = os.cpu_count() or 1
+        self.workers = workers
+        self.compress_level = compress_level
+        self.policy = CompressionPolicy() if policy is None else policy
+        self.stats: Dict[str, int] = {'files': 0, 'bytes': 0,
+                                      'compressed_bytes': 0}
+        self.buckets: Dict[str, Dict[str, float]] = {}
+        self._pending: Deque[Union[Future, Callable]] = deque()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        if self.workers > 1:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.workers,
+                thread_name_prefix='grsync-compress')
+
+    def _level(self, rule: CompressionRule) -> Optional[int]:
+        if rule.compress_type == zipfile.ZIP_STORED:
+            return None
+        level: int = self.compress_level if rule.level is None else rule.level
+        if rule.compress_type == zipfile.ZIP_BZIP2:
+            # bzip2 levels start at 1
+            level = max(1, level)
+        return level
+
+    def _read(self, path: Path, arcname: str, rel: str) -> \
+            Tuple[zipfile.ZipInfo, bytes, CompressionRule, float]:
+        """Read a file returning its zip metadata, data, the rule used to
+        compress it and CPU seconds used.
+
+        """
+        zinfo = zipfile.ZipInfo.from_file(path, arcname)
+        with open(path, 'rb') as f:
+            data: bytes = f.read()
+        cpu: float = time.thread_time()
+        rule: CompressionRule = self.policy.rule_for(rel, len(data), data)
+        return zinfo, data, rule, time.thread_time() - cpu
+
+    def _write_data(self, zinfo: zipfile.ZipInfo, data: bytes,
+                    rule: CompressionRule) -> float:
+        """Compress and write a member read by :meth:`_read`.
+
+        :return: the CPU seconds used
+
+        """
+        cpu: float = time.thread_time()
+        self.zf.writestr(zinfo, data, rule.compress_type, self._level(rule))
+        return time.thread_time() - cpu
+
+    def _write_compressed(self, zinfo: zipfile.ZipInfo,
+                          data: Union[bytes, Callable[[BinaryIO], None]]):
+        """Append an already compressed member to the zip file.  This does what
+        :meth:`zipfile.ZipFile.open` does when writing, but with the CRC and
+        sizes known before the local header is written, and so is only used
+        when :obj:`RAW_COPY` is set.
+
+        :param data: the compressed data or a callable that writes it to the
+                     file object it is given
+
+        """
+        zf: zipfile.ZipFile = self.zf
+        with zf._lock:
+            if zf._seekable:
+                zf.fp.seek(zf.start_dir)
+            zinfo.header_offset = zf.fp.tell()
+            zf._writecheck(zinfo)
+            zf._didModify = True
+            zf.fp.write(zinfo.FileHeader())
+            if callable(data):
+                data(zf.fp)
+            else:
+                zf.fp.write(data)
+            zf.start_dir = zf.fp.tell()
+            zf.filelist.append(zinfo)
+            zf.NameToInfo[zinfo.filename] = zinfo
+
+    def _write_file(self, path: Path, arcname: str, rel: str, size: int) -> \
+            Tuple[zipfile.ZipInfo, str, float]:
+        """Compress and write a file without reading all of it in to memory.
+
+        """
+        cpu: float = time.thread_time()
+        head: bytes = None
+        if self.policy.sample:
+            with open(path, 'rb') as f:
+                head = f.read(CompressionPolicy.SAMPLE_SIZE)
+        rule: CompressionRule = self.policy.rule_for(rel, size, head)
+        self.zf.write(path, arcname, rule.compress_type, self._level(rule))
+        return self.zf.getinfo(arcname), rule.name, time.thread_time() - cpu
+
+    def _copy_data(self, src: zipfile.ZipFile, zinfo: zipfile.ZipInfo,
+                   fp: BinaryIO):
+        """Copy the compressed data of member ``zinfo`` in ``src`` to ``fp``.
+
+        """
+        with src._lock:
+            src.fp.seek(zinfo.header_offset)
+            header: bytes = src.fp.read(zipfile.sizeFileHeader)
+            if len(header) != zipfile.sizeFileHeader or \
+               header[0:4] != zipfile.stringFileHeader:
+                raise zipfile.BadZipFile(
+                    f'bad local file header for {zinfo.filename}')
+            header = struct.unpack(zipfile.structFileHeader, header)
+            src.fp.seek(header[zipfile._FH_FILENAME_LENGTH] +
+                        header[zipfile._FH_EXTRA_FIELD_LENGTH], os.SEEK_CUR)
+            remain: int = zinfo.compress_size
+            while remain > 0:
+                buf: bytes = src.fp.read(min(remain, self.COPY_BUFFER_SIZE))
+                if len(buf) == 0:
+                    raise zipfile.BadZipFile(
+                        f'truncated member: {zinfo.filename}')
+                fp.write(buf)
+                remain -= len(buf)
+
+    def _recompress_member(self, src: zipfile.ZipFile, old: zipfile.ZipInfo,
+                           arcname: str) -> Tuple[zipfile.ZipInfo, str, float]:
+        """Write member ``old`` of ``src`` by decompressing it and compressing
+        it again with only the public :mod:`zipfile` API, which is used when
+        :obj:`RAW_COPY` is not set.
+
+        """
+        cpu: float = time.thread_time()
+        zinfo = zipfile.ZipInfo(old.filename if arcname is None else arcname,
+                                old.date_time)
+        zinfo.compress_type = old.compress_type
+        zinfo.external_attr = old.external_attr
+        zinfo.file_size = old.file_size
+        with src.open(old) as fin:
+            with self.zf.open(zinfo, 'w') as fout:
+                shutil.copyfileobj(fin, fout, self.COPY_BUFFER_SIZE)
+        return zinfo, self.REUSED, time.thread_time() - cpu
+
+    def _copy_member(self, src: zipfile.ZipFile, zinfo: zipfile.ZipInfo,
+                     arcname: str) -> Tuple[zipfile.ZipInfo, str, float]:
+        """Write member ``zinfo`` of ``src`` without decompressing it."""
+        if not self.RAW_COPY:
+            return self._recompress_member(src, zinfo, arcname)
+        old: zipfile.ZipInfo = zinfo
+        zinfo = copy.copy(old)
+        if arcname is not None:
+            zinfo.filename = zinfo.orig_filename = arcname
+        # the CRC and sizes are written in the local header so the member
+        # needs no data descriptor
+        zinfo.flag_bits &= ~0x08
+        # the ZIP64 extra field is added back by the header if needed
+        zinfo.extra = zipfile._strip_extra(old.extra, (1,))
+        self._write_compressed(zinfo, partial(self._copy_data, src, old))
+        return zinfo, self.REUSED, 0
+
+    def _write_next(self):
+        """Write the oldest added file."""
+        pending: Union[Future, Callable] = self._pending.popleft()
+        if isinstance(pending, Future):
+            zinfo, data, rule, cpu = pending.result()
+            cpu += self._write_data(zinfo, data, rule)
+            name: str = rule.name
+        else:
+            zinfo, name, cpu = pending()
+        stats: Dict[str, int] = self.stats
+        bucket: Dict[str, float] = self.buckets.get(name)
+        if bucket is None:
+            bucket = {'files': 0, 'bytes': 0, 'compressed_bytes': 0, 'cpu': 0}
+            self.buckets[name] = bucket
+        for stat in (stats, bucket):
+            stat['files'] += 1
+            stat['bytes'] += zinfo.file_size
+            stat['compressed_bytes'] += zinfo.compress_size
+        bucket['cpu'] += cpu
+
+    def add_file(self, path: Path, arcname: str, size: int = None,
+                 rel: str = None):
+        """Add a file to the zip, which might be written later.
+
+        :param path: the file to add
+
+        :param arcname: the name of the member in the zip
+
+        :param size: the size of the file if known, which avoids a ``stat``
+
+        :param rel: the path matched by the compression policy rules, which
+                    defaults to ``arcname``
+
+        """
+        if size is None:
+            size = os.stat(path).st_size
+        rel = arcname if rel is None else rel
+        if self._pool is None or size > self.MAX_BUFFER_SIZE:
+            self._pending.append(
+                partial(self._write_file, path, arcname, rel, size))
+        else:
+            self._pending.append(
+                self._pool.submit(self._read, path, arcname, rel))
+        self._drain()
+
+    def copy_member(self, src: zipfile.ZipFile, zinfo: zipfile.ZipInfo,
+                    arcname: str = None):
+        """Add a member of another zip file by copying its compressed data,
+        which might be written later.
+
+        :param src: the zip file opened for reading that has the member
+
+        :param zinfo: the member to copy
+
+        :param arcname: the name of the member in the zip, which defaults to
+                        the name of ``zinfo``
+
+        """
+        self._pending.append(partial(self._copy_member, src, zinfo, arcname))
+        self._drain()
+
+    def _drain(self):
+        """Write files that are ready while bounding the memory used by
+        compressed files waiting to be written.
+
+        """
+        while len(self._pending) > max(1, self.workers * 2) or \
+                (len(self._pending) > 0 and
+                 not isinstance(self._pending[0], Future)):
+            self._write_next()
+
+    def close(self):
+        """Write all remaining files and shut down the thread pool."""
+        try:
+            while len(self._pending) > 0:
+                self._write_next()
+        finally:
+            if self._pool is not None:
+                self._pool.shutdown()
+        if logger.isEnabledFor(logging.INFO):
+            stats = self.stats
+            logger.info(f"compressed {stats['files']} files from " +
+                        f"{stats['bytes']} to {stats['compressed_bytes']} " +
+                        f'bytes with {self.workers} workers')
+            name: str
+            bucket: Dict[str, float]
+            for name, bucket in sorted(self.buckets.items()):
+                saved = bucket['bytes'] - bucket['compressed_bytes']
+                logger.info(f"{name}: {bucket['files']} files, saved " +
+                            f"{saved} of {bucket['bytes']} bytes in " +
+                            f"{bucket['cpu']:.2f}s CPU")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        elif self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+
+
+class TarCodec(object, metaclass=ABCMeta):
+    """Compresses and decompresses tar streams.
+
+    """
+    NAME: str = None
+    """The file name extension (after ``.tar.``) of the codec."""
+
+    MAGIC: bytes = None
+    """The bytes that start a stream compressed with the codec."""
+
+    @abstractmethod
+    def compressor(self, fileobj: BinaryIO, level: int,
+                   workers: int = None) -> BinaryIO:
+        """Return a file object that compresses what is written to
+        ``fileobj``, which is not closed when the returned file object is.
+
+        :param level: the compression level
+
+        :param workers: the number of threads to use if the codec supports it
+
+        """
+        pass
+
+    @abstractmethod
+    def decompressor(self, fileobj: BinaryIO) -> BinaryIO:
+        """Return a file object that decompresses what is read from
+        ``fileobj``.
+
+        """
+        pass
+
+
+class GzipCodec(TarCodec):
+    NAME = 'gz'
+    MAGIC = b'\x1f\x8b'
+
+    def compressor(self, fileobj: BinaryIO, level: int,
+                   workers: int = None) -> BinaryIO:
+        return gzip.GzipFile(fileobj=fileobj, mode='wb', compresslevel=level)
+
+    def decompressor(self, fileobj: BinaryIO) -> BinaryIO:
+        return gzip.GzipFile(fileobj=fileobj, mode='rb')
+
+
+class XzCodec(TarCodec):
+    NAME = 'xz'
+    MAGIC = b'\xfd7zXZ\x00'
+
+    def compressor(self, fileobj: BinaryIO, level: int,
+                   workers: int = None) -> BinaryIO:
+        return lzma.LZMAFile(fileobj, 'wb', preset=level)
+
+    def decompressor(self, fileobj: BinaryIO) -> BinaryIO:
+        return lzma.LZMAFile(fileobj, 'rb')
+
+
+class ZstdCodec(TarCodec):
+    """The Zstandard codec, which needs the optional ``zstandard`` package and
+    compresses with multiple threads.
+
+    """
+    NAME = 'zst'
+    MAGIC = b'\x28\xb5\x2f\xfd'
+
+    @staticmethod
+    def _zstd():
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ValueError('the zstandard package is needed for zstd ' +
+                             'archives (pip install zstandard)') from e
+        return zstandard
+
+    def compressor(self, fileobj: BinaryIO, level: int,
+                   workers: int = None) -> BinaryIO:
+        # -1 is one thread for each processor and 0 compresses in this thread
+        threads: int = -1 if workers is None else \
+            (0 if workers <= 1 else workers)
+        comp = self._zstd().ZstdCompressor(level=level, threads=threads)
+        return comp.stream_writer(fileobj, closefd=False)
+
+    def decompressor(self, fileobj: BinaryIO) -> BinaryIO:
+        decomp = self._zstd().ZstdDecompressor()
+        return decomp.stream_reader(fileobj, closefd=False)
+
+
+class _PrefixedReader(io.RawIOBase):
+    """Reads ``prefix`` and then the rest of ``fileobj``, which is used to
+    detect the codec of a stream that can not be sought.
+
+    """
+    def __init__(self, prefix: bytes, fileobj: BinaryIO):
+        self._prefix = prefix
+        self._fileobj = fileobj
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buf) -> int:
+        data: bytes
+        if len(self._prefix) > 0:
+            data = self._prefix[:len(buf)]
+            self._prefix = self._prefix[len(data):]
+        else:
+            data = self._fileobj.read(len(buf))
+        buf[:len(data)] = data
+        return len(data)
+
+
+class ArchiveFormat(object):
+    """The formats of distribution files, which are a zip file (the default)
+    or a tar compressed with one of the :obj:`CODECS`.  Distribution files are
+    named ``dist.<format>`` (i.e. ``dist.tar.zst``).
+
+    """
+    ZIP = 'zip'
+    """The zip format name."""
+
+    ZIP_MAGIC = b'PK\x03\x04'
+    """The bytes that start a zip file."""
+
+    CODECS: Dict[str, TarCodec] = {
+        c.NAME: c for c in (GzipCodec(), XzCodec(), ZstdCodec())}
+    """The tar codecs by name."""
+
+    SIDECAR_SUFFIX = '.json'
+    """The suffix added to the name of a tar distribution file for its
+    definitions, which are written next to it so they can be read without
+    decompressing the archive."""
+
+    @classmethod
+    def names(cls) -> Tuple[str, ...]:
+        """Return all format names."""
+        return (cls.ZIP,) + tuple(map(lambda n: f'tar.{n}', cls.CODECS))
+
+    @classmethod
+    def codec(cls, name: str) -> Optional[TarCodec]:
+        """Return the codec of format ``name`` or ``None`` for zip files."""
+        if name == cls.ZIP:
+            return None
+        if not name.startswith('tar.') or name[4:] not in cls.CODECS:
+            raise ValueError(f'unknown archive format: {name}; ' +
+                             f"use one of: {', '.join(cls.names())}")
+        return cls.CODECS[name[4:]]
+
+    @classmethod
+    def dist_file(cls, dist_dir: Path, name: str) -> Path:
+        """Return the distribution file of format ``name`` in ``dist_dir``."""
+        cls.codec(name)
+        return dist_dir / f'dist.{name}'
+
+    @classmethod
+    def find(cls, dist_dir: Path) -> Path:
+        """Return the most recently modified distribution file in
+        ``dist_dir``, or the zip file if there are none.
+
+        """
+        paths = filter(lambda p: p.is_file(),
+                       map(lambda n: cls.dist_file(dist_dir, n), cls.names()))
+        paths = sorted(paths, key=lambda p: p.stat().st_mtime)
+        return paths[-1] if len(paths) > 0 else \
+            cls.dist_file(dist_dir, cls.ZIP)
+
+    @classmethod
+    def from_path(cls, path: Path) -> str:
+        """Return the format of a distribution file by its name."""
+        for name in cls.names():
+            if path.name.endswith(f'.{name}'):
+                return name
+        raise ValueError(f'unknown archive format: {path}')
+
+    @classmethod
+    def detect(cls, magic: bytes) -> str:
+        """Return the format given the first bytes of a distribution file."""
+        if magic.startswith(cls.ZIP_MAGIC):
+            return cls.ZIP
+        codec: TarCodec
+        for codec in cls.CODECS.values():
+            if magic.startswith(codec.MAGIC):
+                return f'tar.{codec.NAME}'
+        # an uncompressed tar has its magic at offset 257, so assume it is
+        return 'tar'
+
+    @classmethod
+    def detect_file(cls, path: Path) -> str:
+        """Return the format of a distribution file by its content."""
+        with open(path, 'rb') as f:
+            return cls.detect(f.read(8))
+
+    @classmethod
+    def sidecar_file(cls, path: Path) -> Path:
+        """Return the definitions file written next to distribution file
+        ``path`` (i.e. ``dist.tar.gz.json``).
+
+        """
+        return path.with_name(path.name + cls.SIDECAR_SUFFIX)
+
+    @classmethod
+    def open_tar(cls, fileobj: BinaryIO) -> tarfile.TarFile:
+        """Open a tar stream for reading, which need not be seekable, and
+        detect its codec.
+
+        """
+        magic: bytes = b''
+        while len(magic) < 8:
+            buf: bytes = fileobj.read(8 - len(magic))
+            if len(buf) == 0:
+                break
+            magic += buf
+        name: str = cls.detect(magic)
+        if name == cls.ZIP:
+            raise ValueError('zip distributions can not be streamed')
+        fileobj = io.BufferedReader(_PrefixedReader(magic, fileobj))
+        if name != 'tar':
+            fileobj = cls.codec(name).decompressor(fileobj)
+        return tarfile.open(fileobj=fileobj, mode='r|')
+
+
+class TarArchiveWriter(object):
+    """Writes files to a compressed tar stream.  Unlike a zip file, the stream
+    is never sought, so it can be written to a pipe such as standard out and
+    read as it is written.
+
+    """
+    def __init__(self, fileobj: BinaryIO, codec: TarCodec = None,
+                 compress_level: int = 6, workers: int = None):
+        """Initialize.
+
+        :param fileobj: the stream sink, which is flushed but not closed
+
+        :param codec: compresses the stream, which defaults to gzip
+
+        :param compress_level: the compression level
+
+        :param workers: the number of compression threads if supported by the
+                        codec
+
+        """
+        self.fileobj = fileobj
+        self.stats: Dict[str, int] = {'files': 0, 'bytes': 0}
+        codec = GzipCodec() if codec is None else codec
+        self._comp = codec.compressor(fileobj, compress_level, workers)
+        # symbolic links to files are frozen as files
+        self._tar = tarfile.open(
+            fileobj=self._comp, mode='w|', format=tarfile.PAX_FORMAT,
+            dereference=True)
+
+    def add_file(self, path: Path, arcname: str):
+        """Add the file ``path`` as member ``arcname`` with its mode and
+        modify time.
+
+        """
+        tinfo: tarfile.TarInfo = self._tar.gettarinfo(path, arcname)
+        with open(path, 'rb') as f:
+            self._tar.addfile(tinfo, f)
+        self.stats['files'] += 1
+        self.stats['bytes'] += tinfo.size
+
+    def add_spooled(self, name: str, spool: TextIO):
+        """Copy the contents of file ``spool`` to member ``name``."""
+        spool.flush()
+        raw: BinaryIO = spool.buffer
+        tinfo = tarfile.TarInfo(name)
+        tinfo.size = raw.seek(0, os.SEEK_END)
+        tinfo.mtime = int(time.time())
+        tinfo.mode = 0o644
+        raw.seek(0)
+        self._tar.addfile(tinfo, raw)
+
+    def close(self):
+        """Write the end of the tar and gzip streams."""
+        self._tar.close()
+        self._comp.close()
+        self.fileobj.flush()
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(f"streamed {self.stats['files']} files " +
+                        f"({self.stats['bytes']} bytes)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
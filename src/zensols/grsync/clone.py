@@ -0,0 +1,202 @@
+"""Concurrently clones (thaws) repositories.
+
+"""
+from __future__ import annotations
+__author__ = 'Paul Landes'
+
+from typing import List, Dict, Set, Deque, Iterable, Callable
+from dataclasses import dataclass, field
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait, \
+    FIRST_COMPLETED
+import logging
+import re
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+from zensols.grsync import FrozenRepo, MirrorCache
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CloneResult(object):
+    """The outcome of thawing a repository.
+
+    """
+    CLONED = 'cloned'
+    EXISTS = 'exists'
+    FAILED = 'failed'
+
+    repo: FrozenRepo = field()
+    """The repository that was thawed."""
+
+    status: str = field()
+    """One of :obj:`CLONED`, :obj:`EXISTS` or :obj:`FAILED`."""
+
+    seconds: float = field(default=0)
+    """The wall time it took to thaw the repository."""
+
+    error: Exception = field(default=None)
+    """The error raised when the thaw failed."""
+
+
+class CloneScheduler(object):
+    """Thaws repositories with a thread pool since cloning is mostly waiting on
+    the network.  The number of clones from any one host is capped, and a
+    repository nested in another is cloned only after its parent so the
+    parent's clone does not find its (non-empty) directory already created.
+
+    """
+    DEFAULT_WORKERS = 4
+    """The number of concurrent clones if not given."""
+
+    DEFAULT_HOST_WORKERS = 4
+    """The number of concurrent clones from the same host if not given."""
+
+    _SCP_REGEX = re.compile(r'^(?:[^@/]+@)?([^:/]+):(?!//)')
+
+    def __init__(self, repos: Iterable[FrozenRepo], workers: int = None,
+                 host_workers: int = None, dry_run: bool = False,
+                 mirror: MirrorCache = None,
+                 callback: Callable[[CloneResult], None] = None):
+        """Initialize.
+
+        :param repos: the repositories to thaw
+
+        :param workers: the number of concurrent clones
+
+        :param host_workers: the number of concurrent clones from the same host
+
+        :param dry_run: log what would be cloned without doing anything
+
+        :param mirror: if provided, borrow objects from the mirrors of remotes
+
+        :param callback: called with the result of each repository in the
+                         calling thread as each finishes
+
+        """
+        self.repos = tuple(repos)
+        self.workers = self.DEFAULT_WORKERS if workers is None \
+            else max(1, int(workers))
+        self.host_workers = self.DEFAULT_HOST_WORKERS \
+            if host_workers is None else max(1, int(host_workers))
+        self.dry_run = dry_run
+        self.mirror = mirror
+        self.callback = callback
+        self.results: List[CloneResult] = []
+
+    @classmethod
+    def host(cls, url: str) -> str:
+        """Return the host of a remote URL, which is empty for local
+        repositories.
+
+        """
+        m: re.Match = cls._SCP_REGEX.match(url)
+        if m is not None:
+            # scp style (i.e. git@github.com:plandes/grsync.git)
+            return m.group(1)
+        return urlparse(url).hostname or ''
+
+    def _parents(self) -> Dict[int, int]:
+        """Return the index of the closest repository that contains each nested
+        repository by the index of the nested repository.
+
+        """
+        by_path: Dict[Path, int] = {
+            r.path: i for i, r in enumerate(self.repos)}
+        parents: Dict[int, int] = {}
+        for i, repo in enumerate(self.repos):
+            for parent in repo.path.parents:
+                pix: int = by_path.get(parent)
+                if pix is not None:
+                    parents[i] = pix
+                    break
+        return parents
+
+    def _thaw(self, repo: FrozenRepo) -> CloneResult:
+        """Thaw a repository in a worker thread."""
+        start: float = time.time()
+        exists: bool = repo.exists
+        try:
+            repo.path.parent.mkdir(parents=True, exist_ok=True)
+            thawed = repo.thaw(self.mirror)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f'thawed: {thawed}')
+            status: str = CloneResult.EXISTS if exists else CloneResult.CLONED
+            return CloneResult(repo, status, time.time() - start)
+        except Exception as e:
+            logger.error(f'could not thaw {repo}: {e}')
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f'could not thaw {repo}', exc_info=True)
+            return CloneResult(
+                repo, CloneResult.FAILED, time.time() - start, e)
+
+    def _host_of(self, repo: FrozenRepo) -> str:
+        return '' if len(repo.remotes) == 0 else self.host(repo.url)
+
+    def __call__(self) -> List[CloneResult]:
+        """Thaw the repositories and return the results in the order given."""
+        if self.dry_run:
+            for repo in self.repos:
+                logger.info(f'thawing repo: {repo}')
+            return []
+        start: float = time.time()
+        parents: Dict[int, int] = self._parents()
+        children: Dict[int, List[int]] = {}
+        for cix, pix in parents.items():
+            children.setdefault(pix, []).append(cix)
+        hosts: List[str] = list(map(self._host_of, self.repos))
+        running: Dict[str, int] = {}
+        ready: Deque[int] = deque(filter(lambda i: i not in parents,
+                                         range(len(self.repos))))
+        pending: Dict[Future, int] = {}
+        results: Dict[int, CloneResult] = {}
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(f'thawing {len(self.repos)} repos with ' +
+                        f'{self.workers} workers ' +
+                        f'({self.host_workers} per host)')
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while len(ready) > 0 or len(pending) > 0:
+                # start clones from hosts that are under their limit
+                deferred: Deque[int] = deque()
+                while len(ready) > 0 and len(pending) < self.workers:
+                    ix: int = ready.popleft()
+                    host: str = hosts[ix]
+                    if running.get(host, 0) >= self.host_workers:
+                        deferred.append(ix)
+                        continue
+                    running[host] = running.get(host, 0) + 1
+                    logger.info(f'thawing repo: {self.repos[ix]}')
+                    pending[pool.submit(self._thaw, self.repos[ix])] = ix
+                deferred.extend(ready)
+                ready = deferred
+                done: Set[Future]
+                done, _ = wait(pending.keys(), return_when=FIRST_COMPLETED)
+                for future in done:
+                    ix: int = pending.pop(future)
+                    running[hosts[ix]] -= 1
+                    results[ix] = future.result()
+                    if self.callback is not None:
+                        self.callback(results[ix])
+                    # nested repositories are cloned even if the parent fails
+                    ready.extend(children.get(ix, ()))
+        self.results = [results[i] for i in range(len(self.repos))]
+        self._log_summary(time.time() - start)
+        return self.results
+
+    def _log_summary(self, seconds: float):
+        counts: Dict[str, int] = {CloneResult.CLONED: 0,
+                                  CloneResult.EXISTS: 0,
+                                  CloneResult.FAILED: 0}
+        res: CloneResult
+        for res in self.results:
+            counts[res.status] += 1
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(f'thawed repos in {seconds:.1f}s: ' +
+                        f'{counts[CloneResult.CLONED]} cloned, ' +
+                        f'{counts[CloneResult.EXISTS]} existing, ' +
+                        f'{counts[CloneResult.FAILED]} failed')
+        for failed in filter(lambda r: r.status == CloneResult.FAILED,
+                             self.results):
+            logger.error(f'failed to thaw {failed.repo.path}: {failed.error}')
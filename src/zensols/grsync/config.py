@@ -5,6 +5,7 @@ __author__ = 'Paul Landes'
 
 from typing import List, Union
 import logging
+import os
 from pathlib import Path
 import itertools as it
 import re
@@ -125,6 +126,19 @@ class AppConfig(YamlConfig):
     def wheel_dir_name(self):
         return self._get_path(f'{self.ROOT}.local.wheels_dir')
 
+    @property
+    def cache_dir(self) -> Path:
+        """The directory of the discovery cache, which defaults to
+        ``$XDG_CACHE_HOME/grsync``.
+
+        """
+        name = f'{self.ROOT}.cache.dir'
+        if self.has_option(name):
+            path = self.get_option(name)
+        else:
+            path = Path(os.environ.get('XDG_CACHE_HOME', '~/.cache'), 'grsync')
+        return Path(path).expanduser().absolute()
+
     @property
     def bootstrap_script_file(self):
         return Path(self.dist_dir, 'bootstrap.sh')
@@ -0,0 +1,188 @@
+"""Copies files with the fastest method the file systems support.
+
+"""
+__author__ = 'Paul Landes'
+
+from typing import Dict, Tuple, Set, BinaryIO
+import logging
+import os
+import stat
+import errno
+import shutil
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class FileCopier(object):
+    """Copies the content of files with the first of the following methods
+    that works for the source and destination file systems:
+
+      1. a reflink (``FICLONE``), which shares the data of the file on copy on
+         write file systems (i.e. btrfs and xfs) so no data is copied,
+      2. :func:`os.copy_file_range`, which copies in the kernel and might be
+         offloaded by the file system (i.e. NFS server side copy),
+      3. :func:`os.sendfile`, which copies in the kernel,
+      4. a buffered read and write with :func:`shutil.copyfileobj`.
+
+    A method that is not supported between two devices is not tried again for
+    them.  Read only files are optionally hard linked, which shares the file
+    (including its mode and modify time) rather than just its data, so the
+    mode and modify time of a linked file must not be changed.
+
+    """
+    REFLINK = 'reflink'
+    COPY_FILE_RANGE = 'copy_file_range'
+    SENDFILE = 'sendfile'
+    STREAM = 'stream'
+    HARDLINK = 'hardlink'
+    """The methods used to copy files."""
+
+    FICLONE = 0x40049409
+    """The Linux ``ioctl`` request that clones (reflinks) a file."""
+
+    UNSUPPORTED_ERRNOS = frozenset((
+        errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTSUP, errno.ENOSYS,
+        errno.ENOTTY, errno.EINVAL, errno.EBADF, errno.EPERM))
+    """Error numbers that indicate a method is not supported."""
+
+    CHUNK_SIZE = 1 << 30
+    """The maximum number of bytes copied by each kernel call."""
+
+    def __init__(self):
+        methods = []
+        try:
+            import fcntl
+            self._ioctl = fcntl.ioctl
+            methods.append(self.REFLINK)
+        except ImportError:
+            self._ioctl = None
+        if hasattr(os, 'copy_file_range'):
+            methods.append(self.COPY_FILE_RANGE)
+        if hasattr(os, 'sendfile'):
+            methods.append(self.SENDFILE)
+        methods.append(self.STREAM)
+        self.methods: Tuple[str, ...] = tuple(methods)
+        self.counts: Dict[str, int] = {
+            m: 0 for m in self.methods + (self.HARDLINK,)}
+        # (source, destination) devices to the methods not supported by them
+        self._unsupported: Dict[Tuple[int, int], Set[str]] = {}
+        self._link_devices: Set[Tuple[int, int]] = set()
+
+    def _reflink(self, fin: BinaryIO, fout: BinaryIO, size: int):
+        self._ioctl(fout.fileno(), self.FICLONE, fin.fileno())
+
+    @staticmethod
+    def _check_copied(method: str, copied: int, size: int):
+        """Raise an error when a kernel copy wrote fewer bytes than the file
+        has, which some file systems (i.e. FUSE and network mounts) do by
+        returning 0 for non-empty files, so the next method is tried.
+
+        """
+        if copied != size:
+            raise OSError(errno.ENOTSUP, f'{method} copied {copied} of ' +
+                          f'{size} bytes')
+
+    def _copy_file_range(self, fin: BinaryIO, fout: BinaryIO, size: int):
+        ifd, ofd = fin.fileno(), fout.fileno()
+        copied: int = 0
+        while copied < size:
+            n: int = os.copy_file_range(ifd, ofd, self.CHUNK_SIZE)
+            if n == 0:
+                break
+            copied += n
+        self._check_copied(self.COPY_FILE_RANGE, copied, size)
+
+    def _sendfile(self, fin: BinaryIO, fout: BinaryIO, size: int):
+        ifd, ofd = fin.fileno(), fout.fileno()
+        copied: int = 0
+        while copied < size:
+            sent: int = os.sendfile(ofd, ifd, copied, self.CHUNK_SIZE)
+            if sent == 0:
+                break
+            copied += sent
+        self._check_copied(self.SENDFILE, copied, size)
+
+    def _stream(self, fin: BinaryIO, fout: BinaryIO, size: int):
+        shutil.copyfileobj(fin, fout, 1 << 20)
+
+    @staticmethod
+    def _remove(path: Path):
+        if os.path.lexists(path):
+            path.unlink()
+
+    def _link(self, src: Path, dst: Path, st: os.stat_result) -> bool:
+        """Hard link ``src`` to ``dst`` if it is read only.
+
+        :return: whether the file was linked
+
+        """
+        if not stat.S_ISREG(st.st_mode) or \
+           st.st_mode & (stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH) != 0:
+            return False
+        devs: Tuple[int, int] = (st.st_dev, dst.parent.stat().st_dev)
+        if devs in self._link_devices:
+            return False
+        try:
+            self._remove(dst)
+            os.link(src, dst)
+            return True
+        except OSError as e:
+            if e.errno not in self.UNSUPPORTED_ERRNOS:
+                raise e
+            logger.debug(f'can not hard link {src} -> {dst}: {e}')
+            self._link_devices.add(devs)
+        return False
+
+    def copy(self, src: Path, dst: Path, hardlink: bool = False) -> str:
+        """Copy file ``src`` to ``dst``, which is created or replaced, with its
+        mode and modify time.  Symbolic links are copied as links.
+
+        :param hardlink: whether to hard link ``src`` if it has no write
+                         permission rather than copy it
+
+        :return: the method used to copy the file
+
+        """
+        st: os.stat_result = src.lstat()
+        if stat.S_ISLNK(st.st_mode):
+            self._remove(dst)
+            shutil.copy2(src, dst, follow_symlinks=False)
+            return self.STREAM
+        if hardlink and self._link(src, dst, st):
+            self.counts[self.HARDLINK] += 1
+            return self.HARDLINK
+        with open(src, 'rb') as fin:
+            with open(dst, 'wb') as fout:
+                devs = (st.st_dev, os.fstat(fout.fileno()).st_dev)
+                unsupported: Set[str] = self._unsupported.setdefault(
+                    devs, set())
+                for method in self.methods:
+                    if method in unsupported:
+                        continue
+                    try:
+                        getattr(self, f'_{method}')(fin, fout, st.st_size)
+                    except OSError as e:
+                        if method == self.STREAM or \
+                           e.errno not in self.UNSUPPORTED_ERRNOS:
+                            raise e
+                        if logger.isEnabledFor(logging.DEBUG):
+                            logger.debug(f'{method} not supported for ' +
+                                         f'{src} -> {dst}: {e}')
+                        unsupported.add(method)
+                        fin.seek(0)
+                        fout.seek(0)
+                        fout.truncate()
+                        continue
+                    break
+        shutil.copystat(src, dst)
+        self.counts[method] += 1
+        return method
+
+    def log_counts(self):
+        """Log the number of files copied by each method."""
+        if logger.isEnabledFor(logging.INFO):
+            counts: str = ', '.join(
+                map(lambda c: f'{c[1]} {c[0]}',
+                    filter(lambda c: c[1] > 0, self.counts.items())))
+            logger.info(f'copied files: {counts or "none"}')
@@ -3,14 +3,14 @@
 """
 __author__ = 'Paul Landes'
 
-from typing import List, Iterable
+from typing import List, Iterable, Optional, BinaryIO
 import logging
 from pathlib import Path
 from zensols.config import YamlConfig
 from zensols.persist import persisted
 from zensols.grsync import (
     RepoSpec, Discoverer, Distribution, FreezeManager, ThawManager,
-    PathTranslator, DistributionMover
+    PathTranslator, DistributionMover, ArchiveFormat, MirrorCache
 )
 
 logger = logging.getLogger(__name__)
@@ -25,7 +25,12 @@ class DistManager(object):
     """
     def __init__(self, config: YamlConfig, dist_dir: Path = None,
                  target_dir: Path = None, profiles: List[str] = None,
-                 repo_preference: str = None, dry_run: bool = False):
+                 repo_preference: str = None, dry_run: bool = False,
+                 workers: int = None, no_cache: bool = False,
+                 rebuild_cache: bool = False, archive_format: str = None,
+                 mirror_dir: Path = None, extract_workers: int = None,
+                 sync: bool = False, checksum: bool = False,
+                 backup: bool = False, link_readonly: bool = False):
         """Initialize.
 
         :param config: the app config
@@ -35,6 +40,26 @@ class DistManager(object):
         :param profiles: the (maven like) profiles that define what to freeze
         :param repo_preference: the repository to make master on thaw (default
                                 to configuration file)
+        :param workers: the number of threads used to discover repositories
+                        on freeze and clone them on thaw (default to
+                        configuration file)
+        :param no_cache: if ``True`` do not use the discovery cache
+        :param rebuild_cache: if ``True`` rebuild the discovery cache
+        :param archive_format: the format of the distribution file to freeze
+                               (default to configuration file or ``zip``),
+                               which is detected on thaw
+        :param mirror_dir: if provided, the directory of the bare mirrors of
+                           remotes from which objects are borrowed on thaw
+        :param extract_workers: the number of threads used to extract files on
+                                thaw (default to the number of processors)
+        :param sync: replace existing files that differ from the distribution
+                     on thaw rather than skipping them
+        :param checksum: compare the content of files with the same size and
+                         modify time on a synchronizing thaw
+        :param backup: keep files replaced by a synchronizing thaw with a
+                       ``~`` suffix
+        :param link_readonly: hard link rather than copy read only files when
+                              copying a distribution
 
         """
         self.config = config
@@ -54,13 +79,20 @@ class DistManager(object):
         self.profiles = profiles
         self.repo_preference = repo_preference
         self.dry_run = dry_run
+        self.workers = workers
+        self.no_cache = no_cache
+        self.rebuild_cache = rebuild_cache
+        self.archive_format = archive_format
+        self.mirror_dir = mirror_dir
+        self.extract_workers = extract_workers
+        self.sync = sync
+        self.checksum = checksum
+        self.backup = backup
+        self.link_readonly = link_readonly
         # configuration directory in the zip distribution
         self.config_dir = 'conf'
         # definitions file contains all the metadata (files, links etc)
         self.defs_file = '{}/dist.json'.format(self.config_dir)
-        # the main distribution compressed file that will have the
-        # configuration needed to thaw, all saved files and symbolic links.
-        self.dist_file = Path(self.dist_dir, 'dist.zip')
         # resovle path to and from the target directory
         self.path_translator = PathTranslator(self.target_dir)
         self._app_version = None
@@ -73,12 +105,52 @@ class DistManager(object):
     def app_version(self, app_version: str):
         self._app_version = app_version
 
+    def _get_archive_format(self) -> Optional[str]:
+        """Return the format given on initialization or by configuration."""
+        fmt: str = self.archive_format
+        if fmt is None and self.config is not None and \
+           self.config.has_option(FreezeManager.ARCHIVE_FORMAT):
+            fmt = self.config.get_option(FreezeManager.ARCHIVE_FORMAT)
+        return fmt
+
+    @property
+    @persisted('_dist_file')
+    def dist_file(self) -> Path:
+        """The main distribution compressed file that has the configuration
+        needed to thaw, all saved files and symbolic links.  Without a
+        configured format, it is the most recent distribution file.
+
+        """
+        fmt: str = self._get_archive_format()
+        if fmt is None:
+            return ArchiveFormat.find(Path(self.dist_dir))
+        return ArchiveFormat.dist_file(Path(self.dist_dir), fmt)
+
+    @property
+    @persisted('_freeze_file')
+    def freeze_file(self) -> Path:
+        """The distribution file created by a freeze, which is a zip file
+        without a configured format.
+
+        """
+        fmt: str = self._get_archive_format()
+        return ArchiveFormat.dist_file(
+            Path(self.dist_dir), ArchiveFormat.ZIP if fmt is None else fmt)
+
     @property
     @persisted('_discoverer')
     def discoverer(self) -> Discoverer:
         return Discoverer(
             self.config, self.profiles, self.path_translator,
-            self.repo_preference)
+            self.repo_preference, self.workers, not self.no_cache,
+            self.rebuild_cache)
+
+    @property
+    @persisted('_mirror')
+    def mirror(self) -> Optional[MirrorCache]:
+        """The mirrors of remotes used on thaw if configured."""
+        if self.mirror_dir is not None:
+            return MirrorCache(Path(self.mirror_dir).expanduser())
 
     def get_repo_specs(self) -> Iterable[RepoSpec]:
         """The information on each git repository found by the GRSync
@@ -117,23 +189,66 @@ class DistManager(object):
 
     def freeze(self, wheel_dependency=None):
         """Freeze the current configuration and file set to the distribution
-        zip.
+        file.
 
         """
         fmng = FreezeManager(
-            self.config, self.dist_file, self.defs_file, self.discoverer,
+            self.config, self.freeze_file, self.defs_file, self.discoverer,
             self.app_version,
             dry_run=self.dry_run)
         fmng.freeze(wheel_dependency)
 
+    def freeze_stream(self, out: BinaryIO):
+        """Freeze the current configuration and file set as a stream written to
+        ``out`` rather than the distribution zip.
+
+        """
+        fmng = FreezeManager(
+            self.config, self.freeze_file, self.defs_file, self.discoverer,
+            self.app_version,
+            dry_run=self.dry_run)
+        fmng.freeze_stream(out)
+
     def thaw(self):
-        """Expand the distribution zip on to the file system.
+        """Expand the distribution file on to the file system.
 
         """
         tmng = ThawManager(self.distribution, self.path_translator,
-                           self.app_version, self.dry_run)
+                           self.app_version, self.dry_run, self.workers,
+                           self.mirror, self.extract_workers, self.sync,
+                           self.checksum, self.backup)
         tmng.thaw()
 
+    def thaw_stream(self, fileobj: BinaryIO):
+        """Expand a distribution stream read from ``fileobj`` on to the file
+        system.
+
+        """
+        tmng = ThawManager(None, self.path_translator,
+                           self.app_version, self.dry_run, self.workers,
+                           self.mirror, sync=self.sync, backup=self.backup)
+        tmng.thaw_stream(fileobj, self.defs_file)
+
+    def unshallow(self):
+        """Fetch what was left out of the thawed repositories by the clone
+        options (i.e. history of shallow clones).
+
+        """
+        count: int = 0
+        for repo in self.distribution.repos:
+            if not repo.exists:
+                logger.warning(f'repo not thawed: {repo.path}--skipping')
+            elif self.dry_run:
+                logger.info(f'unshallow: {repo.path}')
+            else:
+                try:
+                    if repo.unshallow():
+                        count += 1
+                except Exception as e:
+                    logger.error(f'could not unshallow {repo.path}: {e}')
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(f'unshallowed {count} repos')
+
     def move(self, destination_path, dir_reduce=True):
         """Move a thawed file set to ``destination_path``.  If ``dir_reduce`` is
         ``True`` then recursively remove directories.
@@ -154,5 +269,6 @@ class DistManager(object):
         disc = self.discoverer
         dist = Distribution.from_discoverer(disc, self.dist_dir)
         tmng = ThawManager(dist, self.path_translator,
-                           self.app_version, self.dry_run)
+                           self.app_version, self.dry_run,
+                           link_readonly=self.link_readonly)
         tmng.thaw_from_in_memory(self.target_dir)
@@ -3,19 +3,24 @@
 """
 from __future__ import annotations
 __author__ = 'Paul Landes'
-from typing import Dict, Any, Iterable
+from typing import Dict, Any, Iterable, TextIO
+from contextlib import contextmanager
+from functools import partial
 import logging
+import io
 from pathlib import Path
 import platform
 import zipfile
-import json
 from zensols.persist import persisted, PersistedWork
 from zensols.grsync import (
     FrozenRepo,
     FileEntry,
     LinkEntry,
+    EntryCollection,
     PathTranslator,
     Discoverer,
+    ManifestReader,
+    ArchiveFormat,
 )
 
 logger = logging.getLogger(__name__)
@@ -43,6 +48,21 @@ class Distribution(object):
         self.path_translator = path_translator
         self.params = {'os': platform.system().lower()}
 
+    @classmethod
+    def from_manifest(cls: type, manifest: ManifestReader,
+                      target_dir: Path) -> Distribution:
+        """Return a distrbution from definitions that have already been read.
+
+        :param manifest: reads the distribution definitions
+
+        :param target_dir: where the distribution will be *thawed*
+
+        """
+        self = cls(None, None, target_dir, PathTranslator(target_dir))
+        self._manifest = PersistedWork(
+            '_manifest', self, initial_value=manifest)
+        return self
+
     @classmethod
     def from_struct(cls: type, struct: Dict[str, Any],
                     target_dir: Path) -> Distribution:
@@ -55,9 +75,7 @@ class Distribution(object):
         :param target_dir: where the distribution will be *thawed*
 
         """
-        self = cls(None, None, target_dir, PathTranslator(target_dir))
-        self._struct = PersistedWork('_struct', self, initial_value=struct)
-        return self
+        return cls.from_manifest(ManifestReader.from_struct(struct), target_dir)
 
     @classmethod
     def from_discoverer(cls: type, discoverer: Discoverer,
@@ -73,17 +91,49 @@ class Distribution(object):
         fspec = discoverer.freeze(True)
         return cls.from_struct(fspec, target_dir)
 
+    @contextmanager
+    def _open_zip_defs(self) -> Iterable[TextIO]:
+        with zipfile.ZipFile(str(self.path.resolve())) as zf:
+            with zf.open(self.defs_file) as f:
+                yield io.TextIOWrapper(f, encoding='utf-8')
+
+    @property
+    @persisted('_manifest')
+    def manifest(self) -> ManifestReader:
+        """Reads the definitions (meta data) of the distribution.
+
+        """
+        if self.archive_format == ArchiveFormat.ZIP:
+            return ManifestReader(self._open_zip_defs)
+        # tar distributions have the definitions written next to them so the
+        # archive need not be decompressed to read them; the definitions are
+        # written after the archive and are not used if they are older
+        sidecar: Path = ArchiveFormat.sidecar_file(self.path)
+        if sidecar.is_file() and \
+           sidecar.stat().st_mtime >= self.path.stat().st_mtime:
+            return ManifestReader(partial(open, sidecar, encoding='utf-8'))
+        with open(self.path, 'rb') as f:
+            with ArchiveFormat.open_tar(f) as tf:
+                for tinfo in tf:
+                    if tinfo.name == self.defs_file:
+                        defs: str = tf.extractfile(tinfo).read().decode()
+                        return ManifestReader(partial(io.StringIO, defs))
+        raise ValueError(f'no distribution definitions in {self.path}')
+
     @property
-    @persisted('_struct')
     def struct(self) -> Dict[str, Any]:
-        """Return the JSON deserialized (meta data) of the distribution.
+        """Return the distribution definitions except the files.
 
         """
-        with zipfile.ZipFile(str(self.path.resolve())) as zf:
-            with zf.open(self.defs_file) as f:
-                jstr = f.read().decode('utf-8')
-                struct = json.loads(jstr)
-        return struct
+        return self.manifest.header
+
+    @property
+    @persisted('_archive_format')
+    def archive_format(self) -> str:
+        """The format of the distribution file (see :class:`.ArchiveFormat`).
+
+        """
+        return ArchiveFormat.detect_file(self.path)
 
     @property
     def version(self) -> str:
@@ -96,26 +146,30 @@ class Distribution(object):
 
     @property
     @persisted('_files')
-    def files(self) -> Iterable[FileEntry]:
-        """Get the files in the distribution.
+    def files(self) -> EntryCollection:
+        """Get the files in the distribution, which are read from the
+        definitions each time they are iterated until looked up by path.
 
         """
-        return map(lambda fi: FileEntry(self, fi), self.struct['files'])
+        return EntryCollection(lambda: map(
+            lambda fi: FileEntry(self, fi), self.manifest.files()))
 
     @property
     @persisted('_empty_dirs')
-    def empty_dirs(self) -> Iterable[FileEntry]:
+    def empty_dirs(self) -> EntryCollection:
         """Get empty directories defined in the dist configuration.
         """
-        return map(lambda fi: FileEntry(self, fi), self.struct['empty_dirs'])
+        return EntryCollection(lambda: map(
+            lambda fi: FileEntry(self, fi), self.struct['empty_dirs']))
 
     @property
     @persisted('_links')
-    def links(self) -> Iterable[LinkEntry]:
+    def links(self) -> EntryCollection:
         """Pattern links and symbolic links not pointing to repositories.
 
         """
-        return map(lambda fi: LinkEntry(self, fi), self.struct['links'])
+        return EntryCollection(lambda: map(
+            lambda fi: LinkEntry(self, fi), self.struct['links']))
 
     @property
     @persisted('_repos')
@@ -125,11 +179,16 @@ class Distribution(object):
         """
         repos = []
         repo_pref = self.struct['repo_pref']
+        clone: Dict[str, Any] = self.struct.get('clone') or {}
+        clone = {k: v for k, v in clone.items() if k in FrozenRepo.CLONE_KEYS}
         for rdef in self.struct['repo_specs']:
             links = tuple(map(lambda fi: LinkEntry(self, fi),
                               rdef['links']))
+            # options of the repository override the global options
+            opts: Dict[str, Any] = dict(clone)
+            opts.update(rdef.get('clone') or {})
             repo = FrozenRepo(rdef['remotes'], links, self.target_dir,
                               self.path_translator.expand(rdef['path']),
-                              repo_pref, self.path_translator)
+                              repo_pref, self.path_translator, opts)
             repos.append(repo)
         return repos
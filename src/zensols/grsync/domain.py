@@ -1,13 +1,20 @@
 """Domain and container classes, mostly modeling Git repos.
 
 """
+from __future__ import annotations
 __author__ = 'Paul Landes'
 
+from typing import (
+    TYPE_CHECKING, Tuple, List, Dict, Iterable, Callable, Union, Any
+)
 import logging
-from git import Remote
+import bisect
 from pathlib import Path
 from zensols.persist import persisted
 
+if TYPE_CHECKING:
+    from git import Remote
+
 logger = logging.getLogger(__name__)
 
 
@@ -18,9 +25,15 @@ class PathTranslator(object):
     def __init__(self, target_path):
         self.target_path = target_path
 
+    @property
+    @persisted('_resolved_target_path')
+    def resolved_target_path(self) -> Path:
+        """The target path resolved once."""
+        return self.target_path.resolve()
+
     def relative_to(self, path):
         """Return a path that's relative to the user's home directory."""
-        return path.relative_to(self.target_path.resolve())
+        return path.relative_to(self.resolved_target_path)
 
     def to_relative(self, path):
         return str(Path(self.target_path, path).absolute())
@@ -47,8 +60,9 @@ class SymbolicLink(object):
         self.use_count = 0
 
     @property
+    @persisted('_target')
     def target(self):
-        """The target (where it point to).
+        """The target (where it point to), which is resolved only once.
 
         """
         return self.source.resolve()
@@ -91,13 +105,77 @@ class SymbolicLink(object):
         return self.__str__()
 
 
+class LinkIndex(object):
+    """A path component trie of symbolic link targets used to find the links
+    that point in to a directory (i.e. a repository).  Each link is resolved
+    only once, and finding the links of a directory costs the depth of the
+    directory plus the number of links found, rather than a check of every
+    link.
+
+    """
+    _LINKS = None
+    """The trie node key of the links that point to the node's path, which can
+    not clash with a path component."""
+
+    def __init__(self, links: Iterable[SymbolicLink]):
+        """Initialize.
+
+        :param links: the links to index by target
+
+        """
+        self.links = tuple(links)
+        self._root: Dict[Any, Any] = {}
+        i: int
+        link: SymbolicLink
+        for i, link in enumerate(self.links):
+            node: Dict[Any, Any] = self._root
+            for part in link.target.parts:
+                node = node.setdefault(part, {})
+            node.setdefault(self._LINKS, []).append((i, link))
+
+    def find(self, path: Path) -> Tuple[SymbolicLink, ...]:
+        """Return the links that point to ``path`` or any path under it in the
+        order they were given at initialization.  The use count of each link
+        found is incremented.
+
+        """
+        node: Dict[Any, Any] = self._root
+        for part in path.parts:
+            node = node.get(part)
+            if node is None:
+                return ()
+        found: List[Tuple[int, SymbolicLink]] = []
+        stack: List[Dict[Any, Any]] = [node]
+        while len(stack) > 0:
+            node = stack.pop()
+            for k, v in node.items():
+                if k is self._LINKS:
+                    found.extend(v)
+                else:
+                    stack.append(v)
+        found.sort(key=lambda t: t[0])
+        links: Tuple[SymbolicLink, ...] = tuple(map(lambda t: t[1], found))
+        for link in links:
+            link.increment_use_count()
+        return links
+
+
 class FileEntry(object):
     """Represents a file based entry in the frozen version of the distribution zip.
+    Instances have no attribute dictionary and cache only their paths, since
+    there is one for each file of (potentially large) distributions.
 
     """
+    __slots__ = ('dist', 'finfo', '_rel', '_path')
+
+    BLOB_DIR = 'blobs'
+    """The zip directory of file content in the ``blob`` layout."""
+
     def __init__(self, dist, finfo: dict):
         self.dist = dist
         self.finfo = finfo
+        self._rel = None
+        self._path = None
 
     def _str_to_path(self, pathstr: str):
         return Path(pathstr)
@@ -106,23 +184,24 @@ class FileEntry(object):
         return self.dist.path_translator.expand(path)
 
     @property
-    @persisted('_rel')
     def relative(self):
         """Return the relative path of the file.
 
         """
-        return Path(self._str_to_path(self.finfo['rel']))
+        if self._rel is None:
+            self._rel = self._str_to_path(self.finfo['rel'])
+        return self._rel
 
     @property
-    @persisted('_path')
     def path(self):
         """Return the absolute path of the file.
 
         """
-        return self._target_relative(self.relative)
+        if self._path is None:
+            self._path = self._target_relative(self.relative)
+        return self._path
 
     @property
-    @persisted('_mode')
     def mode(self):
         """Return the numeric mode of the file
 
@@ -130,7 +209,6 @@ class FileEntry(object):
         return self.finfo['mode']
 
     @property
-    @persisted('_modestr')
     def modestr(self):
         """Return a human readable string of the mode of the file.
 
@@ -138,13 +216,41 @@ class FileEntry(object):
         return self.finfo['modestr']
 
     @property
-    @persisted('_modify_time')
     def modify_time(self):
         """Return the numeric modify time of the file
 
         """
         return self.finfo['modify_time']
 
+    @property
+    def blob(self) -> str:
+        """Return the content hash of the file when the distribution has the
+        ``blob`` layout, otherwise ``None``.
+
+        """
+        return self.finfo.get('blob')
+
+    @property
+    def hardlink(self) -> Path:
+        """Return the absolute path of the file this file is hard linked to, or
+        ``None`` if it has its own content.
+
+        """
+        rel: str = self.finfo.get('hardlink')
+        if rel is not None:
+            return self._target_relative(self._str_to_path(rel))
+
+    @property
+    def member(self) -> str:
+        """Return the name of the zip entry that has the file's content, which
+        might be shared with other files.
+
+        """
+        blob = self.blob
+        if blob is None:
+            return str(self.relative)
+        return f'{self.BLOB_DIR}/{blob}'
+
     def __str__(self):
         return f'{self.relative} -> {self.path}: {self.mode} ({self.modestr})'
 
@@ -156,6 +262,8 @@ class LinkEntry(FileEntry):
     """Represents a symbolic link in the frozen version of the distribution zip.
 
     """
+    __slots__ = ('target_dir',)
+
     def __init__(self, dist, finfo: dict, target_dir=None):
         super(LinkEntry, self).__init__(dist, finfo)
         self.target_dir = target_dir
@@ -170,9 +278,10 @@ class LinkEntry(FileEntry):
             return super(LinkEntry, self)._target_relative(path)
 
     @property
-    @persisted('_rel')
     def relative(self):
-        return Path(self._str_to_path(self.finfo['source']))
+        if self._rel is None:
+            self._rel = self._str_to_path(self.finfo['source'])
+        return self._rel
 
     @property
     def source(self):
@@ -188,30 +297,134 @@ class LinkEntry(FileEntry):
         return f'{self.source} -> {self.target}'
 
 
+class EntryCollection(object):
+    """A reusable collection of the :class:`.FileEntry` (or
+    :class:`.LinkEntry`) instances of a distribution.  Entries are created
+    from the distribution definitions each time the collection is iterated
+    until an entry is looked up by its relative path or the collection is
+    sized, after which they are kept in memory and indexed.
+
+    """
+    def __init__(self, factory: Callable[[], Iterable[FileEntry]]):
+        """Initialize.
+
+        :param factory: creates a new iterable of the entries in the
+                        distribution's order
+
+        """
+        self._factory = factory
+        self._entries: Tuple[FileEntry, ...] = None
+        self._by_rel: Dict[str, FileEntry] = None
+        self._keys: List[str] = None
+
+    def _index(self):
+        """Create and index the entries if not already."""
+        if self._entries is None:
+            entries: Tuple[FileEntry, ...] = tuple(self._factory())
+            by_rel: Dict[str, FileEntry] = {}
+            entry: FileEntry
+            for entry in entries:
+                by_rel.setdefault(str(entry.relative), entry)
+            self._keys = sorted(by_rel.keys())
+            self._by_rel = by_rel
+            self._entries = entries
+
+    def get(self, rel: Union[str, Path], default: FileEntry = None) -> \
+            FileEntry:
+        """Return the entry with relative path ``rel`` or ``default`` if there
+        is no such entry.
+
+        """
+        self._index()
+        return self._by_rel.get(str(rel), default)
+
+    def prefix(self, rel: Union[str, Path]) -> Iterable[FileEntry]:
+        """Return the entry with relative path ``rel`` and all entries in
+        directory ``rel`` (recursively) sorted by relative path.
+
+        """
+        self._index()
+        rel = str(rel)
+        keys: List[str] = self._keys
+        if rel in self._by_rel:
+            yield self._by_rel[rel]
+        dprefix: str = rel + '/'
+        for i in range(bisect.bisect_left(keys, dprefix), len(keys)):
+            key: str = keys[i]
+            if not key.startswith(dprefix):
+                break
+            yield self._by_rel[key]
+
+    def __getitem__(self, rel: Union[str, Path]) -> FileEntry:
+        entry: FileEntry = self.get(rel)
+        if entry is None:
+            raise KeyError(rel)
+        return entry
+
+    def __contains__(self, rel: Union[str, Path]) -> bool:
+        return self.get(rel) is not None
+
+    def __iter__(self) -> Iterable[FileEntry]:
+        if self._entries is None:
+            return iter(self._factory())
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        self._index()
+        return len(self._entries)
+
+
 class RemoteSpec(object):
     """This class represents a remote for a git repo.
 
     """
-    def __init__(self, remote: Remote, is_master=None):
+    def __init__(self, remote: Remote = None, is_master=None,
+                 name: str = None, url: str = None, path: Path = None):
         """Initialize.
 
-        :param remote: a remote object from the git repo
+        :param remote: a remote object from the git repo, or ``None`` when
+                       created from the ``name`` and ``url``
 
         :param is_master: whether or not the remote is the primary (upstream)
                           remote
 
+        :param name: the name of the remote when ``remote`` is not given
+
+        :param url: the URL of the remote when ``remote`` is not given
+
+        :param path: the path of the repository used to load the remote when
+                     it is needed and ``remote`` is not given
+
         """
-        self.remote = remote
-        with remote.config_reader as cr:
-            self.url = cr.get('url')
+        self._remote = remote
+        self._path = path
+        if remote is None:
+            self._name = name
+            self.url = url
+        else:
+            with remote.config_reader as cr:
+                self.url = cr.get('url')
         self.is_master = is_master
 
+    @property
+    def remote(self) -> Remote:
+        """The remote object from the git repo, which is loaded (along with
+        GitPython) from the repository path on first access when not given.
+
+        """
+        if self._remote is None:
+            if self._path is None:
+                raise ValueError(f'no repository path for remote: {self}')
+            from git import Repo
+            self._remote = Repo(str(self._path.resolve())).remote(self._name)
+        return self._remote
+
     @property
     def name(self):
         """Return the remote's name.
 
         """
-        return self.remote.name
+        return self._name if self._remote is None else self._remote.name
 
     def rename(self, name, url=None):
         """Rename the remote in the git repository itself, along with the class
@@ -223,7 +436,11 @@ class RemoteSpec(object):
         with remote.config_writer as cw:
             if url is not None:
                 cw.set('url', url)
-            self.repo.git.config('branch.master.pushremote', name)
+        # the configuration is locked until the writer is released
+        remote.repo.git.config('branch.master.pushremote', name)
+        self._name = name
+        if url is not None:
+            self.url = url
 
     def freeze(self):
         """Freeze/create an object graph representation of the remote as a dict.
@@ -4,24 +4,49 @@ find matching objects to use to freeze the distribution.
 """
 __author__ = 'Paul Landes'
 
-from typing import Tuple, List, Dict, Iterable, Any
+from typing import (
+    Tuple, List, Dict, Set, Iterable, Iterator, Deque, Optional, TextIO,
+    BinaryIO, Any
+)
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+from functools import partial
+import io
 import os
 import stat
 import socket
+import hashlib
 import logging
 import itertools as it
 import re
-import json
+import fnmatch
+import time
+import shutil
+import tempfile
 import zipfile
+import zlib
 from pathlib import Path
 from datetime import datetime
 from zensols.persist import persisted
 from zensols.grsync import (
     RepoSpec,
+    FrozenRepo,
+    RepoScanner,
+    DirectoryLister,
+    DiscoveryCache,
     SymbolicLink,
+    LinkIndex,
+    FileEntry,
     BootstrapGenerator,
     PathTranslator,
     AppConfig,
+    ManifestWriter,
+    ManifestReader,
+    CompressionPolicy,
+    ZipArchiveWriter,
+    TarCodec,
+    TarArchiveWriter,
+    ArchiveFormat,
 )
 
 logger = logging.getLogger(__name__)
@@ -37,25 +62,65 @@ class Discoverer(object):
     REPO_PREF = 'discover.repo.remote_pref'
     SKIP_OBJECTS = 'discover.skip'
     SKIP_REPOS = 'discover.repo.skip'
+    NESTED_REPOS = 'discover.repo.nested'
+    REPO_WORKERS = 'discover.repo.workers'
+    CACHE_ENABLE = 'discover.cache.enable'
+    CACHE_STATS = 'discover.cache.stats'
 
     def __init__(self, config: AppConfig, profiles: list,
-                 path_translator: PathTranslator, repo_preference: str):
+                 path_translator: PathTranslator, repo_preference: str,
+                 workers: int = None, use_cache: bool = True,
+                 rebuild_cache: bool = False):
         self.config = config
         self.profiles_override = profiles
         self.path_translator = path_translator
         self._repo_preference = repo_preference
+        self._workers = workers
+        self._use_cache = use_cache
+        self._rebuild_cache = rebuild_cache
+        self.scan_stats: Dict[str, int] = {}
+        self._inodes: Dict[Tuple[int, int], str] = {}
+
+    @property
+    @persisted('_repo_skips')
+    def repo_skips(self) -> Tuple[re.Pattern, ...]:
+        """The compiled regular expressions of repository paths to skip."""
+        regexes = ()
+        if self.config.has_option(self.SKIP_REPOS):
+            regexes = self.config.get_option(self.SKIP_REPOS)
+        return tuple(map(re.compile, regexes))
+
+    @property
+    @persisted('_lister')
+    def lister(self) -> DirectoryLister:
+        """Lists directories for repository and file discovery, which is a
+        :class:`.DiscoveryCache` when enabled by configuration and not
+        disabled by the initializer.
+
+        """
+        enabled: bool = self._use_cache and \
+            self.config.has_option(self.CACHE_ENABLE) and \
+            self.config.get_option(self.CACHE_ENABLE)
+        if not enabled:
+            return DirectoryLister()
+        target: str = str(self.path_translator.target_path.absolute())
+        name: str = hashlib.sha1(target.encode()).hexdigest()[:16]
+        cache_file = self.config.cache_dir / f'discover-{name}.json'
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f'using discovery cache: {cache_file}')
+        entry_stats: bool = self.config.has_option(self.CACHE_STATS) and \
+            self.config.get_option(self.CACHE_STATS)
+        return DiscoveryCache(cache_file, self._rebuild_cache, entry_stats)
 
     def _get_repo_paths(self, paths) -> Iterable[Path]:
         """Recusively find git repository root directories."""
         if logger.isEnabledFor(logging.DEBUG):
             logger.debug('repo root search paths {}'.format(paths))
-        for path in paths:
-            if logger.isEnabledFor(logging.DEBUG):
-                logger.debug('searching git paths in {}'.format(path.resolve()))
-            for root, dirs, files in os.walk(path.resolve()):
-                rootpath = Path(root)
-                if rootpath.name == '.git':
-                    yield rootpath.parent
+        nested: bool = self.config.has_option(self.NESTED_REPOS) and \
+            self.config.get_option(self.NESTED_REPOS)
+        scanner = RepoScanner(self.repo_skips, nested, self.lister)
+        self.scan_stats = scanner.stats
+        return scanner.scan(paths)
 
     def _discover_repo_specs(self, paths: Iterable[Path],
                              links: Tuple[SymbolicLink, ...]) -> \
@@ -68,28 +133,64 @@ class Discoverer(object):
                       repository, and if so, add them to the RepoSpec
 
         """
-        if self.config.has_option(self.SKIP_REPOS):
-            regex: str
-            for regex in self.config.get_option(self.SKIP_REPOS):
-                if logger.isEnabledFor(logging.DEBUG):
-                    logger.debug(f"filter paths on regex: '{regex}'")
-                pat: re.Pattern = re.compile(regex)
-                paths = map(lambda t: t[0],
-                            filter(lambda t: t[1].match(str(t[0])) is None,
-                                   zip(paths, it.repeat(pat))))
         if logger.isEnabledFor(logging.DEBUG):
             logger.debug(f'repo spec paths: {paths}')
-        path: Path
-        for path in paths:
-            if logger.isEnabledFor(logging.DEBUG):
-                logger.debug(f'found repo at path {path}')
-            repo_spec = RepoSpec(path, self.path_translator)
-            repo_spec.add_linked(links)
+        link_index = LinkIndex(links)
+        repo_spec: RepoSpec
+        for repo_spec in self._create_repo_specs(paths):
+            repo_spec.add_linked(link_index)
             if len(repo_spec.remotes) == 0:
                 logger.warning(f'repo {repo_spec} has no remotes--skipping...')
             else:
                 yield repo_spec
 
+    @property
+    def repo_workers(self) -> int:
+        """The number of threads used to create :class:`.RepoSpec` instances,
+        which is taken from the initializer, then the configuration and
+        otherwise defaults to 1.
+
+        """
+        workers: int = self._workers
+        if workers is None and self.config.has_option(self.REPO_WORKERS):
+            workers = self.config.get_option(self.REPO_WORKERS)
+        return 1 if workers is None else max(1, int(workers))
+
+    def _create_repo_spec(self, path: Path) -> RepoSpec:
+        """Create a repo spec and read its remotes so the git I/O happens in the
+        calling (possibly worker) thread.
+
+        """
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f'found repo at path {path}')
+        repo_spec = RepoSpec(path, self.path_translator)
+        # read and cache the remotes in this thread
+        repo_spec.remotes
+        return repo_spec
+
+    def _create_repo_specs(self, paths: Iterable[Path]) -> \
+            Iterable[RepoSpec]:
+        """Create repo specs from ``paths`` in the order given.  When more than
+        one worker is configured, specs are created in a thread pool that is
+        kept at most twice the number of workers ahead of the consumer so the
+        scan of repositories is still streamed.
+
+        """
+        workers: int = self.repo_workers
+        if workers == 1:
+            yield from map(self._create_repo_spec, paths)
+        else:
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(f'creating repo specs with {workers} workers')
+            futures: Deque[Future] = deque()
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                for path in paths:
+                    futures.append(pool.submit(self._create_repo_spec, path))
+                    if len(futures) >= workers * 2:
+                        yield futures.popleft().result()
+                while len(futures) > 0:
+                    yield futures.popleft().result()
+
     @property
     @persisted('_profiles')
     def profiles(self):
@@ -125,20 +226,29 @@ class Discoverer(object):
             paths.extend(files)
         return paths
 
-    def _create_file(self, src, dst=None, no_path_obj=False, robust=False):
+    def _create_file(self, src, dst=None, no_path_obj=False, robust=False,
+                     st: os.stat_result = None):
         """Return a file object, which has the relative (rel) to home dir path,
-        absolute path (abs) used later to zip the file, and mode (mode and
-        modestr) information.
+        absolute path (abs) and size used later to zip the file, and mode (mode
+        and modestr) information.  Files hard linked to a file created earlier
+        have the relative path of that file (hardlink).
+
+        :param st: the (symbolic link followed) stat of ``src`` if already
+                   known, otherwise it is read with a single system call
 
         """
         dst = src if dst is None else dst
-        if src.exists():
-            mode = src.stat().st_mode
+        if st is None:
+            try:
+                st = os.stat(src)
+            except OSError:
+                if not robust:
+                    raise OSError(f'no such file: {src}')
+        if st is not None:
+            mode = st.st_mode
             modestr = stat.filemode(mode)
-            modify_time = os.path.getmtime(src)
-            create_time = os.path.getctime(src)
-        elif not robust:
-            raise OSError(f'no such file: {src}')
+            modify_time = st.st_mtime
+            create_time = st.st_ctime
         else:
             logger.warning(f'missing file: {src}--robustly skipping')
             mode, modestr, create_time, modify_time = None, None, None, None
@@ -154,8 +264,25 @@ class Discoverer(object):
         else:
             fobj['abs'] = src
             fobj['rel'] = self.path_translator.relative_to(dst)
+            if st is not None:
+                # used by the freeze and removed with the absolute path
+                fobj['size'] = st.st_size
+            if st is not None and st.st_nlink > 1 and stat.S_ISREG(mode):
+                self._add_hardlink(fobj, st)
         return fobj
 
+    def _add_hardlink(self, fobj: Dict[str, Any], st: os.stat_result):
+        """Add the relative path of the first file found with the same inode
+        as ``fobj`` as its ``hardlink`` so the content is frozen only once.
+
+        """
+        rel: str = str(fobj['rel'])
+        primary: str = self._inodes.setdefault((st.st_dev, st.st_ino), rel)
+        if primary != rel:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f'hardlink: {rel} -> {primary}')
+            fobj['hardlink'] = primary
+
     def _get_dirs_links_specs(self, files: List[Path]):
         # find all things to persist (repos, symlinks, files, etc)
         dobjs: List[Path] = self.get_discoverable_objects()
@@ -187,9 +314,63 @@ class Discoverer(object):
     def get_repo_specs(self) -> Iterable[RepoSpec]:
         """Return an iterable of :class:`.RepoSpec` instances."""
         dirs_or_gits, links, repo_specs = self._get_dirs_links_specs(None)
-        return repo_specs
+        yield from repo_specs
+        self.lister.save()
+
+    def _walk_files(self, root: Path, repo_paths: Set[Path]) -> \
+            Iterable[Dict[str, Any]]:
+        """Generate file objects (see :meth:`_create_file`) for files found
+        recursively in ``root`` that don't belong to git repos.  The tree is
+        walked depth first without recursion so any depth is supported, and
+        each file and directory costs a single ``stat`` (or none when cached
+        by :obj:`lister`).  Symbolic links to
+        files and directories are followed unless they point to a directory
+        being walked, which is found by its device and inode so links that
+        form a cycle through other links are also skipped.
+
+        """
+        lister: DirectoryLister = self.lister
+        st: os.stat_result = lister.stat(str(root))
+        stack: List[Tuple[Path, Iterator[Tuple[str, str]], Tuple[int, int]]] = \
+            [(root, iter(lister.listing(str(root)).items()),
+              (st.st_dev, st.st_ino))]
+        # the (device, inode) of the directories in the stack
+        walking: Set[Tuple[int, int]] = {stack[0][2]}
+        while len(stack) > 0:
+            par, ents, _ = stack[-1]
+            name: str
+            kind: str
+            for name, kind in ents:
+                c: Path = par / name
+                st = None
+                if kind == DirectoryLister.LINK:
+                    try:
+                        st = lister.stat(str(c))
+                    except OSError:
+                        # hanging link
+                        continue
+                    kind = DirectoryLister.DIR if stat.S_ISDIR(st.st_mode) \
+                        else DirectoryLister.FILE if stat.S_ISREG(st.st_mode) \
+                        else None
+                if kind == DirectoryLister.DIR and c not in repo_paths:
+                    if st is None:
+                        st = lister.stat(str(c))
+                    key: Tuple[int, int] = (st.st_dev, st.st_ino)
+                    if key in walking:
+                        logger.warning(f'skipping cyclic link: {c}')
+                        continue
+                    walking.add(key)
+                    stack.append(
+                        (c, iter(lister.listing(str(c)).items()), key))
+                    break
+                elif kind == DirectoryLister.FILE:
+                    if st is None:
+                        st = lister.stat(str(c))
+                    yield self._create_file(c, st=st)
+            else:
+                walking.discard(stack.pop()[2])
 
-    def discover(self, flatten: bool) -> Dict[str, Any]:
+    def discover(self, flatten: bool, stream: bool = False) -> Dict[str, Any]:
         """Main worker method to capture all the user home information (git
         repos, files, sym links and empty directories per the configuration
         file).
@@ -199,12 +380,16 @@ class Discoverer(object):
                         create the distrubtion so it shouldn't be used for the
                         freeze task
 
+        :param stream: if ``True`` the ``files`` entry is an iterable that
+                       finds files as it is iterated rather than a list
+
         """
-        files: List[Path] = []
+        files: List[Dict[str, Any]] = []
         dirs = []
         empty_dirs = []
         pattern_links = []
         path_trans = self.path_translator
+        self._inodes.clear()
         dirs_or_gits, links, repo_specs = self._get_dirs_links_specs(files)
         repo_specs: Tuple[RepoSpec, ...] = tuple(repo_specs)
         # these are the Path objects to where the repo lives on the local fs
@@ -218,20 +403,14 @@ class Discoverer(object):
         if logger.isEnabledFor(logging.DEBUG):
             logger.debug(f'files: {files}')
 
-        # recusively find files that don't belong to git repos
-        def gather(par):
-            for c in par.iterdir():
-                if c.is_dir() and c not in repo_paths:
-                    gather(c)
-                elif c.is_file():
-                    files.append(self._create_file(c))
-
-        # find files that don't belong to git repos
+        # find files that don't belong to git repos, which are walked as the
+        # files are iterated
+        walkers: List[Iterable[Dict[str, Any]]] = []
         for path in filter(lambda x: x not in repo_paths, dirs_or_gits):
             if logger.isEnabledFor(logging.DEBUG):
                 logger.debug('dir {}'.format(path))
             dirs.append({'abs': path, 'rel': path_trans.relative_to(path)})
-            gather(path)
+            walkers.append(self._walk_files(path, repo_paths))
 
         # configurated empty directories are added only if they exist so we can
         # recreate with the correct mode
@@ -256,18 +435,9 @@ class Discoverer(object):
                     {'source': str(path_trans.relative_to(src)),
                      'target': str(path_trans.relative_to(targ))})
 
-        # create data structures for symbolic link integrity
-        files_by_name = {f['abs']: f for f in files}
-        for f in files:
-            if f['abs'].is_file():
-                dname = f['abs'].parent
-                files_by_name[dname] = dname
-            if flatten:
-                del f['abs']
-                f['rel'] = str(f['rel'])
-
         # unused links pointing to repositories won't get created, so those not
         # used by repos are added explicitly to pattern links
+        unused_links: List[SymbolicLink] = []
         for link in links:
             if link.use_count == 0:
                 try:
@@ -277,20 +447,50 @@ class Discoverer(object):
                 except ValueError as e:
                     logger.error(f'couldn\'t create link: {link}')
                     raise e
-                if link.target in files_by_name:
-                    dst = files_by_name[link.target]
-                    # follow links enhancement picks up here
-                    if logger.isEnabledFor(logging.DEBUG):
-                        logger.debug(f'source {link.source} -> {dst}')
-                else:
-                    if logger.isEnabledFor(logging.INFO):
-                        logger.info(f'hanging link with no target: {link}')
+                unused_links.append(link)
 
+        files: Iterable[Dict[str, Any]] = self._check_link_targets(
+            it.chain(files, *walkers), unused_links, flatten)
+        if not stream:
+            files = list(files)
         return {'repo_specs': repo_specs,
                 'empty_dirs': empty_dirs,
                 'files': files,
                 'links': pattern_links}
 
+    def _check_link_targets(self, files: Iterable[Dict[str, Any]],
+                            links: List[SymbolicLink], flatten: bool) -> \
+            Iterable[Dict[str, Any]]:
+        """Generate ``files`` while keeping track of the ``links`` that point to
+        a file or the directory of a file, then log those that do not.  The
+        discovery cache is saved after the last file.
+
+        """
+        targets: Set[Path] = set(map(lambda lk: lk.target, links))
+        found: Set[Path] = set()
+        f: Dict[str, Any]
+        for f in files:
+            fabs: Path = f['abs']
+            if fabs in targets:
+                found.add(fabs)
+            if fabs.parent in targets:
+                found.add(fabs.parent)
+            if flatten:
+                del f['abs']
+                f.pop('size', None)
+                f['rel'] = str(f['rel'])
+            yield f
+        link: SymbolicLink
+        for link in links:
+            if link.target in found:
+                # follow links enhancement picks up here
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f'source {link.source} -> {link.target}')
+            else:
+                if logger.isEnabledFor(logging.INFO):
+                    logger.info(f'hanging link with no target: {link}')
+        self.lister.save()
+
     @property
     def repo_preference(self):
         """Return the preference for which repo to make primary on thaw
@@ -300,7 +500,7 @@ class Discoverer(object):
             (self.config.has_option(self.REPO_PREF) and
              self.config.get_option(self.REPO_PREF))
 
-    def freeze(self, flatten: bool = False):
+    def freeze(self, flatten: bool = False, stream: bool = False):
         """Main entry point method that creates an object graph of all the data
         that needs to be saved (freeze) in the user home directory to
         reconstitute later (thaw).
@@ -310,8 +510,11 @@ class Discoverer(object):
                         create the distrubtion so it shouldn't be used for the
                         freeze task
 
+        :param stream: if ``True`` the ``files`` entry is an iterable that
+                       finds files as it is iterated rather than a list
+
         """
-        disc = self.discover(flatten)
+        disc = self.discover(flatten, stream)
         repo_specs = tuple(x.freeze() for x in disc['repo_specs'])
         files = disc['files']
         if logger.isEnabledFor(logging.INFO):
@@ -331,6 +534,19 @@ class FreezeManager(object):
 
     """
     CREATE_WHEEL = 'discover.wheel.create'
+    COMPRESS_LEVEL = 'discover.compress.level'
+    COMPRESS_WORKERS = 'discover.compress.workers'
+    COMPRESS_POLICY = 'discover.compress.policy'
+    COMPRESS_SAMPLE = 'discover.compress.sample'
+    COMPRESS_REUSE = 'discover.compress.reuse'
+    COMPRESS_VERIFY = 'discover.compress.verify'
+    ARCHIVE_FORMAT = 'discover.compress.format'
+    CLONE = 'discover.repo.clone'
+    CLONE_REPOS = 'discover.repo.clone.repos'
+    CLONE_KEYS = ('workers', 'host_workers') + FrozenRepo.CLONE_KEYS
+    LAYOUT = 'discover.layout'
+    TREE_LAYOUT = 'tree'
+    BLOB_LAYOUT = 'blob'
 
     def __init__(self, config, dist_file, defs_file, discoverer, app_version,
                  dry_run: bool):
@@ -340,6 +556,7 @@ class FreezeManager(object):
         self.discoverer = discoverer
         self.app_version = app_version
         self.dry_run = dry_run
+        self.reuse_counts: Dict[str, int] = None
 
     def _create_wheels(self, wheel_dependency):
         """Create wheel dependencies on this software so the host doesn't need
@@ -362,30 +579,376 @@ class FreezeManager(object):
             logger.debug('pip cmd: {}'.format(pip_cmd))
         main(pip_cmd.split())
 
+    @property
+    def layout(self) -> str:
+        """The layout of the distribution zip, which is either ``tree`` to add
+        each file by its path, or ``blob`` to add unique file content by hash.
+
+        """
+        layout: str = self.TREE_LAYOUT
+        if self.config.has_option(self.LAYOUT):
+            layout = self.config.get_option(self.LAYOUT)
+        if layout not in {self.TREE_LAYOUT, self.BLOB_LAYOUT}:
+            raise ValueError(f'unknown distribution layout: {layout}')
+        return layout
+
+    @property
+    def compress_level(self) -> int:
+        """The configured compression level (defaults to 6)."""
+        level: int = 6
+        if self.config.has_option(self.COMPRESS_LEVEL):
+            level = int(self.config.get_option(self.COMPRESS_LEVEL))
+        return level
+
+    @property
+    def compress_workers(self) -> Optional[int]:
+        """The number of compression threads, or ``None`` for one for each
+        processor.
+
+        """
+        if self.config.has_option(self.COMPRESS_WORKERS):
+            return int(self.config.get_option(self.COMPRESS_WORKERS))
+
+    @property
+    def archive_codec(self) -> Optional[TarCodec]:
+        """The codec of the distribution file, or ``None`` if it is a zip
+        file.
+
+        """
+        return ArchiveFormat.codec(ArchiveFormat.from_path(self.dist_file))
+
+    def _create_archive_writer(self, zf: zipfile.ZipFile) -> ZipArchiveWriter:
+        """Create the writer that compresses files added to the distribution
+        zip using the compression level, policy and number of threads
+        configured.
+
+        """
+        level, workers = self.compress_level, self.compress_workers
+        rule_defs, sample = (), True
+        if self.config.has_option(self.COMPRESS_POLICY):
+            rule_defs = self.config.get_option(self.COMPRESS_POLICY)
+        if self.config.has_option(self.COMPRESS_SAMPLE):
+            sample = self.config.get_option(self.COMPRESS_SAMPLE)
+        policy = CompressionPolicy.from_config(rule_defs, sample)
+        return ZipArchiveWriter(zf, workers, level, policy)
+
+    def _open_previous(self) -> \
+            Tuple[Optional[zipfile.ZipFile], Dict[str, Tuple[Any, ...]]]:
+        """Open the previously frozen distribution so members of unchanged
+        files can be copied rather than compressed again.
+
+        :return: the previous distribution zip (or ``None`` if there isn't one
+                 or reuse is disabled) and its file entries as relative path to
+                 mode, modify time and blob ID (if any)
+
+        """
+        reuse: bool = True
+        if self.config.has_option(self.COMPRESS_REUSE):
+            reuse = self.config.get_option(self.COMPRESS_REUSE)
+        if not reuse or not self.dist_file.is_file():
+            return None, {}
+        try:
+            zf = zipfile.ZipFile(self.dist_file)
+            try:
+                reader = ManifestReader(lambda: io.TextIOWrapper(
+                    zf.open(self.defs_file), encoding='utf-8'))
+                entries = {fi['rel']: (fi['mode'], fi['modify_time'],
+                                       fi.get('blob'))
+                           for fi in reader.files()}
+            except Exception as e:
+                zf.close()
+                raise e
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile) as e:
+            logger.warning(f'can not reuse {self.dist_file}: {e}')
+            return None, {}
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(f'reusing {len(entries)} files from {self.dist_file}')
+        return zf, entries
+
+    @staticmethod
+    def _file_crc(path: Path) -> int:
+        """Return the CRC-32 of a file's content."""
+        crc: int = 0
+        with open(path, 'rb') as f:
+            for buf in iter(partial(f.read, 1024 * 1024), b''):
+                crc = zlib.crc32(buf, crc)
+        return crc
+
+    @staticmethod
+    def _file_blob(path: Path) -> str:
+        """Return the blob ID (content hash) of a file."""
+        with open(path, 'rb') as f:
+            return hashlib.file_digest(f, 'sha1').hexdigest()
+
+    def _get_previous_member(self, prev: zipfile.ZipFile,
+                             entries: Dict[str, Tuple[Any, ...]],
+                             finfo: Dict[str, Any], path: Path, size: int,
+                             verify: bool) -> \
+            Tuple[Optional[zipfile.ZipInfo], Optional[str]]:
+        """Return the previous distribution's member of a file if the file has
+        not changed since, otherwise ``None``.
+
+        :param path: the file on the file system
+
+        :param verify: whether to also compare the file's CRC-32
+
+        :return: the member and the blob ID of the file's content if the
+                 previous distribution has the ``blob`` layout
+
+        """
+        zinfo: zipfile.ZipInfo = None
+        entry: Tuple[Any, ...] = entries.get(finfo['rel'])
+        blob: str = None
+        if entry is not None and \
+           entry[0:2] == (finfo['mode'], finfo['modify_time']):
+            blob = entry[2]
+            member: str = finfo['rel'] if blob is None \
+                else f'{FileEntry.BLOB_DIR}/{blob}'
+            try:
+                zinfo = prev.getinfo(member)
+            except KeyError:
+                pass
+        if zinfo is not None:
+            if zinfo.file_size != size or \
+               (verify and zinfo.CRC != self._file_crc(path)):
+                zinfo = None
+        return zinfo, (None if zinfo is None else blob)
+
+    def _write_dist(self, zf: zipfile.ZipFile, data: Dict[str, Any],
+                    files: Iterable[Dict[str, Any]]):
+        """Add the discovered files and their definitions to the distribution
+        zip ``zf``.  In the ``blob`` layout, each file's entry has the ID of
+        its content, which is added to the zip only once.
+
+        """
+        counts: Dict[str, int] = {'reused': 0, 'changed': 0, 'new': 0}
+        verify: bool = self.config.has_option(self.COMPRESS_VERIFY) and \
+            self.config.get_option(self.COMPRESS_VERIFY)
+        use_blobs: bool = data['layout'] == self.BLOB_LAYOUT
+        blobs: Set[str] = set()
+        total_bytes, blob_bytes, hardlinks = 0, 0, 0
+        prev, entries = self._open_previous()
+        try:
+            with tempfile.TemporaryFile(
+                    'w+', encoding='utf-8', dir=self.dist_file.parent) as defs:
+                writer = ManifestWriter(defs)
+                writer.write_header(data)
+                with self._create_archive_writer(zf) as archive:
+                    for finfo in files:
+                        fabs = finfo['abs']
+                        frel = str(Path(finfo['rel']))
+                        finfo['rel'] = frel
+                        del finfo['abs']
+                        # the size is from the stat of the discovery
+                        size: int = finfo.pop('size', None)
+                        if 'hardlink' in finfo:
+                            # content is frozen with the first link
+                            hardlinks += 1
+                            writer.add_file(finfo)
+                            continue
+                        if size is None:
+                            size = os.stat(fabs).st_size
+                        zinfo: zipfile.ZipInfo = None
+                        blob: str = None
+                        arcname: str = frel
+                        if prev is not None:
+                            zinfo, blob = self._get_previous_member(
+                                prev, entries, finfo, fabs, size, verify)
+                        if zinfo is not None:
+                            counts['reused'] += 1
+                        else:
+                            counts['changed' if frel in entries
+                                   else 'new'] += 1
+                        if use_blobs:
+                            if blob is None:
+                                blob = self._file_blob(fabs)
+                            finfo['blob'] = blob
+                            total_bytes += size
+                            arcname = f'{FileEntry.BLOB_DIR}/{blob}'
+                            if blob in blobs:
+                                arcname = None
+                            else:
+                                blobs.add(blob)
+                                blob_bytes += size
+                        if arcname is None:
+                            if logger.isEnabledFor(logging.DEBUG):
+                                logger.debug(f'duplicate blob: {fabs}')
+                        elif zinfo is not None:
+                            archive.copy_member(prev, zinfo, arcname)
+                        else:
+                            if logger.isEnabledFor(logging.DEBUG):
+                                logger.debug(f'adding file: {fabs}')
+                            archive.add_file(fabs, arcname, size, frel)
+                        writer.add_file(finfo)
+                writer.write_footer()
+                if logger.isEnabledFor(logging.INFO):
+                    logger.info('writing distribution defs to ' +
+                                f'{self.defs_file}')
+                self._write_spooled(zf, self.defs_file, defs)
+        finally:
+            if prev is not None:
+                prev.close()
+        self.reuse_counts = counts
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(f"froze {counts['reused']} reused, " +
+                        f"{counts['changed']} changed, {counts['new']} " +
+                        f'new files and {hardlinks} hard links')
+            if use_blobs:
+                ratio: float = total_bytes / max(blob_bytes, 1)
+                logger.info(f'stored {writer.file_count} files in ' +
+                            f'{len(blobs)} blobs ({blob_bytes} of ' +
+                            f'{total_bytes} bytes), dedup ratio {ratio:.2f}')
+
     def _freeze_dist(self):
-        """Freeze the distribution (see the class documentation).
+        """Freeze the distribution (see the class documentation).  Files are
+        added to the zip as they are discovered and their definitions are
+        spooled to a temporary file that is added as the last entry so memory
+        use does not grow with the number of files.
+
+        The zip is written to a temporary file that replaces the distribution
+        once complete, so unchanged files are copied from the previous
+        distribution while it is being replaced.
 
         """
         dist_dir = self.dist_file.parent
         if not self.dry_run and not dist_dir.exists():
             dist_dir.mkdir(parents=True, exist_ok=True)
-        data = self.discoverer.freeze()
+        data = self._create_data()
+        data['layout'] = self.layout
+        files: Iterable[Dict[str, Any]] = data.pop('files')
+        if self.dry_run:
+            # discover files for logging consistent with creating the zip
+            for finfo in files:
+                pass
+        else:
+            codec: TarCodec = self.archive_codec
+            tmp_file: Path = self.dist_file.with_suffix('.tmp')
+            sidecar: Path = ArchiveFormat.sidecar_file(self.dist_file)
+            tmp_sidecar: Path = sidecar.with_suffix('.tmp')
+            try:
+                if codec is None:
+                    with zipfile.ZipFile(
+                            tmp_file, mode='w',
+                            compression=zipfile.ZIP_DEFLATED) as zf:
+                        self._write_dist(zf, data, files)
+                else:
+                    # tar distributions always have the tree layout
+                    data['layout'] = self.TREE_LAYOUT
+                    with open(tmp_file, 'wb') as f:
+                        self._write_tar(f, codec, data, files, tmp_sidecar)
+                os.replace(tmp_file, self.dist_file)
+                # the definitions are only in place once the archive is
+                if codec is not None:
+                    os.replace(tmp_sidecar, sidecar)
+            finally:
+                for path in (tmp_file, tmp_sidecar):
+                    if path.exists():
+                        path.unlink()
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(f'created frozen distribution in {self.dist_file}')
+
+    @property
+    def clone_options(self) -> Dict[str, Any]:
+        """The configured options used to clone repositories on thaw."""
+        opts: Dict[str, Any] = {}
+        for key in self.CLONE_KEYS:
+            name: str = f'{self.CLONE}.{key}'
+            if self.config.has_option(name):
+                opts[key] = self.config.get_option(name)
+        return opts
+
+    def _add_repo_clone_options(self, repo_specs: Iterable[Dict[str, Any]]):
+        """Add the clone options of the first rule in
+        ``discover.repo.clone.repos`` with a ``path`` glob that matches each
+        repository's relative path.
+
+        """
+        if not self.config.has_option(self.CLONE_REPOS):
+            return
+        rules: List[Dict[str, Any]] = list(map(
+            lambda r: r['repo'], self.config.get_option(self.CLONE_REPOS)))
+        for spec in repo_specs:
+            for rule in rules:
+                if fnmatch.fnmatch(spec['path'], rule['path']):
+                    spec['clone'] = {k: v for k, v in rule.items()
+                                     if k in FrozenRepo.CLONE_KEYS}
+                    break
+
+    def _create_data(self) -> Dict[str, Any]:
+        """Return the distribution definitions with discovered files."""
+        data = self.discoverer.freeze(stream=True)
         data['app_version'] = self.app_version
-        if not self.dry_run:
-            with zipfile.ZipFile(self.dist_file, mode='w') as zf:
-                for finfo in data['files']:
-                    fabs = finfo['abs']
+        clone: Dict[str, Any] = self.clone_options
+        if len(clone) > 0:
+            data['clone'] = clone
+        self._add_repo_clone_options(data['repo_specs'])
+        return data
+
+    def _write_tar(self, out: BinaryIO, codec: TarCodec,
+                   data: Dict[str, Any], files: Iterable[Dict[str, Any]],
+                   sidecar: Path = None):
+        """Write a compressed tar with the distribution files and their
+        definitions as the last member.
+
+        :param sidecar: if provided, also write the definitions to this file
+
+        """
+        with TarArchiveWriter(out, codec, self.compress_level,
+                              self.compress_workers) as archive:
+            with tempfile.TemporaryFile('w+', encoding='utf-8') as defs:
+                writer = ManifestWriter(defs)
+                writer.write_header(data)
+                for finfo in files:
+                    fabs = finfo.pop('abs')
+                    finfo.pop('size', None)
                     frel = str(Path(finfo['rel']))
-                    if logger.isEnabledFor(logging.DEBUG):
-                        logger.debug(f'adding file: {fabs}')
-                    zf.write(fabs, arcname=frel)
-                    del finfo['abs']
                     finfo['rel'] = frel
-                if logger.isEnabledFor(logging.INFO):
-                    logger.info(f'writing distribution defs to {self.defs_file}')
-                zf.writestr(self.defs_file, json.dumps(data, indent=2))
-        if logger.isEnabledFor(logging.INFO):
-            logger.info(f'created frozen distribution in {self.dist_file}')
+                    # content of hard linked files is added with the first
+                    if 'hardlink' not in finfo:
+                        if logger.isEnabledFor(logging.DEBUG):
+                            logger.debug(f'archiving file: {fabs}')
+                        archive.add_file(fabs, frel)
+                    writer.add_file(finfo)
+                writer.write_footer()
+                archive.add_spooled(self.defs_file, defs)
+                if sidecar is not None:
+                    defs.buffer.seek(0)
+                    with open(sidecar, 'wb') as f:
+                        shutil.copyfileobj(defs.buffer, f)
+
+    def freeze_stream(self, out: BinaryIO):
+        """Freeze the distribution as a compressed tar stream written to
+        ``out`` (i.e. standard out).  Files are added as they are discovered
+        and their definitions are added as the last member.  The stream always
+        has the ``tree`` layout and files are not reused from a previous
+        distribution.  The stream is compressed with the codec of the
+        configured archive format, or gzip if it is a zip file.
+
+        """
+        data = self._create_data()
+        data['layout'] = self.TREE_LAYOUT
+        files: Iterable[Dict[str, Any]] = data.pop('files')
+        if self.dry_run:
+            for finfo in files:
+                pass
+            return
+        codec: TarCodec = self.archive_codec
+        if codec is None:
+            codec = ArchiveFormat.CODECS['gz']
+        self._write_tar(out, codec, data, files)
+
+    @staticmethod
+    def _write_spooled(zf: zipfile.ZipFile, name: str, spool: TextIO):
+        """Copy the contents of file ``spool`` to zip file entry ``name``."""
+        zinfo = zipfile.ZipInfo(name, time.localtime()[:6])
+        zinfo.compress_type = zf.compression
+        spool.flush()
+        raw: BinaryIO = spool.buffer
+        # the size indicates whether to use ZIP64 extensions
+        zinfo.file_size = raw.seek(0, os.SEEK_END)
+        raw.seek(0)
+        with zf.open(zinfo, 'w') as f:
+            shutil.copyfileobj(raw, f)
 
     def freeze(self, wheel_dependency=None):
         """Freeze the distribution by saving creating a script to thaw along
@@ -0,0 +1,169 @@
+"""A lightweight git configuration file reader.
+
+"""
+__author__ = 'Paul Landes'
+
+from typing import Tuple, List, Dict, Optional
+import logging
+import re
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class GitConfig(object):
+    """Reads the repository level ``config`` file of a git repository without
+    GitPython, which is much faster when all that is needed are a few values
+    such as the remotes.  The ``gitdir:`` files used by worktrees and
+    submodules, the ``commondir`` of worktrees and ``include.path`` directives
+    are followed.  Conditional includes (``includeIf``) are not.
+
+    """
+    GIT_DIR = '.git'
+    MAX_INCLUDE_DEPTH = 10
+    _SECTION_REGEX = re.compile(
+        r'^\[\s*([A-Za-z0-9.-]+)\s*(?:"((?:[^"\\]|\\.)*)")?\s*\](.*)$')
+    _ESCAPES = {'n': '\n', 't': '\t', 'b': '\b', '"': '"', '\\': '\\'}
+
+    def __init__(self, config_file: Path):
+        """Initialize and parse the configuration.
+
+        :param config_file: the git configuration file to read
+
+        """
+        self.config_file = config_file
+        self._sections: Dict[Tuple[str, Optional[str]],
+                             Dict[str, List[str]]] = {}
+        self._parse(config_file, 0)
+
+    @classmethod
+    def git_dir(cls, path: Path) -> Path:
+        """Return the git directory of the working tree ``path``, which follows
+        ``gitdir:`` files.
+
+        """
+        git_path = path / cls.GIT_DIR
+        if git_path.is_file():
+            line: str = git_path.read_text().strip()
+            if not line.startswith('gitdir:'):
+                raise ValueError(f'not a gitdir file: {git_path}')
+            git_path = Path(path, line[len('gitdir:'):].strip())
+        if not git_path.is_dir():
+            raise ValueError(f'no git directory found in {path}')
+        return git_path
+
+    @classmethod
+    def from_repo_path(cls, path: Path) -> 'GitConfig':
+        """Return the configuration of the repository with working tree
+        ``path``.
+
+        """
+        git_dir: Path = cls.git_dir(path)
+        common_file: Path = git_dir / 'commondir'
+        if common_file.is_file():
+            git_dir = Path(git_dir, common_file.read_text().strip())
+        return cls(git_dir / 'config')
+
+    def _parse_value(self, val: str, lines: List[str]) -> str:
+        """Parse the value, which removes quotes and comments, expands escapes
+        and reads continuation lines from ``lines`` as needed.
+
+        """
+        chars: List[str] = []
+        # index of the end of the value excluding unquoted trailing space
+        end: int = 0
+        quoted: bool = False
+        i: int = 0
+        while i < len(val):
+            c: str = val[i]
+            if c == '\\':
+                if i + 1 >= len(val):
+                    # line continuation
+                    val = lines.pop() if len(lines) > 0 else ''
+                    i = 0
+                    continue
+                nc: str = val[i + 1]
+                if nc not in self._ESCAPES:
+                    raise ValueError(f'bad escape in {self.config_file}: {val}')
+                chars.append(self._ESCAPES[nc])
+                end = len(chars)
+                i += 2
+                continue
+            if c == '"':
+                quoted = not quoted
+            elif not quoted and (c == '#' or c == ';'):
+                break
+            elif quoted or not c.isspace():
+                chars.append(c)
+                end = len(chars)
+            elif len(chars) > 0:
+                # leading unquoted white space is dropped
+                chars.append(c)
+            i += 1
+        return ''.join(chars[:end])
+
+    def _parse(self, config_file: Path, depth: int):
+        if depth > self.MAX_INCLUDE_DEPTH:
+            raise ValueError(f'include depth exceeded at {config_file}')
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f'parsing git config: {config_file}')
+        # reversed to pop lines off the end for continuations
+        lines: List[str] = config_file.read_text().splitlines()[::-1]
+        section: Dict[str, List[str]] = None
+        includes: bool = False
+        while len(lines) > 0:
+            line: str = lines.pop().strip()
+            if len(line) == 0 or line[0] == '#' or line[0] == ';':
+                continue
+            if line[0] == '[':
+                m: re.Match = self._SECTION_REGEX.match(line)
+                if m is None:
+                    raise ValueError(
+                        f'bad section in {config_file}: {line}')
+                name, sub, line = m.groups()
+                name = name.lower()
+                if sub is not None:
+                    sub = re.sub(r'\\(.)', r'\1', sub)
+                elif '.' in name:
+                    # deprecated [section.subsection] syntax
+                    name, sub = name.split('.', 1)
+                section = self._sections.setdefault((name, sub), {})
+                includes = name == 'include' and sub is None
+                line = line.strip()
+                if len(line) == 0 or line[0] == '#' or line[0] == ';':
+                    continue
+            if section is None:
+                raise ValueError(f'entry with no section in {config_file}')
+            key, eq, val = line.partition('=')
+            key = key.strip().lower()
+            # a key with no value is a boolean true
+            val = self._parse_value(val, lines) if len(eq) > 0 else 'true'
+            section.setdefault(key, []).append(val)
+            if includes and key == 'path':
+                inc_path = Path(val).expanduser()
+                if not inc_path.is_absolute():
+                    inc_path = config_file.parent / inc_path
+                # git silently ignores missing include files
+                if inc_path.is_file():
+                    self._parse(inc_path, depth + 1)
+
+    def get(self, section: str, subsection: Optional[str], key: str,
+            default: str = None) -> Optional[str]:
+        """Return the last value of ``key`` in a section or ``default`` if
+        missing.
+
+        """
+        sec: Dict[str, List[str]] = self._sections.get(
+            (section.lower(), subsection), {})
+        vals: List[str] = sec.get(key.lower())
+        return default if vals is None else vals[-1]
+
+    def subsections(self, section: str) -> Tuple[str, ...]:
+        """Return the subsection names of ``section`` in the order they appear,
+        such as the names of the remotes for section ``remote``.
+
+        """
+        section = section.lower()
+        return tuple(map(lambda k: k[1],
+                         filter(lambda k: k[0] == section and k[1] is not None,
+                                self._sections.keys())))
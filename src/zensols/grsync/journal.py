@@ -0,0 +1,135 @@
+"""An on-disk journal used to resume a thaw.
+
+"""
+__author__ = 'Paul Landes'
+
+from typing import Dict, Set, Any, TextIO
+import logging
+import os
+import json
+import threading
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class ThawJournal(object):
+    """An append-only record of what a thaw has done so a thaw that did not
+    finish (i.e. interrupted while cloning) resumes where it left off.  Each
+    line after the header is a list of the kind (see :obj:`KINDS`) and path of
+    a file, empty directory, repository or link thawed.  The journal is
+    written in the target directory and removed when the thaw completes.
+
+    A journal is only resumed by a thaw of the same distribution, which is
+    given by the distribution identity written in the header.  A journal
+    without a path is kept only in memory.
+
+    """
+    VERSION = 1
+    """The version of the journal format."""
+
+    FILE_NAME = '.grsync-thaw.journal'
+    """The file name of the journal in the target directory."""
+
+    FILE = 'f'
+    DIRECTORY = 'd'
+    REPO = 'r'
+    LINK = 'l'
+    KINDS = frozenset((FILE, DIRECTORY, REPO, LINK))
+    """The kinds of journal entries."""
+
+    def __init__(self, path: Path = None, identity: Dict[str, Any] = None):
+        """Initialize.
+
+        :param path: the journal file or ``None`` to keep it in memory
+
+        :param identity: the distribution identity, or ``None`` to never resume
+
+        """
+        self.path = path
+        self.identity = identity
+        self.done: Dict[str, Set[str]] = {k: set() for k in self.KINDS}
+        # the number of entries read from a previous thaw
+        self.resumed = 0
+        self._writer: TextIO = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def journal_file(cls, target_dir: Path) -> Path:
+        """Return the journal file for a thaw in ``target_dir``."""
+        return target_dir / cls.FILE_NAME
+
+    def _read(self):
+        """Read the entries of a previous thaw of the distribution."""
+        with open(self.path, encoding='utf-8') as f:
+            try:
+                header = json.loads(f.readline())
+            except ValueError:
+                header = None
+            if not isinstance(header, dict) or \
+               header.get('journal') != self.VERSION or \
+               header.get('dist') != self.identity:
+                logger.warning(f'ignoring journal of another thaw: {self.path}')
+                return
+            for line in f:
+                try:
+                    kind, path = json.loads(line)
+                    self.done[kind].add(path)
+                    self.resumed += 1
+                except (ValueError, KeyError):
+                    # the last entry written when the thaw died
+                    logger.warning(f'skipping partial journal entry: {line}')
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(f'resuming thaw with {self.resumed} entries ' +
+                        f'from {self.path}')
+
+    def open(self):
+        """Read the journal of an interrupted thaw and start appending to it or
+        start a new journal.
+
+        """
+        if self.path is None:
+            return
+        if self.identity is not None and self.path.is_file():
+            self._read()
+        if self.resumed == 0:
+            self._writer = open(self.path, 'w', encoding='utf-8')
+            self._write({'journal': self.VERSION, 'dist': self.identity})
+        else:
+            self._writer = open(self.path, 'a', encoding='utf-8')
+
+    def _write(self, obj: Any):
+        self._writer.write(json.dumps(obj, separators=(',', ':')))
+        self._writer.write('\n')
+
+    def has(self, kind: str, path: Path) -> bool:
+        """Whether ``path`` was thawed by a previous thaw."""
+        return str(path) in self.done[kind]
+
+    def add(self, kind: str, path: Path):
+        """Record that ``path`` was thawed.  Entries are buffered, so at most a
+        buffer of entries is lost when the process is killed, and these paths
+        are found to already exist on the next thaw.
+
+        """
+        path = str(path)
+        with self._lock:
+            self.done[kind].add(path)
+            if self._writer is not None:
+                self._write((kind, path))
+
+    def close(self, complete: bool = False):
+        """Close the journal.
+
+        :param complete: whether the thaw finished, in which case the journal
+                         file is removed
+
+        """
+        if self._writer is not None:
+            self._writer.flush()
+            os.fsync(self._writer.fileno())
+            self._writer.close()
+            self._writer = None
+            if complete:
+                logger.debug(f'removing journal: {self.path}')
+                self.path.unlink()
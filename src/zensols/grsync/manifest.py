@@ -0,0 +1,169 @@
+"""Reads and writes the distribution definitions (manifest) file.
+
+"""
+from __future__ import annotations
+__author__ = 'Paul Landes'
+
+from typing import Dict, List, Any, Iterable, Callable, ContextManager, TextIO
+import logging
+import stat
+import json
+from zensols.persist import persisted, PersistedWork
+
+logger = logging.getLogger(__name__)
+
+
+class ManifestWriter(object):
+    """Incrementally writes the distribution definitions file.  All data
+    except the file entries is written by :meth:`write_header`, then each file
+    entry is written as it is added so the entries do not need to be kept in
+    memory.
+
+    The definitions are line delimited JSON.  The first line is an object
+    with the manifest format version (:obj:`VERSION`) and all data except the
+    files.  Each following line is either a string, which is the next entry in
+    the directory table, or a file record list of the index of the file's
+    directory in the table, its name, mode, create time, modify time and
+    optionally an object with any other entries (i.e. ``hardlink``).  The mode
+    string is not written since it is derived from the mode.
+
+    """
+    VERSION = 2
+    """The version of the manifest format, where version 1 is a single JSON
+    object written with indentation."""
+
+    VERSION_KEY = 'manifest'
+    """The header key of the manifest format version."""
+
+    FILE_KEYS = frozenset('rel mode modestr create_time modify_time'.split())
+    """The file entry keys that are written as record fields."""
+
+    def __init__(self, writer: TextIO):
+        """Initialize.
+
+        :param writer: the text sink of the manifest
+
+        """
+        self.writer = writer
+        self.file_count = 0
+        self._dirs: Dict[str, int] = {}
+
+    def _write(self, obj: Any):
+        self.writer.write(json.dumps(obj, separators=(',', ':')))
+        self.writer.write('\n')
+
+    def write_header(self, data: Dict[str, Any]):
+        """Write the start of the definitions with all entries of ``data``, which
+        must not include the files.
+
+        """
+        header: Dict[str, Any] = {self.VERSION_KEY: self.VERSION}
+        header.update(data)
+        self._write(header)
+
+    def add_file(self, finfo: Dict[str, Any]):
+        """Write a file entry."""
+        rel: str = str(finfo['rel'])
+        pos: int = rel.rfind('/')
+        dname, name = ('', rel) if pos < 0 else (rel[:pos], rel[pos + 1:])
+        dix: int = self._dirs.get(dname)
+        if dix is None:
+            dix = self._dirs[dname] = len(self._dirs)
+            self._write(dname)
+        rec: List[Any] = [dix, name, finfo['mode'], finfo['create_time'],
+                          finfo['modify_time']]
+        extra: Dict[str, Any] = {k: v for k, v in finfo.items()
+                                 if k not in self.FILE_KEYS}
+        if len(extra) > 0:
+            rec.append(extra)
+        self._write(rec)
+        self.file_count += 1
+
+    def write_footer(self):
+        """Write the end of the definitions."""
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f'wrote {self.file_count} file definitions in ' +
+                         f'{len(self._dirs)} directories')
+
+
+class ManifestReader(object):
+    """Reads the definitions written by :class:`.ManifestWriter` or the
+    (version 1) JSON definitions of earlier versions.  The file entries are
+    parsed lazily each time they are iterated.
+
+    """
+    def __init__(self, opener: Callable[[], ContextManager[TextIO]]):
+        """Initialize.
+
+        :param opener: a callable that opens the definitions for reading
+
+        """
+        self.opener = opener
+        self._files: List[Dict[str, Any]] = None
+
+    @classmethod
+    def from_struct(cls, struct: Dict[str, Any]) -> ManifestReader:
+        """Return a reader of definitions already in memory such as those
+        given by :meth:`.Discoverer.freeze`.
+
+        """
+        self = cls(None)
+        self._files = struct['files']
+        header = {k: v for k, v in struct.items() if k != 'files'}
+        self._header = PersistedWork('_header', self, initial_value=header)
+        return self
+
+    @property
+    @persisted('_header')
+    def header(self) -> Dict[str, Any]:
+        """All definitions except the files."""
+        with self.opener() as f:
+            line: str = f.readline()
+        try:
+            header = json.loads(line)
+        except ValueError:
+            header = None
+        if not isinstance(header, dict) or \
+           ManifestWriter.VERSION_KEY not in header:
+            # the legacy format is read in to memory
+            with self.opener() as f:
+                header = json.load(f)
+            self._files = header.pop('files')
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('read legacy distribution definitions')
+            return header
+        version: int = header.pop(ManifestWriter.VERSION_KEY)
+        if version > ManifestWriter.VERSION:
+            raise ValueError(f'unsupported manifest version: {version}')
+        return header
+
+    def _read_files(self) -> Iterable[Dict[str, Any]]:
+        dirs: List[str] = []
+        with self.opener() as f:
+            f.readline()
+            for line in f:
+                rec = json.loads(line)
+                if isinstance(rec, str):
+                    dirs.append(rec)
+                    continue
+                dname: str = dirs[rec[0]]
+                mode: int = rec[2]
+                finfo = {'rel': f'{dname}/{rec[1]}' if dname else rec[1],
+                         'mode': mode,
+                         'modestr': None if mode is None
+                         else stat.filemode(mode),
+                         'create_time': rec[3],
+                         'modify_time': rec[4]}
+                if len(rec) > 5:
+                    finfo.update(rec[5])
+                yield finfo
+
+    def files(self) -> Iterable[Dict[str, Any]]:
+        """Return an iterable of the file entries, which are read from the
+        definitions as they are iterated.
+
+        """
+        self.header
+        if self._files is not None:
+            return iter(self._files)
+        return self._read_files()
@@ -0,0 +1,130 @@
+"""Local bare mirrors of repository remotes.
+
+"""
+__author__ = 'Paul Landes'
+
+from typing import Dict, List, Tuple, TextIO
+import logging
+import os
+import re
+import sys
+import time
+import shutil
+import hashlib
+import threading
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class MirrorCache(object):
+    """A directory of bare mirrors of remote repositories keyed by URL.  Clones
+    borrow objects from the mirror of their remote (with ``--reference`` and
+    ``--dissociate``) so repeated thaws of the same repositories on a host
+    (i.e. containers) fetch only what is new in the remote.
+
+    """
+    def __init__(self, mirror_dir: Path):
+        """Initialize.
+
+        :param mirror_dir: the directory of the mirrors
+
+        """
+        self.mirror_dir = mirror_dir
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+
+    @staticmethod
+    def default_dir() -> Path:
+        """The mirror directory used when not given."""
+        cache_home: str = os.environ.get('XDG_CACHE_HOME')
+        root = Path(cache_home) if cache_home else Path('~/.cache')
+        return (root / 'grsync' / 'mirrors').expanduser()
+
+    def path(self, url: str) -> Path:
+        """Return the mirror directory of remote ``url``."""
+        name: str = re.sub(r'(\.git)?/*$', '', url)
+        name = re.sub(r'[^A-Za-z0-9._-]', '_', re.split(r'[/:]', name)[-1])
+        digest: str = hashlib.sha1(url.encode()).hexdigest()[:16]
+        return self.mirror_dir / f'{name}-{digest}.git'
+
+    def _lock(self, url: str) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks.setdefault(url, threading.Lock())
+
+    def update(self, url: str) -> Path:
+        """Create or fetch the mirror of remote ``url`` and return its path.
+        The mirror of a URL is updated by one thread at a time.
+
+        """
+        from git import Repo
+        path: Path = self.path(url)
+        with self._lock(url):
+            if path.is_dir():
+                logger.info(f'updating mirror of {url}: {path}')
+                Repo(path).git.fetch('--prune', 'origin')
+            else:
+                logger.info(f'creating mirror of {url}: {path}')
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp: Path = path.with_suffix('.tmp')
+                if tmp.exists():
+                    shutil.rmtree(tmp)
+                Repo.clone_from(url, tmp, mirror=True)
+                tmp.rename(path)
+            # the modify time of the directory is the last time it was used
+            os.utime(path)
+        return path
+
+    @staticmethod
+    def _size(path: Path) -> int:
+        size: int = 0
+        for root, dirs, files in os.walk(path):
+            for name in files:
+                size += os.lstat(os.path.join(root, name)).st_size
+        return size
+
+    def mirrors(self) -> List[Tuple[Path, str, int, float]]:
+        """Return the path, URL, size in bytes and last use time of each mirror
+        from least to most recently used.
+
+        """
+        from git import Repo
+        mirrors: List[Tuple[Path, str, int, float]] = []
+        if not self.mirror_dir.is_dir():
+            return mirrors
+        for path in self.mirror_dir.glob('*.git'):
+            try:
+                url: str = Repo(path).remotes.origin.url
+            except Exception as e:
+                logger.warning(f'not a mirror: {path}: {e}')
+                continue
+            mirrors.append((path, url, self._size(path),
+                            path.stat().st_mtime))
+        mirrors.sort(key=lambda m: m[3])
+        return mirrors
+
+    def write(self, writer: TextIO = sys.stdout):
+        """Write the size and last use of each mirror."""
+        total: int = 0
+        for path, url, size, mtime in self.mirrors():
+            used: str = time.strftime('%Y-%m-%d %H:%M', time.localtime(mtime))
+            writer.write(f'{url}: {size / 2**20:.1f}MiB, used {used}\n')
+            total += size
+        writer.write(f'total: {total / 2**20:.1f}MiB in {self.mirror_dir}\n')
+
+    def prune(self, max_age: float) -> int:
+        """Remove the mirrors not used in ``max_age`` days.
+
+        :return: the number of bytes removed
+
+        """
+        oldest: float = time.time() - (max_age * 24 * 60 * 60)
+        removed: int = 0
+        for path, url, size, mtime in self.mirrors():
+            if mtime < oldest:
+                logger.info(f'removing mirror of {url}: {path}')
+                shutil.rmtree(path)
+                removed += size
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(f'pruned {removed / 2**20:.1f}MiB of mirrors')
+        return removed
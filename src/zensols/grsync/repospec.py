@@ -1,15 +1,21 @@
 """This module includes repository domain classes.
 
 """
+from __future__ import annotations
 __author__ = 'Paul Landes'
 
-from typing import List, Dict, Any
+from typing import TYPE_CHECKING, List, Dict, Iterable, Union, Any, Optional
 import logging
 import sys
 from pathlib import Path
-from git import Repo
 from zensols.persist import persisted
-from zensols.grsync import LinkEntry, RemoteSpec, PathTranslator
+from zensols.grsync import (
+    SymbolicLink, LinkEntry, LinkIndex, RemoteSpec, PathTranslator, GitConfig
+)
+
+if TYPE_CHECKING:
+    from git import Repo
+    from zensols.grsync import MirrorCache
 
 logger = logging.getLogger(__name__)
 MASTER_SECTION = 'branch "master"'
@@ -50,13 +56,30 @@ class RepoSpec(object):
 
     @property
     def repo(self) -> Repo:
-        """Return the Git repository instance.
+        """Return the Git repository instance, which is created (and GitPython
+        loaded) on first access.
 
         """
         if self._repo is None:
+            from git import Repo
             self._repo = Repo(str(self.path.resolve()))
         return self._repo
 
+    @property
+    @persisted('_git_config')
+    def git_config(self) -> Optional[GitConfig]:
+        """The lightweight parsed repository configuration used to read the
+        remotes, or ``None`` if the configuration could not be parsed or a git
+        repository was given at initialization.
+
+        """
+        if self._repo is None:
+            try:
+                return GitConfig.from_repo_path(self.path)
+            except (OSError, ValueError) as e:
+                logger.warning(f'could not read git config in {self.path}: ' +
+                               f'{e}--using GitPython')
+
     @property
     def master_remote(self) -> str:
         """Return the first (preferred) remote that is used as the master for pull,
@@ -64,36 +87,52 @@ class RepoSpec(object):
 
         """
         if not hasattr(self, '_master_remote'):
-            config = self.repo.config_reader()
-            if config.has_section(MASTER_SECTION) and \
-               config.has_option(MASTER_SECTION, 'remote'):
-                self._master_remote = config.get(MASTER_SECTION, 'remote')
+            git_config: GitConfig = self.git_config
+            if git_config is not None:
+                self._master_remote = git_config.get('branch', 'master', 'remote')
             else:
-                self._master_remote = None
+                config = self.repo.config_reader()
+                if config.has_section(MASTER_SECTION) and \
+                   config.has_option(MASTER_SECTION, 'remote'):
+                    self._master_remote = config.get(MASTER_SECTION, 'remote')
+                else:
+                    self._master_remote = None
             logger.debug('path: {}, master remote: {}'.
                          format(self.path.resolve(), self._master_remote))
         return self._master_remote
 
     @property
+    @persisted('_remotes')
     def remotes(self) -> List[RemoteSpec]:
         """Return a list or remote specs used as the repo's remotes.
 
         """
         remotes = []
         master_remote = self.master_remote
-        for remote in self.repo.remotes:
-            is_master = remote.name == master_remote
-            remotes.append(RemoteSpec(remote, is_master))
+        git_config: GitConfig = self.git_config
+        if git_config is not None:
+            for name in git_config.subsections('remote'):
+                url: str = git_config.get('remote', name, 'url')
+                remotes.append(RemoteSpec(
+                    None, name == master_remote, name=name, url=url,
+                    path=self.path))
+        else:
+            for remote in self.repo.remotes:
+                is_master = remote.name == master_remote
+                remotes.append(RemoteSpec(remote, is_master))
         return remotes
 
-    def _is_linked_to(self, link):
-        is_linked = str(link.target).startswith(str(self.path))
-        if is_linked:
-            link.increment_use_count()
-        return is_linked
+    def add_linked(self, links: Union[LinkIndex, Iterable[SymbolicLink]]):
+        """Set :obj:`links` to the symbolic links that point in to this
+        repository and increment their use count.
 
-    def add_linked(self, links):
-        self.links = tuple(filter(lambda l: self._is_linked_to(l), links))
+        :param links: the links to search, which should be an index when
+                      linking more than one repository
+
+        """
+        if not isinstance(links, LinkIndex):
+            links = LinkIndex(links)
+        self.links = links.find(self.path)
 
     def freeze(self) -> Dict[str, Any]:
         """Freeze the data in this instance in to a tree of dicts usable in a JSON
@@ -155,9 +194,15 @@ class RepoSpec(object):
 
 
 class FrozenRepo(object):
+    CLONE_KEYS = ('depth', 'filter', 'single_branch', 'sparse')
+    """The keys of the clone options, which are a history depth, a partial
+    clone filter (i.e. ``blob:none``), whether to fetch only the default
+    branch, and sparse checkout patterns."""
+
     def __init__(self, remotes: List[Dict[str, str]], links: List[LinkEntry],
                  target_dir: Path, path: Path, repo_pref: str,
-                 path_translator: PathTranslator):
+                 path_translator: PathTranslator,
+                 clone: Dict[str, Any] = None):
         """Initialize.
 
         :param remotes: a list of dicts with keys ``name``, ``url`` and
@@ -175,6 +220,8 @@ class FrozenRepo(object):
 
         :param path_translator: translates the distribution root
 
+        :param clone: the clone options (see :obj:`CLONE_KEYS`)
+
         """
         self.remotes = remotes
         self.links = links
@@ -182,6 +229,7 @@ class FrozenRepo(object):
         self.path = path
         self.repo_pref = repo_pref
         self.path_translator = path_translator
+        self.clone = {} if clone is None else clone
 
     @property
     @persisted('_repo_spec')
@@ -219,11 +267,95 @@ class FrozenRepo(object):
             not_masters = not_masters[1:]
         return master, not_masters
 
-    def thaw(self) -> RepoSpec:
+    @property
+    def url(self) -> str:
+        """The URL of the remote that is cloned on thaw."""
+        return self._split_master_remote_defs()[0]['url']
+
+    def _clone(self, url: str, mirror: MirrorCache = None) -> Repo:
+        """Clone the repository with the clone options.
+
+        :param mirror: if provided, borrow objects from the (updated) mirror
+                       of the remote
+
+        """
+        from git import Repo
+        kwargs: Dict[str, Any] = {}
+        if mirror is not None:
+            try:
+                kwargs['reference'] = str(mirror.update(url))
+                kwargs['dissociate'] = True
+            except Exception as e:
+                logger.warning(f'can not use mirror of {url}: {e}')
+        depth: int = self.clone.get('depth')
+        filt: str = self.clone.get('filter')
+        sparse: List[str] = self.clone.get('sparse')
+        if isinstance(sparse, str):
+            sparse = [sparse]
+        if depth is not None:
+            kwargs['depth'] = int(depth)
+        if filt is not None:
+            kwargs['filter'] = filt
+        if self.clone.get('single_branch'):
+            kwargs['single_branch'] = True
+        if sparse:
+            kwargs['no_checkout'] = True
+        if len(kwargs) > 0 and logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f'clone options for {self.path}: {self.clone}')
+        repo = Repo.clone_from(url, self.path, recursive=True, **kwargs)
+        if sparse:
+            repo.git.sparse_checkout('set', '--no-cone', *sparse)
+            repo.git.checkout()
+            repo.git.submodule('update', '--init', '--recursive')
+        return repo
+
+    @staticmethod
+    def _git_config(repo: Repo, key: str) -> Optional[str]:
+        from git.exc import GitCommandError
+        try:
+            return repo.git.config('--get', key)
+        except GitCommandError:
+            return None
+
+    def unshallow(self) -> bool:
+        """Fetch the history, branches and file content left out by the clone
+        options and disable the sparse checkout of a thawed repository.
+
+        :return: whether the repository was changed
+
+        """
+        repo: Repo = self.repo_spec.repo
+        git = repo.git
+        name: str = repo.remotes[0].name
+        args: List[str] = []
+        if Path(repo.git_dir, 'shallow').exists():
+            args.append('--unshallow')
+        if self._git_config(repo, f'remote.{name}.partialclonefilter'):
+            git.config('--unset', f'remote.{name}.partialclonefilter')
+            if self._git_config(repo, f'remote.{name}.promisor'):
+                git.config('--unset', f'remote.{name}.promisor')
+            args.append('--refetch')
+        refspec: str = f'+refs/heads/*:refs/remotes/{name}/*'
+        fetch: bool = len(args) > 0
+        if self._git_config(repo, f'remote.{name}.fetch') != refspec:
+            git.remote('set-branches', name, '*')
+            fetch = True
+        if fetch:
+            logger.info(f'fetching {name} of {self.path} {" ".join(args)}')
+            git.fetch(*args, name)
+        sparse: str = self._git_config(repo, 'core.sparsecheckout')
+        if sparse == 'true':
+            logger.info(f'disabling sparse checkout of {self.path}')
+            git.sparse_checkout('disable')
+        return fetch or sparse == 'true'
+
+    def thaw(self, mirror: MirrorCache = None) -> RepoSpec:
         """Thaw a RepoSpec object, which does a clone and then creates the (remaining
         if any) remotes.  This also creates the symbol links that link into
         this repo.  Then return the object represented by the new repo.
 
+        :param mirror: if provided, borrow objects from the mirror of the remote
+
         """
         if self.path.exists():
             logger.warning('path already exists: {}--skipping repo clone'.
@@ -234,7 +366,7 @@ class FrozenRepo(object):
             name = master['name']
             url = master['url']
             logger.info(f'cloning repo: {url} -> {self.path}')
-            repo = Repo.clone_from(url, self.path, recursive=True)
+            repo = self._clone(url, mirror)
             repo.remotes[0].rename(name)
             for rmd in not_masters:
                 repo.create_remote(rmd['name'], rmd['url'])
@@ -247,7 +379,8 @@ class FrozenRepo(object):
                 par = link.source.parent
                 if not par.exists():
                     logger.info(f'creating link directory: {par}')
-                    par.mkdir(parents=True)
+                    # other repositories might be thawed concurrently
+                    par.mkdir(parents=True, exist_ok=True)
                 link.source.symlink_to(link.target)
         repo_spec.links = self.links
         return repo_spec
@@ -0,0 +1,270 @@
+"""File system scanning used to find repositories and files to freeze.
+
+"""
+__author__ = 'Paul Landes'
+
+from typing import Iterable, Sequence, List, Dict, Any
+import logging
+import os
+import re
+import json
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class DirectoryLister(object):
+    """Lists directories using :func:`os.scandir`.  Entries are given as a
+    kind, which is one of:
+
+      * ``d``: a directory (not a symbolic link to one)
+      * ``f``: a regular file
+      * ``l``: a symbolic link
+      * ``o``: any other type of file
+
+    The kind comes from the directory listing itself on most file systems so
+    no ``stat`` is needed for each entry.
+
+    """
+    DIR = 'd'
+    FILE = 'f'
+    LINK = 'l'
+    OTHER = 'o'
+
+    @classmethod
+    def _kind(cls, ent: os.DirEntry) -> str:
+        if ent.is_symlink():
+            return cls.LINK
+        elif ent.is_dir(follow_symlinks=False):
+            return cls.DIR
+        elif ent.is_file(follow_symlinks=False):
+            return cls.FILE
+        return cls.OTHER
+
+    def listing(self, path: str) -> Dict[str, str]:
+        """Return the entries of directory ``path`` as name to kind sorted by
+        name, or an empty listing if ``path`` can not be read.
+
+        """
+        try:
+            with os.scandir(path) as ents:
+                listing = {e.name: self._kind(e) for e in ents}
+        except OSError as e:
+            # same as os.walk, which ignores unreadable directories
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f'can not list {path}: {e}')
+            return {}
+        return dict(sorted(listing.items()))
+
+    def stat(self, path: str) -> os.stat_result:
+        """Return the (symbolic link followed) stat of ``path``, which is an
+        entry of a directory listed earlier.
+
+        :raises OSError: if ``path`` does not exist or is a hanging link
+
+        """
+        return os.stat(path)
+
+    def save(self):
+        """Persist any state (nothing to do for this class)."""
+        pass
+
+
+class DiscoveryCache(DirectoryLister):
+    """A directory lister that persists listings keyed on the directory's
+    modify time so unchanged directories are not listed again on the next
+    discovery.
+
+    A directory's modify time only changes when its own entries change, so
+    each cached directory is still validated with one ``stat``.  Directories
+    modified within :obj:`RACY_SECONDS` of being listed are not cached since a
+    later change might not change the modify time on file systems with coarse
+    timestamps.
+
+    The stat records of the entries (following symbolic links) are also
+    cached when ``entry_stats`` is set, and are used while their directory is
+    unchanged.  Editing a file, or the file a link points to, does not change
+    the directory, so a cached stat record (and the file's size, mode and
+    modify time in the distribution) is stale until its directory changes or
+    the cache is rebuilt.
+
+    """
+    VERSION = 2
+    RACY_SECONDS = 2
+
+    def __init__(self, cache_file: Path, rebuild: bool = False,
+                 entry_stats: bool = False):
+        """Initialize.
+
+        :param cache_file: the JSON file of directory listings
+
+        :param rebuild: if ``True`` ignore (and later overwrite) the persisted
+                        listings
+
+        :param entry_stats: whether to cache the stat records of the entries
+                            of unchanged directories
+
+        """
+        self.cache_file = cache_file
+        self.entry_stats = entry_stats
+        self.stats: Dict[str, int] = {'hits': 0, 'misses': 0}
+        self.stat_stats: Dict[str, int] = {'hits': 0, 'misses': 0}
+        self._entries: Dict[str, List[Any]] = {}
+        self._visited: Dict[str, List[Any]] = {}
+        if not rebuild:
+            self._load()
+
+    def _load(self):
+        if self.cache_file.is_file():
+            try:
+                with open(self.cache_file) as f:
+                    cache: Dict[str, Any] = json.load(f)
+                if cache.get('version') == self.VERSION:
+                    self._entries = cache['dirs']
+            except (OSError, ValueError) as e:
+                logger.warning(f'could not read cache {self.cache_file}: ' +
+                               f'{e}--rebuilding')
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f'loaded {len(self._entries)} cached directories ' +
+                         f'from {self.cache_file}')
+
+    def listing(self, path: str) -> Dict[str, str]:
+        try:
+            mtime: int = os.stat(path).st_mtime_ns
+        except OSError:
+            return super().listing(path)
+        ent: List[Any] = self._entries.get(path)
+        if ent is not None and ent[0] == mtime:
+            self.stats['hits'] += 1
+            self._visited[path] = ent
+            return ent[1]
+        self.stats['misses'] += 1
+        listing: Dict[str, str] = super().listing(path)
+        if time.time_ns() - mtime > self.RACY_SECONDS * 10 ** 9:
+            self._visited[path] = [mtime, listing, {}]
+        return listing
+
+    def stat(self, path: str) -> os.stat_result:
+        if not self.entry_stats:
+            return super().stat(path)
+        dname, name = os.path.split(path)
+        ent: List[Any] = self._visited.get(dname)
+        if ent is None:
+            return super().stat(path)
+        rec: List[Any] = ent[2].get(name)
+        if rec is not None:
+            self.stat_stats['hits'] += 1
+            return os.stat_result(
+                rec[:7] + list(map(int, rec[7:])),
+                {'st_atime': rec[7], 'st_mtime': rec[8], 'st_ctime': rec[9]})
+        self.stat_stats['misses'] += 1
+        st: os.stat_result = super().stat(path)
+        if time.time() - st.st_mtime > self.RACY_SECONDS:
+            ent[2][name] = [st.st_mode, st.st_ino, st.st_dev, st.st_nlink,
+                            st.st_uid, st.st_gid, st.st_size, st.st_atime,
+                            st.st_mtime, st.st_ctime]
+        return st
+
+    def save(self):
+        """Write the listings of the directories visited since created, which
+        drops directories that no longer exist or are no longer discovered.
+
+        """
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(f"discovery cache: {self.stats['hits']} hits, " +
+                        f"{self.stats['misses']} misses")
+            if self.entry_stats:
+                logger.info('discovery cache stats: ' +
+                            f"{self.stat_stats['hits']} hits, " +
+                            f"{self.stat_stats['misses']} misses")
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file: Path = self.cache_file.with_suffix('.tmp')
+        with open(tmp_file, 'w') as f:
+            json.dump({'version': self.VERSION, 'dirs': self._visited}, f)
+        os.replace(tmp_file, self.cache_file)
+
+
+class RepoScanner(object):
+    """Finds git repository root directories using :func:`os.scandir`.  Unlike
+    :func:`os.walk`, the scanner stops descending once it finds a repository
+    root (unless ``nested`` is set), never walks in to ``.git`` directories,
+    and prunes directories that match a skip regular expression before
+    descending in to them.
+
+    """
+    GIT_DIR = '.git'
+
+    def __init__(self, skip: Sequence[re.Pattern] = (), nested: bool = False,
+                 lister: DirectoryLister = None):
+        """Initialize.
+
+        :param skip: regular expressions matched against the absolute path of
+                     each directory; matching directories are neither reported
+                     nor descended
+
+        :param nested: whether to keep looking for repositories nested in the
+                       working tree of another repository
+
+        :param lister: used to list directories, which defaults to an uncached
+                       lister
+
+        """
+        self.skip = tuple(skip)
+        self.nested = nested
+        self.lister = DirectoryLister() if lister is None else lister
+        self.stats: Dict[str, int] = {'visited': 0, 'pruned': 0, 'repos': 0}
+
+    def _is_skipped(self, path: str) -> bool:
+        for pat in self.skip:
+            if pat.match(path) is not None:
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f'skipping {path} on regex: {pat.pattern}')
+                return True
+        return False
+
+    def _list_dirs(self, path: str) -> List[str]:
+        """Return the names of the (non-symbolic link) child directories of
+        ``path`` sorted by name so the order of the repositories is
+        deterministic.
+
+        """
+        return [n for n, k in self.lister.listing(path).items()
+                if k == DirectoryLister.DIR]
+
+    def scan(self, paths: Iterable[Path]) -> Iterable[Path]:
+        """Recursively find git repository root directories in ``paths``.
+
+        """
+        stats = self.stats
+        path: Path
+        for path in paths:
+            root = str(path.resolve())
+            if self._is_skipped(root):
+                stats['pruned'] += 1
+                continue
+            stack: List[str] = [root]
+            while len(stack) > 0:
+                dpath: str = stack.pop()
+                stats['visited'] += 1
+                dirs: List[str] = self._list_dirs(dpath)
+                if self.GIT_DIR in dirs:
+                    stats['repos'] += 1
+                    yield Path(dpath)
+                    if not self.nested:
+                        stats['pruned'] += len(dirs)
+                        continue
+                children: List[str] = []
+                name: str
+                for name in dirs:
+                    cpath: str = os.path.join(dpath, name)
+                    if name == self.GIT_DIR or self._is_skipped(cpath):
+                        stats['pruned'] += 1
+                    else:
+                        children.append(cpath)
+                # reverse so the stack pops in sorted order
+                stack.extend(reversed(children))
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(f"repo scan: visited {stats['visited']} directories, " +
+                        f"pruned {stats['pruned']}, found {stats['repos']} " +
+                        'repositories')
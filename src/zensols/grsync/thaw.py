@@ -3,25 +3,98 @@
 """
 __author__ = 'Paul Landes'
 
+from typing import List, Dict, Set, Tuple, Deque, Any, BinaryIO, Iterable
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
 import logging
-import traceback
 import os
+import stat
+import time
+import threading
 import zipfile
+import tarfile
 import shutil
+import tempfile
+import zlib
+from contextlib import contextmanager
+from functools import partial
 from pathlib import Path
-from git.exc import GitCommandError
-from zensols.grsync import PathTranslator, Distribution
+from zensols.grsync import (
+    PathTranslator, FileEntry, Distribution, ManifestReader, ArchiveFormat,
+    CloneScheduler, CloneResult, MirrorCache, ThawJournal, FileCopier
+)
 
 logger = logging.getLogger(__name__)
 
 
 class ThawManager(object):
+    NEW = 'new'
+    UPDATED = 'updated'
+    UNCHANGED = 'unchanged'
+    """The status of a file synchronized by the thaw (see :obj:`sync`)."""
+
+    BACKUP_SUFFIX = '~'
+    """The suffix of the backup files of files replaced by the thaw."""
+
+    COPY_BUFFER_SIZE = 1 << 20
+    """The size of the buffer used to extract files."""
+
+    PROGRESS_SECONDS = 5
+    """The number of seconds between logging the extraction progress."""
+
+    TEMP_SUFFIX = '.grsync-tmp'
+    """The suffix of the temporary files renamed to the thawed files."""
+
     def __init__(self, dist: Distribution, path_translator: PathTranslator,
-                 app_version: str, dry_run: bool = False):
+                 app_version: str, dry_run: bool = False,
+                 workers: int = None, mirror: MirrorCache = None,
+                 extract_workers: int = None, sync: bool = False,
+                 checksum: bool = False, backup: bool = False,
+                 link_readonly: bool = False):
+        """Initialize.
+
+        :param workers: the number of concurrent repository clones
+
+        :param mirror: if provided, borrow objects from the mirrors of remotes
+
+        :param extract_workers: the number of threads used to extract files,
+                                which defaults to the number of processors
+
+        :param sync: replace existing files that differ from the distribution
+                     rather than skipping them
+
+        :param checksum: compare the content of existing files with the same
+                         size and modify time when synchronizing
+
+        :param backup: rename replaced files with :obj:`BACKUP_SUFFIX`
+                       rather than removing them
+
+        :param link_readonly: hard link rather than copy read only files when
+                              thawing from the local file system
+
+        """
         self.dist = dist
         self.path_translator = path_translator
         self.app_version = app_version
         self.dry_run = dry_run
+        self.workers = workers
+        self.mirror = mirror
+        if extract_workers is None:
+            extract_workers = os.cpu_count() or 1
+        self.extract_workers = max(1, extract_workers)
+        self.clone_results: List[CloneResult] = []
+        self.sync = sync
+        self.checksum = checksum
+        self.backup = backup
+        self.link_readonly = link_readonly
+        self.copier = FileCopier()
+        self.extract_stats: Dict[str, int] = {'files': 0, 'bytes': 0}
+        self.sync_stats: Dict[str, int] = {
+            self.UNCHANGED: 0, self.UPDATED: 0, self.NEW: 0}
+        # directories known to exist and those created by the thaw
+        self._dirs: Set[Path] = set()
+        self._created_dirs: Set[Path] = set()
+        self.journal = ThawJournal()
 
     def assert_version(self):
         logger.info(f'app version: {self.app_version} =? {self.dist.version}')
@@ -33,86 +106,552 @@ class ThawManager(object):
             raise ValueError('distribution has incompatable version: ' +
                              self.dist.version)
 
-    def _thaw_empty_dirs(self):
-        """Create empty directories on the file system.
+    @contextmanager
+    def _journaled(self, identity: Dict[str, Any]) -> Iterable[ThawJournal]:
+        """Resume from or start the journal of a thaw of the distribution given
+        by ``identity``, and remove it if the thaw finishes.  Without an
+        identity (i.e. from standard in), the thaw is not resumable and the
+        journal is only kept in memory.
+
+        """
+        target: Path = self.path_translator.target_path
+        if identity is None or self.dry_run:
+            self.journal = ThawJournal()
+        else:
+            target.mkdir(parents=True, exist_ok=True)
+            self.journal = ThawJournal(
+                ThawJournal.journal_file(target), identity)
+        self.journal.open()
+        complete: bool = False
+        try:
+            yield self.journal
+            complete = True
+        finally:
+            self.journal.close(complete)
+
+    def _identity(self) -> Dict[str, Any]:
+        """Return what identifies the distribution file in the journal."""
+        path: Path = self.dist.path.resolve()
+        st: os.stat_result = path.stat()
+        return {'path': str(path), 'size': st.st_size, 'mtime': st.st_mtime}
+
+    @classmethod
+    def _temp_path(cls, path: Path) -> Path:
+        """Return the temporary file that is renamed to ``path`` when it is
+        complete.
+
+        """
+        return path.with_name(f'.{path.name}{cls.TEMP_SUFFIX}')
+
+    def _plan_dirs(self, files: bool = True) -> Dict[Path, int]:
+        """Return the directories needed by the thaw with the mode of each,
+        which is ``None`` for the default mode.  These are the empty
+        directories, the parents of the files, repositories and links, and the
+        ancestors of all of them.  Parent directories in a repository are left
+        out since the clone would fail on a non-empty repository directory.
+
+        :param files: whether to add the parents of the files, which are left
+                      out when the files are already thawed
 
         """
+        root: Path = self.path_translator.target_path
+        repos: Set[Path] = set(map(lambda r: r.path, self.dist.repos))
+        plan: Dict[Path, int] = {}
+
+        def add(path: Path, mode: int = None, repo_ok: bool = False):
+            if path in plan:
+                if mode is not None:
+                    plan[path] = mode
+                return
+            if path == root:
+                return
+            if not repo_ok and len(repos) > 0 and \
+               (path in repos or not repos.isdisjoint(path.parents)):
+                return
+            plan[path] = mode
+            for parent in path.parents:
+                if parent in plan or parent == root:
+                    break
+                plan[parent] = None
+
         for entry in self.dist.empty_dirs:
+            add(entry.path, entry.mode, True)
+        if files:
+            for entry in self.dist.files:
+                add(entry.path.parent)
+        for repo in self.dist.repos:
+            add(repo.path.parent)
+        for link in self.dist.links:
+            add(link.source.parent)
+        return plan
+
+    def _thaw_dirs(self, files: bool = True):
+        """Create the directories of the thaw (see :meth:`_plan_dirs`) in one
+        pass from the top down, and the empty directories with their modes.
+        The directories that exist after this are remembered so files are
+        extracted without checking for their directory.  Files in directories
+        created by the thaw are not checked for their existence.
+
+        :param files: whether to create the parents of the files, which is not
+                      done after they are extracted from a stream
+
+        """
+        empty_dirs: Set[Path] = set(map(lambda e: e.path, self.dist.empty_dirs))
+        plan: Dict[Path, int] = self._plan_dirs(files)
+        paths: List[Path] = sorted(plan.keys(), key=lambda p: (len(p.parts), p))
+        root: Path = self.path_translator.target_path
+        if not self.dry_run:
+            root.mkdir(parents=True, exist_ok=True)
+        self._dirs.add(root)
+        for path in paths:
+            if self.dry_run:
+                if not path.exists():
+                    logger.info(f'creating path {path}')
+                elif path in empty_dirs:
+                    logger.warning(f'path already exists: {path}')
+                self._dirs.add(path)
+                continue
+            mode: int = plan[path]
+            try:
+                # we store the mode of the directory, but we don't want that
+                # to apply to all children dirs that might not exist yet, so
+                # missing directories during the freeze phase use the default
+                if mode is None:
+                    os.mkdir(path)
+                else:
+                    os.mkdir(path, mode)
+            except FileExistsError:
+                if path in empty_dirs and \
+                   not self.journal.has(ThawJournal.DIRECTORY, path):
+                    logger.warning(f'path already exists: {path}')
+                if path.is_dir():
+                    self._dirs.add(path)
+                else:
+                    logger.warning(f'not a directory: {path}')
+                continue
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f'created path {path}')
+            self._dirs.add(path)
+            self._created_dirs.add(path)
+            if path in empty_dirs:
+                self.journal.add(ThawJournal.DIRECTORY, path)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(f'created {len(self._created_dirs)} of ' +
+                        f'{len(paths)} directories')
+
+    def _ensure_dir(self, path: Path):
+        """Create directory ``path`` if it is not known to exist."""
+        if path not in self._dirs:
+            logger.info(f'creating directory: {path}')
+            if not self.dry_run:
+                path.mkdir(parents=True, exist_ok=True)
+            self._dirs.add(path)
+
+    def _exists(self, path: Path) -> bool:
+        """Whether ``path`` exists, which is never the case for a path in a
+        directory created by the thaw that is not yet thawed.
+
+        """
+        return path.parent not in self._created_dirs and path.exists()
+
+    def _zip_handle(self) -> zipfile.ZipFile:
+        """Return the distribution zip opened by the calling (worker) thread so
+        members are read without contention on a shared file position.
+
+        """
+        zf: zipfile.ZipFile = getattr(self._local, 'zf', None)
+        if zf is None:
+            zf = zipfile.ZipFile(str(self.dist.path.resolve()))
+            self._local.zf = zf
+            with self._handles_lock:
+                self._handles.append(zf)
+        return zf
+
+    def _extract(self, zf: zipfile.ZipFile, entry: FileEntry,
+                 status: str = NEW) -> Tuple[str, int]:
+        """Extract the content of ``entry`` and set its mode and modify time.
+
+        :param zf: the zip file to read, or ``None`` to use the worker
+                   thread's zip file
+
+        :param status: :obj:`NEW` for a file that does not exist,
+                       :obj:`UPDATED` to replace a changed file, or
+                       :obj:`UNCHANGED` to replace the file only if its content
+                       differs from the entry's
+
+        :return: the status of the file and the number of bytes written
+
+        """
+        path: Path = entry.path
+        tmp: Path = self._temp_path(path)
+        if zf is None:
+            zf = self._zip_handle()
+        if status == self.UNCHANGED:
+            if self._same_content(zf, entry):
+                self._update_mode(entry)
+                return status, 0
+            status = self.UPDATED
+        with zf.open(entry.member) as fin:
+            with open(tmp, 'wb') as fout:
+                shutil.copyfileobj(fin, fout, self.COPY_BUFFER_SIZE)
+                size: int = fout.tell()
+        self._set_attributes(entry, tmp)
+        self._install(tmp, path, status == self.UPDATED)
+        self.journal.add(ThawJournal.FILE, path)
+        return status, size
+
+    def _same_content(self, zf: zipfile.ZipFile, entry: FileEntry) -> bool:
+        """Whether the file of ``entry`` has the content of its zip member by
+        comparing the CRC-32 of the file with the one stored in the zip.
+
+        """
+        crc: int = 0
+        with open(entry.path, 'rb') as f:
+            while True:
+                buf: bytes = f.read(self.COPY_BUFFER_SIZE)
+                if len(buf) == 0:
+                    break
+                crc = zlib.crc32(buf, crc)
+        return crc == zf.getinfo(entry.member).CRC
+
+    def _copy(self, src: Path, path: Path, replace: bool = False):
+        """Copy ``src`` to ``path`` by way of a temporary file so ``path`` is
+        never partially written.
+
+        :param replace: whether ``path`` exists and is replaced by the copy
+
+        """
+        tmp: Path = self._temp_path(path)
+        self.copier.copy(src, tmp)
+        self._install(tmp, path, replace)
+
+    def _install(self, tmp: Path, path: Path, replace: bool = False):
+        """Rename the complete temporary file ``tmp`` to ``path``.
+
+        :param replace: whether ``path`` exists and is replaced, in which case
+                        it is first displaced (see :meth:`_displace`)
+
+        """
+        if replace:
+            self._displace(path)
+        os.replace(tmp, path)
+
+    def _set_attributes(self, entry: FileEntry, path: Path = None):
+        """Set the mode and modify time of a thawed file.
+
+        :param path: the file to modify, which defaults to the entry's path
+
+        """
+        if path is None:
             path = entry.path
-            if path.exists():
-                logger.warning(f'path already exists: {path}')
-            else:
-                logger.info(f'creating path {path}')
-                if not self.dry_run:
-                    # we store the mode of the directory, but we don't want
-                    # that to apply to all children dirs that might not exist
-                    # yet
-                    if entry.mode is None:
-                        # use the default mode for missing directories during
-                        # the freeze phase
-                        path.mkdir(parents=True, exist_ok=True)
-                    else:
-                        path.mkdir(mode=entry.mode, parents=True, exist_ok=True)
+        logger.debug(f'setting mode of {path} to {entry.mode} ' +
+                     f'({entry.modestr}, {entry.modify_time})')
+        path.chmod(entry.mode)
+        if entry.modify_time is not None:
+            os.utime(path, (entry.modify_time, entry.modify_time))
+
+    def _displace(self, path: Path):
+        """Move the file ``path`` to its backup file when backups are enabled.
+        This is only called once its replacement is complete, which is then
+        renamed over ``path``.
+
+        """
+        if self.backup:
+            backup: Path = path.with_name(path.name + self.BACKUP_SUFFIX)
+            logger.info(f'backing up {path} -> {backup}')
+            os.replace(path, backup)
+
+    def _update_mode(self, entry: FileEntry, st: os.stat_result = None):
+        """Set the mode of the unchanged file of ``entry`` if it differs."""
+        if entry.mode is None or self.dry_run:
+            return
+        if st is None:
+            st = entry.path.stat()
+        if stat.S_IMODE(st.st_mode) != stat.S_IMODE(entry.mode):
+            logger.info(f'setting mode of {entry.path} to {entry.modestr}')
+            entry.path.chmod(entry.mode)
+
+    def _stat_files(self) -> Dict[Path, os.stat_result]:
+        """Return the status of the files that exist in the target for the
+        files of the distribution.  Each directory is listed once for all of
+        its files, the directories are listed by a thread pool, and
+        directories created by this thaw are not listed.
+
+        """
+        by_dir: Dict[Path, Set[str]] = {}
+        for entry in self.dist.files:
+            path: Path = entry.path
+            if path.parent not in self._created_dirs:
+                by_dir.setdefault(path.parent, set()).add(path.name)
+
+        def stat_dir(item: Tuple[Path, Set[str]]) -> \
+                List[Tuple[Path, os.stat_result]]:
+            parent, names = item
+            stats: List[Tuple[Path, os.stat_result]] = []
+            try:
+                with os.scandir(parent) as it:
+                    for de in it:
+                        if de.name in names:
+                            stats.append(
+                                (parent / de.name,
+                                 de.stat(follow_symlinks=False)))
+            except FileNotFoundError:
+                pass
+            return stats
+
+        stats: Dict[Path, os.stat_result] = {}
+        with ThreadPoolExecutor(max_workers=self.extract_workers) as pool:
+            for dir_stats in pool.map(stat_dir, by_dir.items()):
+                stats.update(dir_stats)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f'found {len(stats)} existing files in ' +
+                         f'{len(by_dir)} directories')
+        return stats
+
+    @staticmethod
+    def _unchanged(st: os.stat_result, size: int, modify_time: float) -> bool:
+        """Whether the existing file with status ``st`` has ``size`` and
+        ``modify_time`` (to the second).
+
+        """
+        return st.st_size == size and modify_time is not None and \
+            int(st.st_mtime) == int(modify_time)
+
+    def _extracted(self, status: str, size: int):
+        """Count an extracted file and log the progress periodically."""
+        self.sync_stats[status] += 1
+        if status != self.UNCHANGED:
+            self.extract_stats['files'] += 1
+            self.extract_stats['bytes'] += size
+        now: float = time.time()
+        if now - self._progress_time >= self.PROGRESS_SECONDS:
+            self._progress_time = now
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(f"extracted {self.extract_stats['files']} " +
+                            f"files ({self.extract_stats['bytes']} bytes)")
 
     def _thaw_files(self, zf):
         """Thaw files in the distribution by extracting from the zip file ``zf``.  File
-        definitions are found in ``struct``.
+        definitions are found in ``struct``.  Content shared by files (see the
+        ``blob`` layout) is extracted once and then copied.
+
+        Files are extracted by a pool of :obj:`extract_workers` threads, each
+        with its own handle to the zip file, so decompression and writes are
+        spread across processors.  Copies of shared content and hard links are
+        created after all files are extracted.  Files are written to a
+        temporary file that is renamed when complete, and files in the
+        journal of an interrupted thaw are skipped.
+
+        Existing files are skipped unless :obj:`sync` is set, in which case
+        files with a different size or modify time than the entry (or content
+        with :obj:`checksum`) are replaced.
 
         """
-        for entry in self.dist.files:
+        workers: int = self.extract_workers
+        # blob ID to the first file thawed with its content
+        blobs: Dict[str, Path] = {}
+        # files thawed, which are the only files hard linked
+        thawed: Set[Path] = set()
+        # files created from other thawed files
+        deferred: List[FileEntry] = []
+        pending: Deque[Future] = deque()
+        pool: ThreadPoolExecutor = None
+        stats: Dict[Path, os.stat_result] = {}
+        resumed: int = 0
+        self.extract_stats = {'files': 0, 'bytes': 0}
+        self.sync_stats = {self.UNCHANGED: 0, self.UPDATED: 0, self.NEW: 0}
+        self._progress_time = start = time.time()
+        if self.sync:
+            stats = self._stat_files()
+        if workers > 1 and not self.dry_run:
+            self._local = threading.local()
+            self._handles: List[zipfile.ZipFile] = []
+            self._handles_lock = threading.Lock()
+            pool = ThreadPoolExecutor(max_workers=workers)
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(f'extracting files with {workers} workers')
+        try:
+            for entry in self.dist.files:
+                path = entry.path
+                blob: str = entry.blob
+                if self.journal.has(ThawJournal.FILE, path):
+                    # thawed by an interrupted thaw
+                    if blob is not None and blob not in blobs:
+                        blobs[blob] = path
+                    thawed.add(path)
+                    resumed += 1
+                    continue
+                self._ensure_dir(path.parent)
+                logger.debug(f'thawing file: {path}')
+                status: str = self.NEW
+                if self.sync:
+                    st: os.stat_result = stats.get(path)
+                    if st is not None and stat.S_ISDIR(st.st_mode):
+                        logger.warning(f'not a file: {path}--skipping')
+                        continue
+                    if st is not None:
+                        status = self.UPDATED
+                        if entry.hardlink is None and blob not in blobs and \
+                           self._unchanged(
+                               st, zf.getinfo(entry.member).file_size,
+                               entry.modify_time):
+                            status = self.UNCHANGED
+                elif self._exists(path):
+                    logger.warning(f'path already exists: {path}')
+                    continue
+                if entry.hardlink is not None or blob in blobs:
+                    deferred.append(entry)
+                    continue
+                if blob is not None:
+                    blobs[blob] = path
+                thawed.add(path)
+                if status == self.UNCHANGED and not self.checksum:
+                    logger.debug(f'unchanged: {path}')
+                    self._update_mode(entry, st)
+                    self._extracted(status, 0)
+                    continue
+                logger.info(f'{path}: mode={entry.modestr}, ' +
+                            f'time={entry.modify_time}, {status}')
+                if self.dry_run:
+                    self._extracted(status, 0)
+                elif pool is None:
+                    self._extracted(*self._extract(zf, entry, status))
+                else:
+                    pending.append(
+                        pool.submit(self._extract, None, entry, status))
+                    # bound the number of entries waiting to be extracted
+                    if len(pending) >= workers * 4:
+                        self._extracted(*pending.popleft().result())
+            while len(pending) > 0:
+                self._extracted(*pending.popleft().result())
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+                for handle in self._handles:
+                    handle.close()
+        for entry in deferred:
             path = entry.path
-            parent = path.parent
-            if not parent.exists():
-                logger.info(f'creating parent directory: {parent}')
-                if not self.dry_run:
-                    parent.mkdir(parents=True)
-            logger.debug(f'thawing file: {path}')
-            if path.exists():
-                logger.warning(f'path already exists: {path}')
+            status: str = self.NEW
+            if path in stats:
+                source: Path = entry.hardlink if entry.hardlink is not None \
+                    else blobs[entry.blob]
+                if self._unchanged_copy(entry, stats[path], source):
+                    self._extracted(self.UNCHANGED, 0)
+                    thawed.add(path)
+                    continue
+                status = self.UPDATED
+            replace: bool = status == self.UPDATED
+            if entry.hardlink is not None:
+                if not self._thaw_hardlink(entry, thawed, replace):
+                    continue
+            elif not self.dry_run:
+                blob_path: Path = blobs[entry.blob]
+                logger.debug(f'copying blob {entry.blob}: {blob_path}')
+                self._copy(blob_path, path, replace)
+            if not self.dry_run:
+                self._set_attributes(entry)
+            self.journal.add(ThawJournal.FILE, path)
+            self.sync_stats[status] += 1
+            thawed.add(path)
+        if logger.isEnabledFor(logging.INFO):
+            secs: float = time.time() - start
+            nbytes: int = self.extract_stats['bytes']
+            logger.info(f"extracted {self.extract_stats['files']} files " +
+                        f'({nbytes} bytes) in {secs:.1f}s ' +
+                        f'({nbytes / max(secs, 1e-6) / 2**20:.1f}MiB/s), ' +
+                        f'{len(deferred)} copied or linked, ' +
+                        f'{resumed} resumed')
+            if self.sync:
+                self._log_sync()
+
+    def _unchanged_copy(self, entry: FileEntry, st: os.stat_result,
+                        source: Path) -> bool:
+        """Whether the existing file with status ``st`` of a hard link or copy
+        of shared content is the same as its ``source`` file.
+
+        """
+        try:
+            src_st: os.stat_result = source.stat()
+        except FileNotFoundError:
+            return False
+        if entry.hardlink is not None:
+            return (st.st_dev, st.st_ino) == (src_st.st_dev, src_st.st_ino)
+        return self._unchanged(st, src_st.st_size, entry.modify_time)
+
+    def _log_sync(self):
+        stats: Dict[str, int] = self.sync_stats
+        logger.info(f'synchronized files: {stats[self.UNCHANGED]} ' +
+                    f'unchanged, {stats[self.UPDATED]} updated, ' +
+                    f'{stats[self.NEW]} new')
+
+    def _thaw_hardlink(self, entry: FileEntry, thawed: Set[Path],
+                       replace: bool = False) -> bool:
+        """Create a hard link to the file with the content of ``entry``, or
+        copy it when it can not be linked (i.e. it is on another device).
+
+        :param thawed: the files thawed so far
+
+        :param replace: whether the file exists and is replaced, which is left
+                        as it is when the link can not be created
+
+        :return: whether the file was created
+
+        """
+        path: Path = entry.path
+        target: Path = entry.hardlink
+        if target not in thawed:
+            # do not link to files that existed before the thaw
+            if not target.is_file():
+                logger.warning(f'missing hard link target: {target}--skipping')
+                return False
+            logger.warning(f'copying hard link target not thawed: {target}')
+            if not self.dry_run:
+                self._copy(target, path, replace)
+            return True
+        logger.info(f'linking {path} -> {target}')
+        if not self.dry_run:
+            tmp: Path = self._temp_path(path)
+            try:
+                if os.path.lexists(tmp):
+                    tmp.unlink()
+                os.link(target, tmp)
+            except OSError as e:
+                logger.warning(f'can not link {path} -> {target}: {e}' +
+                               '--copying')
+                self._copy(target, path, replace)
             else:
-                logger.info(f'{path}: mode={entry.modestr}, ' +
-                            f'time={entry.modify_time}')
-                if not self.dry_run:
-                    with zf.open(str(entry.relative)) as fin:
-                        with open(str(path), 'wb') as fout:
-                            shutil.copyfileobj(fin, fout)
-                logger.debug(f'setting mode of {path} to {entry.mode} ' +
-                             f'({entry.modestr}, {entry.modify_time})')
-                if not self.dry_run:
-                    path.chmod(entry.mode)
-                    if entry.modify_time is not None:
-                        os.utime(path, (entry.modify_time, entry.modify_time))
+                self._install(tmp, path, replace)
+        return True
 
     def _thaw_repos(self):
         """Thaw repositories in the config, which does a clone and then creates the
-        (remaining if any) remotes.
+        (remaining if any) remotes.  Repositories are cloned concurrently with
+        the number of workers given in the initializer or the distribution's
+        clone options.  Repositories in the journal are skipped.
 
         """
-        for repo in self.dist.repos:
-            repo_path = repo.path
-            parent = repo_path.parent
-            logger.info(f'thawing repo: {repo}')
-            if not parent.exists():
-                logger.info(f'creating parent directory: {parent}')
-                if not self.dry_run:
-                    parent.mkdir(parents=True, exist_ok=True)
-            try:
-                if not self.dry_run:
-                    try:
-                        thawed = repo.thaw()
-                        logger.debug(f'thawed: {thawed}')
-                    except Exception as e:
-                        # robust
-                        traceback.print_exc()
-                        logger.error(f'could not thaw {repo}: {e}')
-            except GitCommandError as err:
-                logger.warning(f'couldn\'t create repo {repo_path}--skippping: {err}')
+        def journal_result(res: CloneResult):
+            if res.status != CloneResult.FAILED:
+                self.journal.add(ThawJournal.REPO, res.repo.path)
+
+        clone: Dict[str, Any] = self.dist.struct.get('clone') or {}
+        workers: int = self.workers
+        if workers is None:
+            workers = clone.get('workers')
+        repos = filter(lambda r: not self.journal.has(ThawJournal.REPO, r.path),
+                       self.dist.repos)
+        scheduler = CloneScheduler(
+            repos, workers, clone.get('host_workers'), self.dry_run,
+            self.mirror, journal_result)
+        self.clone_results = scheduler()
 
     def _thaw_pattern_links(self):
         """Method to call other thaw methods based on type.
 
         """
         for link in self.dist.links:
+            if self.journal.has(ThawJournal.LINK, link.source):
+                continue
             if link.source.exists():
                 logger.warning(f'link source already exists: {link.source}')
             elif not link.target.exists():
@@ -121,11 +660,9 @@ class ThawManager(object):
             else:
                 logger.info(f'linking: {link}')
                 if not self.dry_run:
-                    par = link.source.parent
-                    if not par.exists():
-                        logger.info(f'creating link directory: {par}')
-                        par.mkdir(parents=True)
+                    self._ensure_dir(link.source.parent)
                     link.source.symlink_to(link.target)
+                self.journal.add(ThawJournal.LINK, link.source)
 
     def thaw(self):
         """Thaw the distribution, which includes creating git repositories, extracting
@@ -133,33 +670,154 @@ class ThawManager(object):
         that were captured/configured during the freezing phase.
 
         """
-        logger.info(f'expanding distribution in {self.dist.path}')
-        with zipfile.ZipFile(str(self.dist.path.resolve())) as zf:
-            self._thaw_empty_dirs()
-            self._thaw_files(zf)
+        with self._journaled(self._identity()):
+            if self.dist.archive_format != ArchiveFormat.ZIP:
+                with open(self.dist.path, 'rb') as f:
+                    self._thaw_stream(f, self.dist.defs_file)
+                return
+            logger.info(f'expanding distribution in {self.dist.path}')
+            with zipfile.ZipFile(str(self.dist.path.resolve())) as zf:
+                self._thaw_dirs()
+                self._thaw_files(zf)
+                self._thaw_repos()
+                self._thaw_pattern_links()
+
+    def _thaw_member(self, tf: tarfile.TarFile, tinfo: tarfile.TarInfo,
+                     thawed: Set[Path]):
+        """Extract a file member of a streamed distribution as it is read."""
+        rel = Path(tinfo.name)
+        if rel.is_absolute() or '..' in rel.parts:
+            logger.warning(f'skipping member outside target: {tinfo.name}')
+            return
+        path: Path = self.path_translator.expand(rel)
+        status: str = self.NEW
+        if self.journal.has(ThawJournal.FILE, path):
+            thawed.add(path)
+            return
+        if self.sync:
+            try:
+                st: os.stat_result = path.lstat()
+            except FileNotFoundError:
+                st = None
+            if st is not None:
+                if stat.S_ISDIR(st.st_mode):
+                    logger.warning(f'not a file: {path}--skipping')
+                    return
+                thawed.add(path)
+                if self._unchanged(st, tinfo.size, tinfo.mtime):
+                    self.sync_stats[self.UNCHANGED] += 1
+                    return
+                status = self.UPDATED
+        elif path.exists():
+            logger.warning(f'path already exists: {path}')
+            return
+        logger.info(f'{path}: mode={tinfo.mode:o}, time={tinfo.mtime}, ' +
+                    status)
+        if not self.dry_run:
+            self._ensure_dir(path.parent)
+            tmp: Path = self._temp_path(path)
+            with tf.extractfile(tinfo) as fin:
+                with open(tmp, 'wb') as fout:
+                    shutil.copyfileobj(fin, fout)
+            tmp.chmod(tinfo.mode)
+            os.utime(tmp, (tinfo.mtime, tinfo.mtime))
+            self._install(tmp, path, status == self.UPDATED)
+        self.journal.add(ThawJournal.FILE, path)
+        self.sync_stats[status] += 1
+        thawed.add(path)
+
+    def _thaw_stream_files(self, thawed: Set[Path]):
+        """Create the hard linked files of a streamed distribution, which have
+        no member in the stream.
+
+        """
+        for entry in self.dist.files:
+            path: Path = entry.path
+            exists: bool = entry.hardlink is not None and path.exists()
+            if entry.hardlink is None:
+                if path not in thawed and not path.exists():
+                    logger.warning(f'missing file in stream: {path}')
+            elif self.journal.has(ThawJournal.FILE, path):
+                thawed.add(path)
+            elif exists and not self.sync:
+                logger.warning(f'path already exists: {path}')
+            elif exists and self._unchanged_copy(
+                    entry, path.lstat(), entry.hardlink):
+                self.sync_stats[self.UNCHANGED] += 1
+                thawed.add(path)
+            else:
+                status: str = self.UPDATED if exists else self.NEW
+                self._ensure_dir(path.parent)
+                if self._thaw_hardlink(entry, thawed, exists):
+                    self.journal.add(ThawJournal.FILE, path)
+                    self.sync_stats[status] += 1
+                    thawed.add(path)
+        if self.sync and logger.isEnabledFor(logging.INFO):
+            self._log_sync()
+
+    def thaw_stream(self, fileobj: BinaryIO, defs_file: str):
+        """Thaw a distribution streamed by
+        :meth:`~zensols.grsync.freeze.FreezeManager.freeze_stream` (i.e. from
+        standard in) or a tar distribution file.  The compression codec is
+        detected from the stream.  Files are extracted as they are read and
+        everything else is thawed once the distribution definitions, which are
+        the last member, are read.
+
+        :param defs_file: the member name of the distribution definitions
+
+        """
+        with self._journaled(None):
+            self._thaw_stream(fileobj, defs_file)
+
+    def _thaw_stream(self, fileobj: BinaryIO, defs_file: str):
+        thawed: Set[Path] = set()
+        logger.info('expanding distribution stream')
+        # the definitions are spooled so their files are read lazily
+        with tempfile.TemporaryDirectory(prefix='grsync-') as tmp_dir:
+            defs: Path = Path(tmp_dir, 'defs')
+            with ArchiveFormat.open_tar(fileobj) as tf:
+                tinfo: tarfile.TarInfo
+                for tinfo in tf:
+                    if tinfo.name == defs_file:
+                        with tf.extractfile(tinfo) as fin:
+                            with open(defs, 'wb') as fout:
+                                shutil.copyfileobj(fin, fout)
+                    elif tinfo.isfile():
+                        self._thaw_member(tf, tinfo, thawed)
+            if not defs.is_file():
+                raise ValueError('no distribution definitions in stream')
+            self.dist = Distribution.from_manifest(
+                ManifestReader(partial(open, defs, encoding='utf-8')),
+                self.path_translator.target_path)
+            # the definitions are the last member, so the directories of the
+            # files were created as they were extracted
+            self._thaw_dirs(False)
+            self._thaw_stream_files(thawed)
             self._thaw_repos()
             self._thaw_pattern_links()
 
     def _thaw_files_from_local(self, local_dir: Path):
-        """Thaw files by copying from the local file system.
+        """Thaw files by copying from the local file system.  Files are copied
+        with the fastest method supported by the file systems (see
+        :class:`.FileCopier`), such as reflinks on btrfs and xfs.
 
         """
         for entry in self.dist.files:
             path = entry.path
-            parent = path.parent
-            if not parent.exists():
-                logger.info(f'creating parent directory: {parent}')
-                if not self.dry_run:
-                    parent.mkdir(parents=True)
+            self._ensure_dir(path.parent)
             logger.debug(f'copying file: {path}')
-            if path.exists():
+            if self._exists(path):
                 logger.warning(f'path already exists: {path}')
             else:
                 src = local_dir / entry.relative
                 logger.info(f'{src} -> {path}: mode={entry.modestr}, ' +
                             f'time={entry.modify_time}')
                 if not self.dry_run:
-                    shutil.copy2(src, path, follow_symlinks=False)
+                    tmp: Path = self._temp_path(path)
+                    self.copier.copy(src, tmp, self.link_readonly)
+                    os.replace(tmp, path)
+                self.journal.add(ThawJournal.FILE, path)
+        self.copier.log_counts()
 
     def thaw_from_in_memory(self, source_dir: Path):
         """Copy a local distribution to a different directory on the local file system.
@@ -167,7 +825,7 @@ class ThawManager(object):
         :param source_dir: the distribution directory from where to copy files
 
         """
-        self._thaw_empty_dirs()
+        self._thaw_dirs()
         self._thaw_files_from_local(source_dir)
         self._thaw_repos()
         self._thaw_pattern_links()
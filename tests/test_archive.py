@@ -0,0 +1,139 @@
+import unittest
+import os
+import io
+import importlib.util
+from pathlib import Path
+import tempfile
+import zipfile
+from unittest.mock import patch
+from zensols.grsync import (
+    ZipArchiveWriter, CompressionPolicy, TarArchiveWriter, ArchiveFormat
+)
+
+
+class TestArchive(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name)
+        self.files = []
+        for i in range(20):
+            path = self.root / f'f{i}.txt'
+            path.write_bytes((f'line {i}\n' * (i * 50)).encode() +
+                             os.urandom(i * 10))
+            self.files.append(path)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _write(self, workers, max_size=None):
+        zip_file = self.root / f'dist-{workers}.zip'
+        with zipfile.ZipFile(zip_file, 'w', zipfile.ZIP_DEFLATED) as zf:
+            with ZipArchiveWriter(zf, workers) as archive:
+                if max_size is not None:
+                    archive.MAX_BUFFER_SIZE = max_size
+                for path in self.files:
+                    archive.add_file(path, f'dir/{path.name}')
+        self.assertEqual(len(self.files), archive.stats['files'])
+        with zipfile.ZipFile(zip_file) as zf:
+            self.assertIsNone(zf.testzip())
+            self.assertEqual([f'dir/{p.name}' for p in self.files],
+                             zf.namelist())
+            for path in self.files:
+                self.assertEqual(path.read_bytes(),
+                                 zf.read(f'dir/{path.name}'))
+
+    def test_write(self):
+        self._write(1)
+        self._write(4)
+        # large files are interleaved with buffered files
+        self._write(4, 500)
+
+    def _copy(self, zip_file: Path) -> ZipArchiveWriter:
+        copy_file = self.root / 'copy.zip'
+        with zipfile.ZipFile(zip_file) as src:
+            with zipfile.ZipFile(copy_file, 'w') as zf:
+                with ZipArchiveWriter(zf, 4) as archive:
+                    for zinfo in src.infolist():
+                        archive.copy_member(src, zinfo, f'c/{zinfo.filename}')
+        with zipfile.ZipFile(copy_file) as zf:
+            self.assertIsNone(zf.testzip())
+            for path in self.files:
+                self.assertEqual(path.read_bytes(),
+                                 zf.read(f'c/dir/{path.name}'))
+        return archive
+
+    def test_copy_member(self):
+        self._write(4)
+        zip_file = self.root / 'dist-4.zip'
+        # both the copy using the zipfile internals and the recompressing copy
+        for raw in (True, False):
+            with patch.object(ZipArchiveWriter, 'RAW_COPY', raw):
+                archive = self._copy(zip_file)
+            self.assertEqual({'reused': len(self.files)},
+                             {k: v['files'] for k, v in
+                              archive.buckets.items()})
+            with zipfile.ZipFile(zip_file) as src:
+                with zipfile.ZipFile(self.root / 'copy.zip') as zf:
+                    for zinfo in src.infolist():
+                        copied = zf.getinfo(f'c/{zinfo.filename}')
+                        for attr in 'compress_type CRC file_size'.split():
+                            self.assertEqual(getattr(zinfo, attr),
+                                             getattr(copied, attr))
+
+    def test_policy(self):
+        policy = CompressionPolicy.from_config(
+            [{'rule': {'name': 'logs', 'glob': 'dir/*.log', 'method': 'lzma'}},
+             {'rule': {'ext': 'DAT', 'min_size': 100, 'method': 'bzip2',
+                       'level': 9}}])
+        text = b'some text to compress\n' * 500
+        files = {'dir/a.log': text, 'b.log': text, 'big.dat': text,
+                 'small.dat': b'x', 'c.gz': text, 'rand': os.urandom(8192),
+                 'short': os.urandom(100)}
+        types = {'dir/a.log': zipfile.ZIP_LZMA,
+                 'b.log': zipfile.ZIP_DEFLATED,
+                 'big.dat': zipfile.ZIP_BZIP2,
+                 'small.dat': zipfile.ZIP_DEFLATED,
+                 'c.gz': zipfile.ZIP_STORED,
+                 'rand': zipfile.ZIP_STORED,
+                 'short': zipfile.ZIP_DEFLATED}
+        for name, data in files.items():
+            path = self.root / 'src' / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(data)
+        for workers, max_size in ((1, None), (3, None), (3, 1000)):
+            zip_file = self.root / 'policy.zip'
+            with zipfile.ZipFile(zip_file, 'w') as zf:
+                with ZipArchiveWriter(zf, workers, policy=policy) as archive:
+                    if max_size is not None:
+                        archive.MAX_BUFFER_SIZE = max_size
+                    for name in files.keys():
+                        archive.add_file(self.root / 'src' / name, name)
+            self.assertEqual({'bzip2': 1, 'compressed': 1, 'deflate': 3,
+                              'incompressible': 1, 'logs': 1},
+                             {k: v['files'] for k, v in
+                              archive.buckets.items()})
+            with zipfile.ZipFile(zip_file) as zf:
+                self.assertIsNone(zf.testzip())
+                for name, data in files.items():
+                    self.assertEqual(types[name],
+                                     zf.getinfo(name).compress_type)
+                    self.assertEqual(data, zf.read(name))
+
+    def test_tar_codecs(self):
+        for name, codec in ArchiveFormat.CODECS.items():
+            if name == 'zst' and importlib.util.find_spec('zstandard') is None:
+                continue
+            out = io.BytesIO()
+            with TarArchiveWriter(out, codec, 3, 2) as archive:
+                for path in self.files:
+                    archive.add_file(path, f'dir/{path.name}')
+            self.assertEqual(len(self.files), archive.stats['files'])
+            out.seek(0)
+            self.assertEqual(f'tar.{name}', ArchiveFormat.detect(out.read(8)))
+            out.seek(0)
+            with ArchiveFormat.open_tar(out) as tf:
+                content = {t.name: tf.extractfile(t).read() for t in tf}
+            self.assertEqual({f'dir/{p.name}': p.read_bytes()
+                              for p in self.files}, content)
+        with self.assertRaises(ValueError):
+            ArchiveFormat.codec('tar.rar')
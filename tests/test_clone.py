@@ -0,0 +1,105 @@
+import unittest
+from pathlib import Path
+import tempfile
+from git import Repo
+from zensols.grsync import (
+    PathTranslator, FrozenRepo, CloneScheduler, CloneResult, MirrorCache
+)
+
+
+class TestClone(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name).resolve()
+        self.origin = self.root / 'origin'
+        repo = Repo.init(self.origin)
+        (self.origin / 'README.md').write_text('origin\n')
+        (self.origin / 'data').mkdir()
+        (self.origin / 'data' / 'big.dat').write_text('data\n')
+        repo.index.add(['README.md', 'data/big.dat'])
+        repo.index.commit('initial')
+        (self.origin / 'README.md').write_text('changed\n')
+        repo.index.add(['README.md'])
+        repo.index.commit('second')
+        repo.create_head('other')
+        self.target = self.root / 'target'
+        self.path_translator = PathTranslator(self.target)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _frozen(self, rel, url, clone=None):
+        remotes = [{'name': 'origin', 'url': url, 'is_master': True}]
+        return FrozenRepo(remotes, (), self.target, self.target / rel, None,
+                          self.path_translator, clone)
+
+    def test_host(self):
+        self.assertEqual('github.com', CloneScheduler.host(
+            'git@github.com:plandes/grsync.git'))
+        self.assertEqual('github.com', CloneScheduler.host(
+            'https://github.com/plandes/grsync'))
+        self.assertEqual('host', CloneScheduler.host('ssh://git@host:22/r'))
+        self.assertEqual('', CloneScheduler.host('file:///tmp/repo'))
+        self.assertEqual('', CloneScheduler.host('/tmp/repo'))
+
+    def test_clone(self):
+        url = self.origin.as_uri()
+        # nested repositories are given before their parents
+        repos = [self._frozen('a/b/c', url),
+                 self._frozen('a/b', url),
+                 self._frozen('a', url),
+                 self._frozen('d', url),
+                 self._frozen('e', str(self.root / 'nada'))]
+        (self.target / 'd').mkdir(parents=True)
+        (self.target / 'd' / 'keep').touch()
+        results = CloneScheduler(repos, 3, 2)()
+        self.assertEqual([CloneResult.CLONED, CloneResult.CLONED,
+                          CloneResult.CLONED, CloneResult.EXISTS,
+                          CloneResult.FAILED],
+                         [r.status for r in results])
+        self.assertIsNotNone(results[-1].error)
+        for rel in 'a a/b a/b/c'.split():
+            path = self.target / rel
+            self.assertTrue((path / '.git').is_dir())
+            self.assertEqual('changed\n', (path / 'README.md').read_text())
+
+    def test_clone_options(self):
+        frepo = self._frozen('shallow', self.origin.as_uri(),
+                             {'depth': 1, 'filter': 'blob:none',
+                              'single_branch': True, 'sparse': ['/*.md']})
+        frepo.thaw()
+        path = frepo.path
+        repo = Repo(path)
+        self.assertEqual(1, len(list(repo.iter_commits())))
+        self.assertNotIn('origin/other', [r.name for r in repo.refs])
+        self.assertTrue((path / 'README.md').is_file())
+        self.assertFalse((path / 'data').exists())
+        self.assertTrue(frepo.unshallow())
+        self.assertEqual(2, len(list(repo.iter_commits())))
+        self.assertIn('origin/other', [r.name for r in repo.refs])
+        self.assertEqual('data\n', (path / 'data' / 'big.dat').read_text())
+        self.assertFalse(frepo.unshallow())
+
+    def test_mirror(self):
+        url = self.origin.as_uri()
+        cache = MirrorCache(self.root / 'mirrors')
+        results = CloneScheduler([self._frozen('a', url)], mirror=cache)()
+        self.assertEqual(CloneResult.CLONED, results[0].status)
+        mirrors = cache.mirrors()
+        self.assertEqual([url], [m[1] for m in mirrors])
+        self.assertEqual(cache.path(url), mirrors[0][0])
+        self.assertTrue(mirrors[0][2] > 0)
+        # clones do not depend on the mirror
+        alts = self.target / 'a' / '.git' / 'objects' / 'info' / 'alternates'
+        self.assertFalse(alts.exists())
+        origin = Repo(self.origin)
+        (self.origin / 'README.md').write_text('third\n')
+        origin.index.add(['README.md'])
+        sha = origin.index.commit('third').hexsha
+        CloneScheduler([self._frozen('b', url)], mirror=cache)()
+        self.assertEqual(sha, Repo(self.target / 'b').head.commit.hexsha)
+        self.assertEqual(sha, Repo(cache.path(url)).commit(
+            origin.active_branch.name).hexsha)
+        self.assertEqual(0, cache.prune(1))
+        self.assertTrue(cache.prune(0) > 0)
+        self.assertEqual([], cache.mirrors())
@@ -0,0 +1,91 @@
+import os
+import errno
+from unittest.mock import patch
+from zensols.grsync import FileCopier
+from util import DotsTestCase
+
+
+class TestCopier(DotsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.src = self.root / 'src.txt'
+        self.src.write_bytes(b'some content\n' * 1000)
+        self.src.chmod(0o640)
+        os.utime(self.src, (10 ** 9, 10 ** 9))
+
+    def _check_copy(self, dst):
+        self.assertEqual(self.src.read_bytes(), dst.read_bytes())
+        self.assertEqual(0o640, dst.stat().st_mode & 0o777)
+        self.assertEqual(10 ** 9, dst.stat().st_mtime)
+        self.assertNotEqual(self.src.stat().st_ino, dst.stat().st_ino)
+
+    def test_copy(self):
+        copier = FileCopier()
+        dst = self.root / 'dst.txt'
+        method = copier.copy(self.src, dst)
+        self.assertIn(method, copier.methods)
+        self.assertEqual(1, copier.counts[method])
+        self._check_copy(dst)
+        # writable files are not linked
+        dst.unlink()
+        self.assertNotEqual(FileCopier.HARDLINK,
+                            copier.copy(self.src, dst, True))
+        self._check_copy(dst)
+        link = self.root / 'link.txt'
+        link.symlink_to(self.src)
+        copier.copy(link, dst)
+        self.assertTrue(dst.is_symlink())
+
+    def test_fallback(self):
+        def unsupported(fin, fout, size):
+            fout.write(b'partial')
+            raise OSError(errno.EOPNOTSUPP, 'not supported')
+
+        copier = FileCopier()
+        for method in copier.methods[:-1]:
+            setattr(copier, f'_{method}', unsupported)
+        for i in range(2):
+            dst = self.root / f'dst-{i}.txt'
+            self.assertEqual(FileCopier.STREAM, copier.copy(self.src, dst))
+            self._check_copy(dst)
+        # methods that are not supported are not tried again
+        devs = (self.src.stat().st_dev, self.root.stat().st_dev)
+        self.assertEqual(set(copier.methods[:-1]), copier._unsupported[devs])
+
+    def test_short_copy(self):
+        copier = FileCopier()
+        methods = (FileCopier.COPY_FILE_RANGE, FileCopier.SENDFILE)
+        copier.methods = methods + (FileCopier.STREAM,)
+        dst = self.root / 'dst.txt'
+        # some file systems copy nothing from non-empty files
+        with patch('os.copy_file_range', return_value=0, create=True):
+            with patch('os.sendfile', return_value=0, create=True):
+                self.assertEqual(FileCopier.STREAM, copier.copy(self.src, dst))
+        self._check_copy(dst)
+        devs = (self.src.stat().st_dev, self.root.stat().st_dev)
+        self.assertEqual(set(methods), copier._unsupported[devs])
+
+    def test_hardlink(self):
+        self.src.chmod(0o440)
+        copier = FileCopier()
+        dst = self.root / 'dst.txt'
+        self.assertEqual(FileCopier.HARDLINK, copier.copy(self.src, dst, True))
+        self.assertEqual(self.src.stat().st_ino, dst.stat().st_ino)
+
+    def test_dist_copy(self):
+        dots = self.root / 'home' / 'dots'
+        (dots / 'sub').mkdir(parents=True)
+        (dots / 'a.conf').write_text('some configuration\n')
+        (dots / 'sub' / 'b.conf').write_text('other configuration\n')
+        (dots / 'sub' / 'b.conf').chmod(0o444)
+        copy_dir = self.root / 'copy'
+        self._create_dm(self.root / 'home', copy_dir,
+                        link_readonly=True).copy()
+        for rel in 'dots/a.conf dots/sub/b.conf'.split():
+            src, dst = self.root / 'home' / rel, copy_dir / rel
+            self.assertEqual(src.read_text(), dst.read_text())
+            self.assertEqual(src.stat().st_mtime, dst.stat().st_mtime)
+        self.assertEqual((dots / 'sub' / 'b.conf').stat().st_ino,
+                         (copy_dir / 'dots/sub/b.conf').stat().st_ino)
+        self.assertNotEqual((dots / 'a.conf').stat().st_ino,
+                            (copy_dir / 'dots/a.conf').stat().st_ino)
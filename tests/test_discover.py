@@ -0,0 +1,52 @@
+import os
+import io
+import zipfile
+from functools import partial
+from zensols.grsync import FreezeManager, ManifestReader
+from util import DotsTestCase
+
+
+class TestDiscover(DotsTestCase):
+    def setUp(self):
+        super().setUp()
+        dots = self.root / 'home' / 'dots'
+        for d in ('b/d', 'a/c', 'e'):
+            (dots / d).mkdir(parents=True)
+        for i, f in enumerate(('z.conf', 'a/y.conf', 'a/c/x.conf',
+                               'b/w.conf', 'b/d/v.conf', 'e/u.conf')):
+            (dots / f).write_text(f'configuration {i}\n')
+        os.link(dots / 'a' / 'y.conf', dots / 'b' / 'y.conf')
+        (dots / 'link.conf').symlink_to('z.conf')
+        (dots / 'f').symlink_to('a/c')
+
+    def _write_dist(self, stream: bool):
+        dm = self._create_dm(self.root / 'home')
+        dist_file = self.root / ('stream' if stream else 'list') / 'dist.zip'
+        dist_file.parent.mkdir()
+        fmng = FreezeManager(dm.config, dist_file, dm.defs_file,
+                             dm.discoverer, dm.app_version, False)
+        data = dm.discoverer.freeze(stream=stream)
+        files = data.pop('files')
+        # the streamed files are found as they are iterated
+        self.assertEqual(not stream, isinstance(files, list))
+        data['layout'] = fmng.TREE_LAYOUT
+        del data['create_date']
+        with zipfile.ZipFile(dist_file, mode='w') as zf:
+            fmng._write_dist(zf, data, files)
+        with zipfile.ZipFile(dist_file) as zf:
+            defs = zf.read(str(dm.defs_file)).decode()
+            return zf.namelist(), defs
+
+    def test_stream(self):
+        dm = self._create_dm(self.root / 'home')
+        listed = dm.discoverer.discover(False)['files']
+        streamed = dm.discoverer.discover(False, stream=True)['files']
+        self.assertEqual(listed, list(streamed))
+        rels = tuple(map(lambda f: str(f['rel']), listed))
+        self.assertEqual(9, len(rels))
+        names, defs = self._write_dist(False)
+        snames, sdefs = self._write_dist(True)
+        self.assertEqual(names, snames)
+        self.assertEqual(defs, sdefs)
+        files = ManifestReader(partial(io.StringIO, sdefs)).files()
+        self.assertEqual(rels, tuple(map(lambda f: f['rel'], files)))
@@ -0,0 +1,69 @@
+import unittest
+import pickle
+from pathlib import Path
+from zensols.grsync import PathTranslator, FileEntry, LinkEntry
+
+
+class Dist(object):
+    def __init__(self):
+        self.path_translator = PathTranslator(Path('/home/user'))
+        self.params = {'os': 'linux'}
+
+
+class TestEntry(unittest.TestCase):
+    def setUp(self):
+        self.dist = Dist()
+
+    def _attrs(self, entry):
+        return (entry.relative, entry.path, entry.mode, entry.modestr,
+                entry.modify_time, entry.blob, entry.hardlink, entry.member,
+                str(entry), repr(entry))
+
+    def _assert_pickle(self, entry):
+        attrs = self._attrs(entry)
+        # with and without cached paths
+        for ent in (FileEntry(entry.dist, entry.finfo), entry):
+            copy = pickle.loads(pickle.dumps(ent))
+            self.assertEqual(entry.finfo, copy.finfo)
+            self.assertEqual(attrs, self._attrs(copy))
+        return attrs
+
+    def test_file(self):
+        finfo = {'modestr': '-rw-r--r--', 'mode': 33188,
+                 'create_time': 1.5, 'modify_time': 2.5,
+                 'rel': 'dots/b.conf', 'hardlink': 'dots/a.conf',
+                 'blob': 'abc'}
+        entry = FileEntry(self.dist, finfo)
+        self.assertFalse(hasattr(entry, '__dict__'))
+        self.assertEqual(
+            (Path('dots/b.conf'), Path('/home/user/dots/b.conf'), 33188,
+             '-rw-r--r--', 2.5, 'abc', Path('/home/user/dots/a.conf'),
+             'blobs/abc',
+             'dots/b.conf -> /home/user/dots/b.conf: 33188 (-rw-r--r--)',
+             'dots/b.conf -> /home/user/dots/b.conf: 33188 (-rw-r--r--)'),
+            self._assert_pickle(entry))
+        entry = FileEntry(self.dist, {'modestr': '-rw-r--r--', 'mode': 33188,
+                                      'create_time': 1.5, 'modify_time': 2.5,
+                                      'rel': 'top.txt'})
+        self.assertEqual(
+            (Path('top.txt'), Path('/home/user/top.txt'), 33188,
+             '-rw-r--r--', 2.5, None, None, 'top.txt',
+             'top.txt -> /home/user/top.txt: 33188 (-rw-r--r--)',
+             'top.txt -> /home/user/top.txt: 33188 (-rw-r--r--)'),
+            self._assert_pickle(entry))
+
+    def test_link(self):
+        finfo = {'source': 'bin/tool', 'target': 'opt/{os}/tool'}
+        entry = LinkEntry(self.dist, finfo)
+        self.assertFalse(hasattr(entry, '__dict__'))
+        self.assertEqual(Path('/home/user/opt/linux/tool'), entry.target)
+        self.assertEqual('/home/user/bin/tool -> /home/user/opt/linux/tool',
+                         str(entry))
+        copy = pickle.loads(pickle.dumps(entry))
+        self.assertEqual((entry.relative, entry.source, entry.target,
+                          str(entry)),
+                         (copy.relative, copy.source, copy.target, str(copy)))
+        entry = LinkEntry(self.dist, finfo, Path('/mnt'))
+        copy = pickle.loads(pickle.dumps(entry))
+        self.assertEqual(Path('/mnt'), copy.target_dir)
+        self.assertEqual('/mnt/bin/tool -> /mnt/opt/linux/tool', str(copy))
@@ -1,12 +1,20 @@
 import logging
+import io
+import importlib.util
 import os
 import unittest
 from pathlib import Path
 import shutil
+import zipfile
 from git import Repo
 from zensols.grsync import (
     AppConfig,
     DistManager,
+    FreezeManager,
+    ArchiveFormat,
+    Distribution,
+    ThawManager,
+    DiscoveryCache,
 )
 
 logger = logging.getLogger(__name__)
@@ -138,6 +146,219 @@ class TestFreezeThaw(unittest.TestCase):
                                           'url': repo_path}]}),}
         self.assertEqual(rec_sort(c), rec_sort(res))
 
+    def test_cache_disabled(self):
+        # the cache is only used when configured so tests (and users that do
+        # not ask for it) do not write to the user cache directory
+        lister = self.freeze_dm.discoverer.lister
+        self.assertFalse(isinstance(lister, DiscoveryCache))
+
+    def test_parallel_discover(self):
+        def freeze(dm):
+            res = dm.discoverer.freeze(flatten=True)
+            del res['create_date']
+            return res
+
+        dm = DistManager(
+            self.config, target_dir=self.freeze_dir, dist_dir=self.dist_dir,
+            workers=4)
+        self.assertEqual(4, dm.discoverer.repo_workers)
+        self.assertEqual(freeze(self.freeze_dm), freeze(dm))
+
+    def test_entries(self):
+        dist = Distribution.from_discoverer(
+            self.freeze_dm.discoverer, self.thaw_dir)
+        files = dist.files
+        rels = ['file_0.txt', 'dir_a/dir_b/file_b.txt', 'dir_a/file_a.txt']
+        # the collection is iterated more than once
+        self.assertEqual(rels, [str(f.relative) for f in files])
+        self.assertEqual(rels, [str(f.relative) for f in files])
+        self.assertEqual(3, len(files))
+        self.assertTrue('dir_a/file_a.txt' in files)
+        self.assertFalse('dir_a' in files)
+        self.assertEqual(self.thaw_dir / 'file_0.txt',
+                         files[Path('file_0.txt')].path)
+        self.assertIsNone(files.get('nada'))
+        with self.assertRaises(KeyError):
+            files['nada']
+        self.assertEqual(['dir_a/dir_b/file_b.txt', 'dir_a/file_a.txt'],
+                         [str(f.relative) for f in files.prefix('dir_a')])
+        self.assertEqual([], list(files.prefix('dir')))
+        self.assertEqual(['opt/empty_dir'],
+                         [str(f.relative) for f in dist.empty_dirs])
+        self.assertEqual(5, len(dist.links))
+        self.assertEqual(5, len(tuple(dist.links)))
+
+    def test_dir_plan(self):
+        dm = self.thaw_dm
+        dist = Distribution.from_discoverer(
+            self.freeze_dm.discoverer, dm.target_dir)
+        tmng = ThawManager(dist, dm.path_translator, dm.app_version)
+        plan = tmng._plan_dirs()
+        rels = sorted(str(p.relative_to(dm.target_dir)) for p in plan)
+        # repository directories are left for the clone
+        self.assertEqual(['dir_a', 'dir_a/dir_b', 'dir_w_symlinks', 'opt',
+                          'opt/empty_dir', 'view'], rels)
+        self.assertEqual(0o755, plan[dm.target_dir / 'opt/empty_dir'] & 0o777)
+        self.assertIsNone(plan[dm.target_dir / 'dir_a'])
+        tmng._thaw_dirs()
+        self.assertEqual(set(plan) | {dm.target_dir}, tmng._dirs)
+        self.assertEqual(set(plan), tmng._created_dirs)
+        for path in plan:
+            self.assertTrue(path.is_dir())
+
+    def test_cyclic_links(self):
+        root = (self.freeze_dir / 'cycle').absolute()
+        for name, link, targ in (('X', 'L1', 'Y'), ('Y', 'L2', 'X')):
+            (root / name).mkdir(parents=True, exist_ok=True)
+            (root / name / f'{name}.txt').write_text(name)
+            (root / name / link).symlink_to(Path('..') / targ)
+        try:
+            discoverer = self.freeze_dm.discoverer
+            rels = sorted(str(f['abs'].relative_to(root))
+                          for f in discoverer._walk_files(root, set()))
+        finally:
+            shutil.rmtree(root)
+        # links between siblings are followed until they reach a directory
+        # being walked
+        self.assertEqual(['X/L1/Y.txt', 'X/X.txt', 'Y/L2/X.txt', 'Y/Y.txt'],
+                         rels)
+
+    def test_clone_options(self):
+        config = AppConfig(Path('test-resources/fs-test.yml'))
+        config.options['discover.repo.clone.depth'] = 1
+        config.options['discover.repo.clone.repos'] = [
+            {'repo': {'path': 'view/*_src', 'depth': 5, 'sparse': ['/src']}}]
+        dm = DistManager(config, target_dir=self.freeze_dir,
+                         dist_dir=self.dist_dir)
+        fmng = FreezeManager(config, dm.freeze_file, dm.defs_file,
+                             dm.discoverer, 'test_run', True)
+        data = fmng._create_data()
+        self.assertEqual({'depth': 1}, data['clone'])
+        data['files'] = list(data['files'])
+        dist = Distribution.from_struct(data, self.thaw_dir)
+        self.assertEqual({'repo_def': {'depth': 1},
+                          'repo_src': {'depth': 5, 'sparse': ['/src']}},
+                         {r.path.name: r.clone for r in dist.repos})
+
+    def test_incremental_freeze(self):
+        def freeze():
+            dm = DistManager(
+                self.config, target_dir=self.freeze_dir,
+                dist_dir=self.dist_dir)
+            fmng = FreezeManager(
+                dm.config, dm.freeze_file, dm.defs_file, dm.discoverer,
+                'test_run', False)
+            fmng.freeze()
+            with zipfile.ZipFile(dm.dist_file) as zf:
+                self.assertIsNone(zf.testzip())
+                self.assertEqual(changed_content, zf.read('file_0.txt'))
+            return fmng.reuse_counts
+
+        if self.dist_dir.exists():
+            shutil.rmtree(self.dist_dir)
+        changed_file = self.freeze_dir / 'file_0.txt'
+        changed_content = changed_file.read_bytes()
+        counts = freeze()
+        self.assertEqual(0, counts['reused'])
+        self.assertEqual(0, counts['changed'])
+        n_files = counts['new']
+        self.assertEqual({'reused': n_files, 'changed': 0, 'new': 0},
+                         freeze())
+        try:
+            changed_content += b'changed'
+            changed_file.write_bytes(changed_content)
+            os.utime(changed_file, (10 ** 9, 10 ** 9))
+            self.assertEqual({'reused': n_files - 1, 'changed': 1, 'new': 0},
+                             freeze())
+        finally:
+            shutil.copy('README.md', changed_file)
+            os.chmod(str(changed_file), 0o664)
+
+    def test_blob_layout(self):
+        config = AppConfig(Path('test-resources/fs-test.yml'))
+        config.options['discover.layout'] = 'blob'
+        dist_dir = self.targ_dir / 'blob-dist'
+        thaw_dir = self.targ_dir / 'blob-thaw'
+        for path in (dist_dir, thaw_dir):
+            if path.exists():
+                shutil.rmtree(path)
+        dm = DistManager(config, target_dir=self.freeze_dir,
+                         dist_dir=dist_dir)
+        dm.app_version = 'test_run'
+        dm.freeze()
+        files = tuple(dm.distribution.files)
+        with zipfile.ZipFile(dm.dist_file) as zf:
+            blobs = tuple(filter(lambda n: n.startswith('blobs/'),
+                                 zf.namelist()))
+        # the test files are copies of the README
+        self.assertEqual(1, len(blobs))
+        self.assertEqual({blobs[0]}, set(map(lambda f: f.member, files)))
+        dm = DistManager(config, target_dir=thaw_dir, dist_dir=dist_dir,
+                         dry_run=False)
+        dm.app_version = 'test_run'
+        dm.thaw()
+        self._check_dist(thaw_dir, True)
+        readme = Path('README.md').read_bytes()
+        for entry in files:
+            self.assertEqual(readme, (thaw_dir / entry.relative).read_bytes())
+
+    def test_stream(self):
+        thaw_dir = self.targ_dir / 'stream-thaw'
+        if thaw_dir.exists():
+            shutil.rmtree(thaw_dir)
+        stream = io.BytesIO()
+        self.freeze_dm.freeze_stream(stream)
+        stream.seek(0)
+        dm = DistManager(
+            self.config, target_dir=thaw_dir, dist_dir=self.dist_dir,
+            dry_run=False)
+        dm.thaw_stream(stream)
+        self._check_dist(thaw_dir, True)
+        src = self.freeze_dir / 'dir_a' / 'dir_b' / 'file_b.txt'
+        dst = thaw_dir / 'dir_a' / 'dir_b' / 'file_b.txt'
+        self.assertEqual(src.read_bytes(), dst.read_bytes())
+        self.assertEqual(src.stat().st_mode, dst.stat().st_mode)
+        self.assertAlmostEqual(src.stat().st_mtime, dst.stat().st_mtime, 3)
+
+    def test_tar_format(self):
+        for fmt in ArchiveFormat.names()[1:]:
+            zstd = importlib.util.find_spec('zstandard') is not None
+            if fmt == 'tar.zst' and not zstd:
+                continue
+            dist_dir = self.targ_dir / 'tar-dist'
+            thaw_dir = self.targ_dir / 'tar-thaw'
+            for path in (dist_dir, thaw_dir):
+                if path.exists():
+                    shutil.rmtree(path)
+            dm = DistManager(self.config, target_dir=self.freeze_dir,
+                             dist_dir=dist_dir, archive_format=fmt)
+            dm.app_version = 'test_run'
+            dm.freeze()
+            self.assertEqual(f'dist.{fmt}', dm.dist_file.name)
+            self.assertEqual(fmt, ArchiveFormat.detect_file(dm.dist_file))
+            self.assertTrue((dist_dir / f'dist.{fmt}.json').is_file())
+            # the format is detected from the distribution file on thaw
+            dm = DistManager(None, target_dir=thaw_dir, dist_dir=dist_dir,
+                             dry_run=False)
+            dm.app_version = 'test_run'
+            self.assertEqual(f'dist.{fmt}', dm.dist_file.name)
+            self.assertEqual(3, len(tuple(dm.distribution.files)))
+            dm.thaw()
+            self._check_dist(thaw_dir, True)
+            src = self.freeze_dir / 'file_0.txt'
+            self.assertEqual(src.read_bytes(),
+                             (thaw_dir / 'file_0.txt').read_bytes())
+        # a freeze without a format writes a zip rather than the newest format
+        dm = DistManager(self.config, target_dir=self.freeze_dir,
+                         dist_dir=dist_dir)
+        dm.app_version = 'test_run'
+        dm.freeze()
+        self.assertEqual('dist.zip', dm.freeze_file.name)
+        self.assertEqual(ArchiveFormat.ZIP,
+                         ArchiveFormat.detect_file(dist_dir / 'dist.zip'))
+        dm = DistManager(None, target_dir=thaw_dir, dist_dir=dist_dir)
+        self.assertEqual('dist.zip', dm.dist_file.name)
+
     def _check_dist(self, root, test_link_resolves):
         def fd(path):
             p = Path(root, *path.split('/')).absolute()
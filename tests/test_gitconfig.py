@@ -0,0 +1,75 @@
+import unittest
+from pathlib import Path
+import tempfile
+from git import Repo
+from zensols.grsync import GitConfig, RepoSpec
+
+CONFIG = """\
+[core]
+	repositoryformatversion = 0
+	bare = false  ; trailing comment
+[remote "origin"]
+	url = https://github.com/plandes/grsync
+	fetch = +refs/heads/*:refs/remotes/origin/*
+[remote "git\\"hub"]
+	url = "/tmp/with # hash"  # comment
+[branch "master"]
+	remote = origin
+[Branch.Dev] Remote = git\\
+hub
+[include]
+	path = extra.conf
+"""
+
+EXTRA = """\
+[remote "upstream"]
+	url = ssh://host/repo.git
+[branch "master"]
+	remote = upstream
+"""
+
+
+class TestGitConfig(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name)
+        git_dir = self.root / 'modules' / 'repo'
+        git_dir.mkdir(parents=True)
+        (git_dir / 'config').write_text(CONFIG)
+        (git_dir / 'extra.conf').write_text(EXTRA)
+        self.work = self.root / 'work'
+        self.work.mkdir()
+        (self.work / '.git').write_text('gitdir: ../modules/repo\n')
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_parse(self):
+        conf = GitConfig.from_repo_path(self.work)
+        self.assertEqual(('origin', 'git"hub', 'upstream'),
+                         conf.subsections('remote'))
+        self.assertEqual('https://github.com/plandes/grsync',
+                         conf.get('remote', 'origin', 'url'))
+        self.assertEqual('/tmp/with # hash', conf.get('remote', 'git"hub', 'url'))
+        self.assertEqual('false', conf.get('core', None, 'bare'))
+        self.assertEqual('github', conf.get('branch', 'dev', 'remote'))
+        # the include is read after the main file so its value is last
+        self.assertEqual('upstream', conf.get('branch', 'master', 'remote'))
+        self.assertIsNone(conf.get('remote', 'nada', 'url'))
+
+    def test_missing(self):
+        with self.assertRaises(ValueError):
+            GitConfig.from_repo_path(self.root)
+
+    def test_rename_remote(self):
+        path = self.root / 'repo'
+        Repo.init(path).create_remote('origin', 'https://host/a.git')
+        remote = RepoSpec(path, None).remotes[0]
+        # read from the configuration so GitPython is loaded to rename
+        self.assertIsNone(remote._remote)
+        remote.rename('upstream', 'https://host/b.git')
+        self.assertEqual('upstream', remote.name)
+        conf = GitConfig.from_repo_path(path)
+        self.assertEqual(('upstream',), conf.subsections('remote'))
+        self.assertEqual('https://host/b.git',
+                         conf.get('remote', 'upstream', 'url'))
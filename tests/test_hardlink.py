@@ -0,0 +1,74 @@
+import io
+import os
+import zipfile
+from zensols.grsync import ThawManager
+from util import DotsTestCase
+
+
+class TestHardlink(DotsTestCase):
+    def setUp(self):
+        super().setUp()
+        dots = self.root / 'home' / 'dots'
+        (dots / 'backup').mkdir(parents=True)
+        (dots / 'a.conf').write_text('some configuration\n')
+        os.link(dots / 'a.conf', dots / 'backup' / 'a.conf')
+        os.link(dots / 'a.conf', dots / 'b.conf')
+        (dots / 'c.conf').write_text('other configuration\n')
+
+    def test_freeze_thaw(self):
+        dm = self._create_dm(self.root / 'home')
+        files = dm.discoverer.freeze(flatten=True)['files']
+        links = {f['rel']: f.get('hardlink') for f in files}
+        self.assertEqual({'dots/a.conf': None,
+                          'dots/b.conf': 'dots/a.conf',
+                          'dots/backup/a.conf': 'dots/a.conf',
+                          'dots/c.conf': None}, links)
+        # the size of the discovery is used to freeze the file
+        for finfo in dm.discoverer.freeze(flatten=False)['files']:
+            self.assertEqual(finfo['abs'].stat().st_size, finfo['size'])
+        self._freeze_dist()
+        with zipfile.ZipFile(dm.dist_file) as zf:
+            self.assertEqual(['dots/a.conf', 'dots/c.conf', 'conf/dist.json'],
+                             zf.namelist())
+        thaw_dir = self.root / 'thaw'
+        self._create_dm(thaw_dir).thaw()
+        self._check_thaw(thaw_dir)
+
+    def test_extract_workers(self):
+        dots = self.root / 'home' / 'dots'
+        for i in range(20):
+            (dots / f'file_{i}.txt').write_text(f'content {i}\n' * i)
+        self._freeze_dist()
+        for workers in (1, 4):
+            thaw_dir = self.root / f'thaw-{workers}'
+            dm = self._create_dm(thaw_dir, extract_workers=workers)
+            tmng = ThawManager(dm.distribution, dm.path_translator,
+                               dm.app_version, extract_workers=workers)
+            tmng.thaw()
+            self._check_thaw(thaw_dir)
+            # hard linked files are not extracted
+            self.assertEqual(22, tmng.extract_stats['files'])
+            for i in range(20):
+                path = thaw_dir / 'dots' / f'file_{i}.txt'
+                self.assertEqual(f'content {i}\n' * i, path.read_text())
+
+    def test_stream(self):
+        stream = io.BytesIO()
+        self._create_dm(self.root / 'home').freeze_stream(stream)
+        stream.seek(0)
+        thaw_dir = self.root / 'thaw'
+        with self.assertLogs('zensols.grsync.thaw', 'INFO') as cm:
+            self._create_dm(thaw_dir).thaw_stream(stream)
+        # directories of files are created as they are extracted
+        self.assertIn('created 0 of 0 directories',
+                      '\n'.join(cm.output))
+        self._check_thaw(thaw_dir)
+
+    def _check_thaw(self, thaw_dir):
+        dots = thaw_dir / 'dots'
+        ino = (dots / 'a.conf').stat().st_ino
+        for name in 'b.conf backup/a.conf'.split():
+            self.assertEqual(ino, (dots / name).stat().st_ino)
+            self.assertEqual('some configuration\n',
+                             (dots / name).read_text())
+        self.assertNotEqual(ino, (dots / 'c.conf').stat().st_ino)
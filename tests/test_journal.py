@@ -0,0 +1,72 @@
+import json
+from zensols.grsync import ThawManager, ThawJournal
+from util import DotsTestCase
+
+
+class TestJournal(DotsTestCase):
+    def setUp(self):
+        super().setUp()
+        dots = self.root / 'home' / 'dots'
+        (dots / 'sub').mkdir(parents=True)
+        for i in range(5):
+            (dots / f'file_{i}.conf').write_text(f'configuration {i}\n')
+        (dots / 'sub' / 'other.conf').write_text('other\n')
+        self._freeze_dist()
+        self.thaw_dir = self.root / 'thaw'
+        self.journal_file = ThawJournal.journal_file(self.thaw_dir)
+
+    def _create_tmng(self):
+        dm = self._create_dm(self.thaw_dir)
+        return ThawManager(dm.distribution, dm.path_translator,
+                           dm.app_version, extract_workers=2)
+
+    def _interrupt(self):
+        def fail():
+            raise KeyboardInterrupt()
+
+        tmng = self._create_tmng()
+        tmng._thaw_repos = fail
+        with self.assertRaises(KeyboardInterrupt):
+            tmng.thaw()
+        self.assertTrue(self.journal_file.is_file())
+        return tmng
+
+    def test_resume(self):
+        tmng = self._interrupt()
+        self.assertEqual(6, tmng.extract_stats['files'])
+        with open(self.journal_file) as f:
+            lines = f.readlines()
+        self.assertEqual(7, len(lines))
+        # the last entry is partially written when the thaw is killed
+        with open(self.journal_file, 'w') as f:
+            f.writelines(lines[:-1])
+            f.write(lines[-1][:5])
+        tmng = self._create_tmng()
+        with self.assertLogs('zensols.grsync.thaw', 'WARNING') as cm:
+            tmng.thaw()
+        # only the file of the partial entry is found to exist
+        self.assertEqual(1, len(cm.output))
+        self.assertRegex(cm.output[0], 'path already exists')
+        self.assertEqual(0, tmng.extract_stats['files'])
+        self.assertFalse(self.journal_file.exists())
+        dots = self.thaw_dir / 'dots'
+        for i in range(5):
+            self.assertEqual(f'configuration {i}\n',
+                             (dots / f'file_{i}.conf').read_text())
+        self.assertEqual([], list(dots.glob('**/*' + ThawManager.TEMP_SUFFIX)))
+
+    def test_other_dist(self):
+        self._interrupt()
+        with open(self.journal_file) as f:
+            lines = f.readlines()
+        header = json.loads(lines[0])
+        header['dist']['size'] += 1
+        lines[0] = json.dumps(header) + '\n'
+        with open(self.journal_file, 'w') as f:
+            f.writelines(lines)
+        for path in (self.thaw_dir / 'dots').glob('**/*.conf'):
+            path.unlink()
+        tmng = self._create_tmng()
+        tmng.thaw()
+        self.assertEqual(6, tmng.extract_stats['files'])
+        self.assertFalse(self.journal_file.exists())
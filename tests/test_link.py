@@ -0,0 +1,32 @@
+import unittest
+from pathlib import Path
+import tempfile
+from zensols.grsync import PathTranslator, SymbolicLink, LinkIndex
+
+
+class TestLinkIndex(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        root = Path(self._tmp.name).resolve()
+        self.root = root
+        for d in 'code/foo/dir code/foobar'.split():
+            (root / d).mkdir(parents=True)
+        trans = PathTranslator(root)
+        self.links = []
+        for name, targ in (('a', 'code/foobar'), ('b', 'code/foo/dir'),
+                           ('c', 'code/foo'), ('d', 'code')):
+            src = root / name
+            src.symlink_to(root / targ)
+            self.links.append(SymbolicLink(src, trans))
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_find(self):
+        index = LinkIndex(self.links)
+        found = index.find(self.root / 'code' / 'foo')
+        self.assertEqual(['b', 'c'], [lk.source.name for lk in found])
+        found = index.find(self.root / 'code' / 'foobar')
+        self.assertEqual(['a'], [lk.source.name for lk in found])
+        self.assertEqual((), index.find(self.root / 'nada'))
+        self.assertEqual([1, 1, 1, 0], [lk.use_count for lk in self.links])
@@ -0,0 +1,52 @@
+import unittest
+import io
+import json
+from functools import partial
+from zensols.grsync import ManifestWriter, ManifestReader
+
+FILES = [{'modestr': '-rw-r--r--', 'mode': 33188, 'create_time': 1.5,
+          'modify_time': 2.5, 'rel': 'top.txt'},
+         {'modestr': '-rw-rw-r--', 'mode': 33204, 'create_time': 3.0,
+          'modify_time': 4.0, 'rel': 'dots/a.conf'},
+         {'modestr': '-rw-rw-r--', 'mode': 33204, 'create_time': 3.0,
+          'modify_time': 4.0, 'rel': 'dots/backup/a.conf',
+          'hardlink': 'dots/a.conf'},
+         {'modestr': '-rwxr-xr-x', 'mode': 33261, 'create_time': 5.0,
+          'modify_time': 6.0, 'rel': 'dots/b.sh', 'blob': 'abc'}]
+
+HEADER = {'app_version': '0.1', 'layout': 'tree', 'repo_pref': None,
+          'links': [{'source': 'a', 'target': 'b'}],
+          'empty_dirs': [], 'repo_specs': []}
+
+
+class TestManifest(unittest.TestCase):
+    def test_read_write(self):
+        out = io.StringIO()
+        writer = ManifestWriter(out)
+        writer.write_header(HEADER)
+        for finfo in FILES:
+            writer.add_file(dict(finfo))
+        writer.write_footer()
+        self.assertEqual(len(FILES), writer.file_count)
+        defs = out.getvalue()
+        # the directory of each file is written once
+        self.assertEqual(1, defs.count('"dots"'))
+        reader = ManifestReader(partial(io.StringIO, defs))
+        self.assertEqual(HEADER, reader.header)
+        self.assertEqual(FILES, list(reader.files()))
+        # files are read again on each iteration
+        self.assertEqual(FILES, list(reader.files()))
+
+    def test_legacy(self):
+        struct = dict(HEADER)
+        struct['files'] = FILES
+        defs = json.dumps(struct, indent=2)
+        reader = ManifestReader(partial(io.StringIO, defs))
+        self.assertEqual(HEADER, reader.header)
+        self.assertEqual(FILES, list(reader.files()))
+
+    def test_version(self):
+        defs = json.dumps({'manifest': ManifestWriter.VERSION + 1})
+        reader = ManifestReader(partial(io.StringIO, defs))
+        with self.assertRaises(ValueError):
+            reader.header
@@ -0,0 +1,117 @@
+import unittest
+import os
+import re
+import time
+from pathlib import Path
+import tempfile
+from zensols.grsync import RepoScanner, DiscoveryCache, DirectoryLister
+
+
+class TestScan(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name).resolve()
+        for d in ('a/.git/objects', 'a/sub/.git', 'b/c/.git', 'b/skip/.git',
+                  'd/e'):
+            (self.root / 'code' / d).mkdir(parents=True)
+        self.cache_file = self.root / 'cache' / 'discover.json'
+        self._backdate()
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _backdate(self, path='code'):
+        # directories modified recently are not cached
+        past = time.time() - 60
+        for path, dirs, files in os.walk(self.root / path):
+            os.utime(path, (past, past))
+
+    def _scan(self, nested=False, rebuild=False):
+        cache = DiscoveryCache(self.cache_file, rebuild)
+        scanner = RepoScanner(
+            [re.compile(r'.*/skip$')], nested, cache)
+        paths = list(map(lambda p: str(p.relative_to(self.root / 'code')),
+                         scanner.scan([self.root / 'code'])))
+        cache.save()
+        return paths, scanner.stats, cache.stats
+
+    def test_scan(self):
+        paths, stats, cstats = self._scan()
+        self.assertEqual(['a', 'b/c'], paths)
+        self.assertEqual({'visited': 6, 'pruned': 4, 'repos': 2}, stats)
+        self.assertEqual({'hits': 0, 'misses': 6}, cstats)
+        paths, stats, cstats = self._scan(nested=True)
+        self.assertEqual(['a', 'a/sub', 'b/c'], paths)
+
+    def test_scanner(self):
+        code = self.root / 'code'
+        skip = [re.compile(r'.*/skip$')]
+
+        def scan(paths, nested=False):
+            scanner = RepoScanner(skip, nested)
+            self.assertEqual(DirectoryLister, type(scanner.lister))
+            found = list(map(lambda p: str(p.relative_to(code)),
+                             scanner.scan(paths)))
+            return found, scanner.stats
+
+        # repositories are not descended, nor are .git and skipped directories
+        self.assertEqual(
+            (['a', 'b/c'], {'visited': 6, 'pruned': 4, 'repos': 2}),
+            scan([code]))
+        # the working tree of a repository is descended for nested ones
+        self.assertEqual(
+            (['a', 'a/sub', 'b/c'], {'visited': 7, 'pruned': 4, 'repos': 3}),
+            scan([code], True))
+        # skipped roots are pruned without being listed
+        self.assertEqual(
+            (['b/c'], {'visited': 3, 'pruned': 3, 'repos': 1}),
+            scan([code / 'b' / 'skip', code / 'b', code / 'd' / 'e']))
+
+    def test_cache(self):
+        self._scan()
+        paths, stats, cstats = self._scan()
+        self.assertEqual(['a', 'b/c'], paths)
+        self.assertEqual({'hits': 6, 'misses': 0}, cstats)
+        (self.root / 'code' / 'd' / 'e' / 'f' / '.git').mkdir(parents=True)
+        self._backdate('code/d/e')
+        paths, stats, cstats = self._scan()
+        self.assertEqual(['a', 'b/c', 'd/e/f'], paths)
+        self.assertEqual({'hits': 5, 'misses': 2}, cstats)
+        paths, stats, cstats = self._scan(rebuild=True)
+        self.assertEqual({'hits': 0, 'misses': 7}, cstats)
+
+    def test_stat_cache(self):
+        path = self.root / 'code' / 'd' / 'e'
+        (path / 'x').write_text('content')
+        (path / 'y').symlink_to('x')
+        past = time.time() - 60
+        os.utime(path / 'x', (past, past))
+        os.utime(path, (past, past))
+
+        def stat(entry_stats=True):
+            cache = DiscoveryCache(self.cache_file, entry_stats=entry_stats)
+            names = tuple(cache.listing(str(path)).keys())
+            sts = tuple(map(lambda n: cache.stat(str(path / n)), names))
+            cache.save()
+            return names, sts, cache.stat_stats
+
+        names, sts, cstats = stat()
+        self.assertEqual(('x', 'y'), names)
+        self.assertEqual({'hits': 0, 'misses': 2}, cstats)
+        names, csts, cstats = stat()
+        self.assertEqual({'hits': 2, 'misses': 0}, cstats)
+        for st, cst in zip(sts, csts):
+            for attr in 'st_mode st_ino st_dev st_nlink st_size st_mtime ' \
+                    'st_ctime'.split():
+                self.assertEqual(getattr(st, attr), getattr(cst, attr))
+        self.assertEqual(7, csts[1].st_size)
+        # a change to the directory invalidates the stats of its entries
+        (path / 'z').touch()
+        os.utime(path / 'z', (past, past))
+        os.utime(path, (past + 1, past + 1))
+        names, csts, cstats = stat()
+        self.assertEqual(('x', 'y', 'z'), names)
+        self.assertEqual({'hits': 0, 'misses': 3}, cstats)
+        # entry stats are only cached when asked
+        names, csts, cstats = stat(False)
+        self.assertEqual({'hits': 0, 'misses': 0}, cstats)
@@ -0,0 +1,90 @@
+import os
+from zensols.grsync import ThawManager
+from util import DotsTestCase
+
+
+class TestSync(DotsTestCase):
+    def setUp(self):
+        super().setUp()
+        dots = self.root / 'home' / 'dots'
+        (dots / 'sub').mkdir(parents=True)
+        for i in range(4):
+            (dots / f'file_{i}.conf').write_text(f'configuration {i}\n')
+        (dots / 'sub' / 'other.conf').write_text('other\n')
+        os.link(dots / 'file_0.conf', dots / 'sub' / 'link.conf')
+        self._freeze_dist()
+        self.thaw_dir = self.root / 'thaw'
+        self.dots = self.thaw_dir / 'dots'
+        self._thaw()
+
+    def _thaw(self, **kwargs):
+        dm = self._create_dm(self.thaw_dir)
+        tmng = ThawManager(dm.distribution, dm.path_translator,
+                           dm.app_version, extract_workers=2, **kwargs)
+        tmng.thaw()
+        return tmng
+
+    def _modify(self):
+        dots = self.dots
+        # same size and modify time with different content
+        path = dots / 'file_0.conf'
+        mtime = path.stat().st_mtime
+        path.write_text('Configuration 0\n')
+        os.utime(path, (mtime, mtime))
+        (dots / 'file_1.conf').write_text('changed\n')
+        (dots / 'file_2.conf').unlink()
+        (dots / 'sub' / 'link.conf').unlink()
+        (dots / 'sub' / 'link.conf').write_text('configuration 0\n')
+
+    def test_skip(self):
+        self._modify()
+        tmng = self._thaw()
+        self.assertEqual({'unchanged': 0, 'updated': 0, 'new': 1},
+                         tmng.sync_stats)
+        self.assertEqual('changed\n', (self.dots / 'file_1.conf').read_text())
+
+    def test_sync(self):
+        self._modify()
+        tmng = self._thaw(sync=True)
+        self.assertEqual({'unchanged': 3, 'updated': 2, 'new': 1},
+                         tmng.sync_stats)
+        for i in range(1, 4):
+            self.assertEqual(f'configuration {i}\n',
+                             (self.dots / f'file_{i}.conf').read_text())
+        self.assertEqual('Configuration 0\n',
+                         (self.dots / 'file_0.conf').read_text())
+        self.assertEqual((self.dots / 'file_0.conf').stat().st_ino,
+                         (self.dots / 'sub' / 'link.conf').stat().st_ino)
+        self.assertEqual([], list(self.dots.glob('**/*~')))
+        tmng = self._thaw(sync=True)
+        self.assertEqual({'unchanged': 6, 'updated': 0, 'new': 0},
+                         tmng.sync_stats)
+
+    def test_missing_link_target(self):
+        dots = self.dots
+        (dots / 'file_0.conf').unlink()
+        (dots / 'file_0.conf').mkdir()
+        (dots / 'sub' / 'link.conf').unlink()
+        (dots / 'sub' / 'link.conf').write_text('changed\n')
+        with self.assertLogs('zensols.grsync.thaw', 'WARNING') as cm:
+            tmng = self._thaw(sync=True)
+        self.assertRegex('\n'.join(cm.output), 'missing hard link target')
+        # the existing file is kept when its replacement can not be created
+        self.assertEqual('changed\n',
+                         (dots / 'sub' / 'link.conf').read_text())
+        self.assertEqual(0, tmng.sync_stats['updated'])
+
+    def test_checksum_backup(self):
+        self._modify()
+        tmng = self._thaw(sync=True, checksum=True, backup=True)
+        self.assertEqual({'unchanged': 2, 'updated': 3, 'new': 1},
+                         tmng.sync_stats)
+        for i in range(4):
+            self.assertEqual(f'configuration {i}\n',
+                             (self.dots / f'file_{i}.conf').read_text())
+        self.assertEqual('Configuration 0\n',
+                         (self.dots / 'file_0.conf~').read_text())
+        self.assertEqual('changed\n', (self.dots / 'file_1.conf~').read_text())
+        self.assertEqual((self.dots / 'file_0.conf').stat().st_ino,
+                         (self.dots / 'sub' / 'link.conf').stat().st_ino)
+        self.assertEqual(3, len(list(self.dots.glob('**/*~'))))
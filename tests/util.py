@@ -0,0 +1,38 @@
+import unittest
+from pathlib import Path
+import tempfile
+from zensols.grsync import AppConfig, DistManager, FreezeManager
+
+
+class DotsTestCase(unittest.TestCase):
+    """Freezes and thaws the files in ``home/dots`` of a temporary directory
+    with the configuration in ``test-resources/dots-test.yml``.
+
+    """
+    CONFIG_FILE = Path('test-resources/dots-test.yml')
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name).resolve()
+        self.config_file = self.root / 'grsync.yml'
+        self.config_file.write_text(
+            self.CONFIG_FILE.read_text().format(root=self.root))
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _create_dm(self, target_dir: Path, dist_dir: Path = None,
+                   **kwargs) -> DistManager:
+        if dist_dir is None:
+            dist_dir = self.root / 'dist'
+        dm = DistManager(AppConfig(self.config_file), target_dir=target_dir,
+                         dist_dir=dist_dir, **kwargs)
+        dm.app_version = 'test_run'
+        return dm
+
+    def _freeze_dist(self) -> DistManager:
+        # freeze only the distribution zip, which skips the bootstrap script
+        dm = self._create_dm(self.root / 'home')
+        FreezeManager(dm.config, dm.freeze_file, dm.defs_file, dm.discoverer,
+                      dm.app_version, False)._freeze_dist()
+        return dm